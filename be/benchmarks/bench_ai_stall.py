@@ -0,0 +1,91 @@
+"""
+AI 接口基准测试：慢补全进行时其他接口的延迟
+
+OpenAIService 通过 httpx.ASGITransport 连接本地假 OpenAI 服务（benchmarks.fake_openai），
+每次补全耗时 --delay 秒。并发发起 --chats 个 POST /v1/ai/chat 的同时循环请求
+GET /v1/blogs，统计其 p50/p99 延迟以及全部补全的总耗时。
+
+用法: uv run python -m benchmarks.bench_ai_stall [--chats 20] [--delay 1]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+import httpx
+
+from bluenote.config.config import settings
+from benchmarks.fake_openai import create_fake_openai_app
+
+
+async def chat_once(client: httpx.AsyncClient, headers: dict):
+    response = await client.post("/v1/ai/chat", json={"message": "hello"}, headers=headers)
+    assert response.status_code == 200, response.text
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chats", type=int, default=20)
+    parser.add_argument("--delay", type=float, default=1.0)
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    settings.__class__.DATABASE_URL = f"sqlite+aiosqlite:///{db_path}"
+
+    from bluenote.server import db
+    from bluenote.server.app import create_app, init_admin_user
+    from bluenote.services import openai
+
+    await db.init_db(settings.get_database_url())
+    await init_admin_user()
+    app = create_app()
+
+    fake_transport = httpx.ASGITransport(app=create_fake_openai_app(delay=args.delay))
+    openai._openai_service = openai.OpenAIService(
+        http_client=httpx.AsyncClient(transport=fake_transport)
+    )
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        response = await client.post("/v1/auth/login", json={
+            "username": settings.INIT_ADMIN_USERNAME,
+            "password": settings.INIT_ADMIN_PASSWORD,
+        })
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        # 预热：首次调用会加载 openai 的类型模块
+        await chat_once(client, headers)
+        latencies = []
+        chats_done = asyncio.Event()
+
+        async def chats():
+            await asyncio.gather(*(chat_once(client, headers) for _ in range(args.chats)))
+            chats_done.set()
+
+        async def probe():
+            while not chats_done.is_set():
+                start = time.perf_counter()
+                response = await client.get("/v1/blogs")
+                latencies.append(time.perf_counter() - start)
+                assert response.status_code == 200, response.text
+                await asyncio.sleep(0.01)
+
+        start = time.perf_counter()
+        await asyncio.gather(probe(), chats())
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    print(
+        f"chats={args.chats} delay={args.delay}s total={elapsed * 1000:8.1f}ms "
+        f"GET /v1/blogs n={len(latencies)} p50={p50:7.1f}ms p99={p99:7.1f}ms"
+    )
+    await openai.close_openai_service()
+    await db.get_engine().dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,113 @@
+"""
+级联删除基准测试：一个父对象 + N 个子对象
+
+对比逐对象删除（每个子对象一次 DELETE 和一次提交）与
+ActiveRecordMixin.delete 的集合式级联删除。
+
+用法: uv run python -m benchmarks.bench_cascade_delete [--children 10000] [--skip-baseline]
+（逐对象删除 10k 行需要数分钟，可用 --skip-baseline 跳过）
+"""
+
+import argparse
+import asyncio
+import time
+from typing import List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Field, Relationship, SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+import bluenote.schemas  # noqa: F401  先加载模型，避免 mixins 的循环导入
+from bluenote.mixins import BaseModelMixin
+
+
+class BenchParent(SQLModel, BaseModelMixin, table=True):
+    __tablename__ = "bench_parents"
+    id: Optional[int] = Field(default=None, primary_key=True)
+    children: List["BenchChild"] = Relationship(
+        sa_relationship_kwargs={"cascade": "all, delete"}
+    )
+
+
+class BenchChild(SQLModel, BaseModelMixin, table=True):
+    __tablename__ = "bench_children"
+    id: Optional[int] = Field(default=None, primary_key=True)
+    parent_id: int = Field(foreign_key="bench_parents.id", index=True)
+
+
+async def setup(children: int):
+    engine = create_async_engine(
+        "sqlite+aiosqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False}
+    )
+    counters = {"statements": 0, "commits": 0}
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _count_statement(*args):
+        counters["statements"] += 1
+
+    @event.listens_for(engine.sync_engine, "commit")
+    def _count_commit(*args):
+        counters["commits"] += 1
+
+    async with engine.begin() as conn:
+        await conn.run_sync(
+            SQLModel.metadata.create_all,
+            tables=[BenchParent.__table__, BenchChild.__table__],
+        )
+    async with AsyncSession(engine) as session:
+        parent = BenchParent()
+        session.add(parent)
+        await session.flush()
+        session.add_all(BenchChild(parent_id=parent.id) for _ in range(children))
+        await session.commit()
+    counters.update(statements=0, commits=0)
+    return engine, counters
+
+
+async def per_object_delete(engine):
+    """旧实现：逐个删除子对象，每次删除都提交"""
+    async with AsyncSession(engine) as session:
+        parent = (await session.exec(select(BenchParent))).first()
+        children = (
+            await session.exec(select(BenchChild).where(BenchChild.parent_id == parent.id))
+        ).all()
+        for child in children:
+            await session.delete(child)
+            await session.commit()
+        await session.delete(parent)
+        await session.commit()
+
+
+async def set_based_delete(engine):
+    async with AsyncSession(engine) as session:
+        parent = (await session.exec(select(BenchParent))).first()
+        await parent.delete(session)
+
+
+async def run(name, func, children):
+    engine, counters = await setup(children)
+    start = time.perf_counter()
+    await func(engine)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name:<18} children={children} time={elapsed * 1000:9.1f}ms "
+        f"statements={counters['statements']} commits={counters['commits']}"
+    )
+    await engine.dispose()
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--children", type=int, default=10000)
+    parser.add_argument("--skip-baseline", action="store_true")
+    args = parser.parse_args()
+
+    if not args.skip_baseline:
+        await run("per-object", per_object_delete, args.children)
+    await run("set-based", set_based_delete, args.children)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
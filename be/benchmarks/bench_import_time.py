@@ -0,0 +1,102 @@
+"""
+启动耗时基准测试：导入应用模块和创建应用的冷启动开销
+
+在新的子进程中用 `python -X importtime` 导入 bluenote.server.app，多次运行取中位数，
+列出累计耗时最多的顶层包；另外计时子进程中导入并调用 create_app 的总耗时（即每个
+worker 启动时的开销）。延迟导入的重依赖（openai、aiohttp）在启动时出现、或导入耗时的
+中位数超过 --max-ms 时以非零状态退出，可作为回归检查。
+
+用法: uv run python -m benchmarks.bench_import_time [--runs 5] [--top 10] [--max-ms 0]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+MODULE = "bluenote.server.app"
+# 只在用到时才导入的依赖，出现在启动导入中说明有模块又在顶层导入了它们
+DEFERRED_MODULES = ("openai", "aiohttp")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_importtime(module: str):
+    """导入一次模块，返回 {模块名: (自身微秒, 累计微秒)}"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue  # 表头
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def run_cold_start(module: str) -> float:
+    """新进程中导入模块并调用 create_app 的耗时（秒），包括解释器启动"""
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-c", f"from {module} import create_app; create_app()"],
+        cwd=ROOT,
+        capture_output=True,
+        check=True,
+    )
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--max-ms", type=float, default=0, help="导入耗时中位数上限，0 表示不检查")
+    args = parser.parse_args()
+
+    import_ms = []
+    packages = defaultdict(list)
+    imported = set()
+    for _ in range(args.runs):
+        timings = run_importtime(MODULE)
+        import_ms.append(timings[MODULE][1] / 1000)
+        imported.update(timings)
+        # 顶层包的耗时是其所有模块自身耗时之和
+        totals = defaultdict(int)
+        for name, (self_us, _) in timings.items():
+            totals[name.split(".")[0]] += self_us
+        for package, total in totals.items():
+            packages[package].append(total / 1000)
+
+    cold_ms = [run_cold_start(MODULE) * 1000 for _ in range(args.runs)]
+
+    median = statistics.median(import_ms)
+    print(f"import {MODULE}: median {median:8.1f}ms  min {min(import_ms):8.1f}ms  ({args.runs} runs)")
+    print(f"import + create_app (new process): median {statistics.median(cold_ms):8.1f}ms  min {min(cold_ms):8.1f}ms")
+    print(f"top {args.top} packages by import time:")
+    ranked = sorted(packages.items(), key=lambda item: statistics.median(item[1]), reverse=True)
+    for package, values in ranked[: args.top]:
+        print(f"  {package:<24} {statistics.median(values):8.1f}ms")
+
+    failed = False
+    loaded = [name for name in DEFERRED_MODULES if name in imported]
+    if loaded:
+        print(f"FAIL: deferred modules imported at startup: {', '.join(loaded)}")
+        failed = True
+    if args.max_ms and median > args.max_ms:
+        print(f"FAIL: median import time {median:.1f}ms exceeds {args.max_ms:.1f}ms")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+JWT 验证基准测试：每次请求的 token 验证开销
+
+对比 JWTManager.decode_jwt_token 在不缓存（每次解析 + base64 解码 + HMAC 校验）
+与启用已验证 token 缓存时的单次耗时。请求按 token 轮询，模拟多个活跃用户。
+
+用法: uv run python -m benchmarks.bench_jwt_decode [--requests 200000] [--users 100]
+"""
+
+import argparse
+import time
+
+from bluenote.security import JWTManager
+
+SECRET_KEY = "bench-secret-key"
+
+
+def run(manager: JWTManager, tokens: list, requests: int) -> float:
+    start = time.perf_counter()
+    for i in range(requests):
+        manager.decode_jwt_token(tokens[i % len(tokens)])
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200000)
+    parser.add_argument("--users", type=int, default=100)
+    args = parser.parse_args()
+
+    issuer = JWTManager(SECRET_KEY)
+    tokens = [issuer.create_jwt_token(f"user{i}") for i in range(args.users)]
+
+    for label, cache_size in (("no cache", 0), ("cached", 4096)):
+        manager = JWTManager(SECRET_KEY, token_cache_size=cache_size)
+        elapsed = run(manager, tokens, args.requests)
+        print(
+            f"{label:>8}: {args.requests} decodes in {elapsed * 1000:8.1f}ms "
+            f"({elapsed / args.requests * 1e6:6.2f}us/request) stats={manager.cache_stats()}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+日志吞吐基准测试：开启日志时每秒能处理的请求数
+
+一个模仿 GET /v1/blogs/{blog_id} 日志量的 FastAPI 路由（每个请求 4 条 INFO 日志），
+直接以 ASGI 方式并发调用，对比：
+
+- sync:      原来的做法，f-string 拼接后由 RotatingFileHandler 和控制台 handler 在事件循环线程写入
+- queue:     setup_logger 的 QueueHandler/QueueListener，%-style 延迟格式化
+- queue+10%: 同上，热点 INFO 日志按 LOG_SAMPLE_RATE=0.1 采样
+
+路由里 await asyncio.sleep(--io-ms) 代替数据库查询，事件循环在等待时后台线程才有机会写日志。
+--stall-every/--stall-ms 让文件 handler 每写 N 条就阻塞若干毫秒，模拟磁盘抖动或日志轮转。
+控制台输出重定向到 /dev/null。
+
+用法: uv run python -m benchmarks.bench_logging_throughput [--requests 20000] [--concurrency 50]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import queue
+import tempfile
+import time
+from logging.handlers import RotatingFileHandler
+
+from bluenote.config.config import Settings
+
+Settings.LOG_FILE = os.path.join(tempfile.mkdtemp(), "bench.log")
+Settings.LOG_MAX_BYTES = 1024 * 1024
+
+from fastapi import FastAPI
+
+from bluenote.utils import logger as logger_module
+
+
+class StallingFileHandler(RotatingFileHandler):
+    stall_every = 0
+    stall_seconds = 0.0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.records = 0
+
+    def emit(self, record):
+        self.records += 1
+        if self.stall_every and self.records % self.stall_every == 0:
+            time.sleep(self.stall_seconds)
+        super().emit(record)
+
+
+def output_handlers() -> list:
+    log_config = Settings.get_log_config()
+    file_handler = StallingFileHandler(
+        log_config["log_file"],
+        maxBytes=log_config["log_max_bytes"],
+        backupCount=log_config["log_backup_count"],
+        encoding="utf-8",
+    )
+    console_handler = logging.StreamHandler(open(os.devnull, "w"))
+    formatter = logging.Formatter(log_config["log_format"])
+    for handler in (file_handler, console_handler):
+        handler.setFormatter(formatter)
+    return [file_handler, console_handler]
+
+
+def create_bench_app(log: logging.Logger, lazy: bool, io_seconds: float) -> FastAPI:
+    app = FastAPI()
+    sampled = logger_module.SAMPLED
+
+    @app.get("/blogs/{blog_id}")
+    async def get_blog(blog_id: int):
+        if io_seconds:
+            await asyncio.sleep(io_seconds)
+        blog = {"id": blog_id, "title": f"blog {blog_id}", "view_count": 42}
+        if lazy:
+            log.info("[GET_BLOG] 收到获取博客请求: blog_id=%s", blog_id, extra=sampled)
+            log.info("[GET_BLOG] 博客浏览数已更新: blog_id=%s, view_count=%s", blog_id, blog["view_count"], extra=sampled)
+            log.info("[GET_BLOG] 返回博客数据: id=%s, title=%s", blog["id"], blog["title"], extra=sampled)
+            log.info("[GET_BLOG] 返回数据: %s", blog, extra=sampled)
+        else:
+            log.info(f"[GET_BLOG] 收到获取博客请求: blog_id={blog_id}")
+            log.info(f"[GET_BLOG] 博客浏览数已更新: blog_id={blog_id}, view_count={blog['view_count']}")
+            log.info(f"[GET_BLOG] 返回博客数据: id={blog['id']}, title={blog['title']}")
+            log.info(f"[GET_BLOG] 返回数据: {blog}")
+        return blog
+
+    return app
+
+
+async def run(app: FastAPI, requests: int, concurrency: int):
+    latencies = []
+
+    async def run_once(i: int):
+        path = f"/blogs/{i}"
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": b"",
+            "root_path": "",
+            "headers": [(b"host", b"bench")],
+            "client": ("127.0.0.1", 1234),
+            "server": ("bench", 80),
+        }
+        messages = [{"type": "http.request", "body": b"", "more_body": False}]
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await asyncio.Event().wait()
+
+        async def send(message):
+            pass
+
+        started = time.perf_counter()
+        await app(scope, receive, send)
+        latencies.append(time.perf_counter() - started)
+
+    async def worker(offset: int):
+        for i in range(offset, requests, concurrency):
+            await run_once(i)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(offset) for offset in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return elapsed, latencies[int(len(latencies) * 0.99) - 1]
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--io-ms", type=float, default=1.0)
+    parser.add_argument("--stall-every", type=int, default=0)
+    parser.add_argument("--stall-ms", type=float, default=20.0)
+    args = parser.parse_args()
+    StallingFileHandler.stall_every = args.stall_every
+    StallingFileHandler.stall_seconds = args.stall_ms / 1000
+
+    # 基准里自己搭建各模式的 handler，停掉 setup_logger 默认启动的监听器
+    logger_module.shutdown_logging()
+
+    for label in ("sync", "queue", "queue+10%"):
+        log = logging.getLogger(f"bench.{label}")
+        log.setLevel(logging.INFO)
+        log.propagate = False
+        listener = None
+        if label == "sync":
+            for handler in output_handlers():
+                log.addHandler(handler)
+        else:
+            queue_handler = logger_module.NonBlockingQueueHandler(queue.Queue(Settings.LOG_QUEUE_SIZE))
+            rate = 0.1 if label.endswith("10%") else 1.0
+            queue_handler.addFilter(logger_module.SamplingFilter(rate))
+            listener = logger_module.LogQueueListener(queue_handler.queue, *output_handlers())
+            listener.start()
+            log.addHandler(queue_handler)
+
+        app = create_bench_app(log, lazy=label != "sync", io_seconds=args.io_ms / 1000)
+        await run(app, 500, args.concurrency)
+        dropped_before = logger_module.log_records_dropped_total.value
+        elapsed, p99 = await run(app, args.requests, args.concurrency)
+        dropped = logger_module.log_records_dropped_total.value - dropped_before
+
+        if listener is not None:
+            drain_started = time.perf_counter()
+            listener.stop()
+            drain = time.perf_counter() - drain_started
+        else:
+            drain = 0.0
+        for handler in log.handlers + list(listener.handlers if listener else ()):
+            handler.close()
+
+        print(
+            f"{label:>10}: {args.requests / elapsed:8.0f} req/s, p99 {p99 * 1000:6.2f}ms, "
+            f"dropped {dropped}, drain after run {drain * 1000:.0f}ms"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
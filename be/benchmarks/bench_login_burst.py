@@ -0,0 +1,94 @@
+"""
+登录突发基准测试：并发登录时无关接口的延迟
+
+在一批并发登录（Argon2 校验）进行的同时，循环请求 GET /v1/blogs，
+统计其 p50/p99 延迟。对比在事件循环内直接哈希（--workers 0）与
+使用密码哈希线程池两种模式。
+
+用法: uv run python -m benchmarks.bench_login_burst [--logins 50] [--workers 4]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+import httpx
+
+from bluenote.config.config import settings
+
+
+async def run(workers: int, logins: int, probes: int):
+    # 每次运行使用新的临时数据库和新的线程池
+    db_path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    settings.__class__.DATABASE_URL = f"sqlite+aiosqlite:///{db_path}"
+    settings.__class__.PASSWORD_HASH_WORKERS = workers
+
+    from bluenote import security
+    security.password_hashing_pool = security.PasswordHashingPool(
+        max_workers=workers, max_pending=logins * 2
+    )
+
+    from bluenote.server import db
+    from bluenote.server.app import create_app, init_admin_user
+    from bluenote.routes import auth
+
+    # 所有登录来自同一个客户端地址，关闭登录限流
+    auth.login_rate_limit_config["enabled"] = False
+
+    db._engine = None
+    await db.init_db(settings.get_database_url())
+    await init_admin_user()
+    app = create_app()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        credentials = {
+            "username": settings.INIT_ADMIN_USERNAME,
+            "password": settings.INIT_ADMIN_PASSWORD,
+        }
+        latencies = []
+
+        async def login():
+            response = await client.post("/v1/auth/login", json=credentials)
+            assert response.status_code == 200, response.text
+
+        async def probe():
+            for _ in range(probes):
+                start = time.perf_counter()
+                response = await client.get("/v1/blogs")
+                latencies.append(time.perf_counter() - start)
+                assert response.status_code == 200, response.text
+                await asyncio.sleep(0.005)
+
+        start = time.perf_counter()
+        await asyncio.gather(probe(), *(login() for _ in range(logins)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    print(
+        f"workers={workers} logins={logins} total={elapsed * 1000:8.1f}ms "
+        f"GET /v1/blogs p50={p50:7.1f}ms p99={p99:7.1f}ms "
+        f"pool={security.password_hashing_pool.stats()}"
+    )
+    security.password_hashing_pool.shutdown()
+    await db.get_engine().dispose()
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--probes", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=settings.PASSWORD_HASH_WORKERS)
+    args = parser.parse_args()
+
+    await run(0, args.logins, args.probes)
+    await run(args.workers, args.logins, args.probes)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,94 @@
+"""
+中间件开销基准测试：每个请求经过中间件的额外耗时
+
+在一个只返回固定 JSON 的 FastAPI 应用上，直接以 ASGI 方式调用（不经过网络和 HTTP 客户端），
+对比无中间件、空的 BaseHTTPMiddleware（原 RequestTimeMiddleware 的结构）与 MetricsMiddleware。
+
+用法: uv run python -m benchmarks.bench_middleware_overhead [--requests 20000]
+"""
+
+import argparse
+import asyncio
+import time
+
+from fastapi import FastAPI
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from bluenote.api.middlewares import MetricsMiddleware
+
+
+class NoopHTTPMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        return await call_next(request)
+
+
+def create_bench_app(middleware=None) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: int):
+        return {"id": item_id}
+
+    if middleware is not None:
+        app.add_middleware(middleware)
+    return app
+
+
+async def run(app: FastAPI, requests: int) -> float:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/items/1",
+        "raw_path": b"/items/1",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 1234),
+        "server": ("bench", 80),
+    }
+
+    async def run_once():
+        messages = [{"type": "http.request", "body": b"", "more_body": False}]
+
+        async def receive():
+            # 请求体读完后客户端保持连接，直到响应结束
+            if messages:
+                return messages.pop()
+            await asyncio.Event().wait()
+
+        await app(dict(scope), receive, send)
+
+    async def send(message):
+        pass
+
+    for _ in range(200):
+        await run_once()
+    start = time.perf_counter()
+    for _ in range(requests):
+        await run_once()
+    return time.perf_counter() - start
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    baseline = None
+    for label, middleware in (
+        ("none", None),
+        ("BaseHTTPMiddleware", NoopHTTPMiddleware),
+        ("MetricsMiddleware", MetricsMiddleware),
+    ):
+        elapsed = await run(create_bench_app(middleware), args.requests)
+        per_request = elapsed / args.requests * 1e6
+        if baseline is None:
+            baseline = per_request
+        print(f"{label:>18}: {per_request:7.1f}us/request (+{per_request - baseline:5.1f}us)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,87 @@
+"""
+本地假 OpenAI 服务：实现 /v1/chat/completions（含流式），用于测试和基准测试
+
+每次补全按 --delay 秒等待，流式响应把 --chunks 段内容均匀分布在这段时间内。
+既可以单独运行，也可以通过 httpx.ASGITransport 直接挂到 OpenAIService 上。
+
+用法: uv run python -m benchmarks.fake_openai [--port 9100] [--delay 2] [--chunks 20]
+      OPENAI_BASE_URL=http://127.0.0.1:9100/v1 OPENAI_API_KEY=fake uv run bluenote
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+
+def create_fake_openai_app(delay: float = 2.0, chunks: int = 20) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "fake-model")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        words = [f"word{i} " for i in range(chunks)]
+
+        if not body.get("stream"):
+            await asyncio.sleep(delay)
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(words)},
+                    "finish_reason": "stop",
+                }],
+                "usage": {"prompt_tokens": 1, "completion_tokens": chunks, "total_tokens": chunks + 1},
+            }
+
+        async def events():
+            for word in words:
+                await asyncio.sleep(delay / chunks)
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+            if (body.get("stream_options") or {}).get("include_usage"):
+                usage_chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [],
+                    "usage": {"prompt_tokens": 1, "completion_tokens": chunks, "total_tokens": chunks + 1},
+                }
+                yield f"data: {json.dumps(usage_chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--delay", type=float, default=2.0)
+    parser.add_argument("--chunks", type=int, default=20)
+    args = parser.parse_args()
+    uvicorn.run(create_fake_openai_app(args.delay, args.chunks), host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
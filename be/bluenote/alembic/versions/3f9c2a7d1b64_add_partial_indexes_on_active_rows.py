@@ -0,0 +1,36 @@
+"""Add partial indexes on active (not soft deleted) rows
+
+Revision ID: 3f9c2a7d1b64
+Revises: 85edf7a928d1
+Create Date: 2026-10-19 10:12:41.208315
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9c2a7d1b64'
+down_revision: Union[str, None] = '85edf7a928d1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ACTIVE_INDEXES = [
+    ('ix_blogs_active_created_at', 'blogs', 'created_at'),
+    ('ix_photos_active_created_at', 'photos', 'created_at'),
+    ('ix_contacts_active_created_at', 'contacts', 'created_at'),
+    ('ix_users_active_username', 'users', 'username'),
+]
+
+
+def upgrade() -> None:
+    where = sa.text('deleted_at IS NULL')
+    for name, table, column in ACTIVE_INDEXES:
+        op.create_index(name, table, [column], unique=False,
+                        sqlite_where=where, postgresql_where=where)
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(ACTIVE_INDEXES):
+        op.drop_index(name, table_name=table)
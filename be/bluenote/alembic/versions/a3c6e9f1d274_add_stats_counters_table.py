@@ -0,0 +1,36 @@
+"""Add stats_counters table
+
+Revision ID: a3c6e9f1d274
+Revises: f4b9d2e6a813
+Create Date: 2026-10-19 20:12:37.604915
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+import bluenote.schemas.common
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3c6e9f1d274'
+down_revision: Union[str, None] = 'f4b9d2e6a813'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 计数器由服务启动时的对账写入
+    op.create_table(
+        'stats_counters',
+        sa.Column('scope', sqlmodel.sql.sqltypes.AutoString(length=20), nullable=False),
+        sa.Column('name', sqlmodel.sql.sqltypes.AutoString(length=50), nullable=False),
+        sa.Column('value', sa.Integer(), nullable=False),
+        sa.Column('updated_at', bluenote.schemas.common.UTCDateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('scope', 'name'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('stats_counters')
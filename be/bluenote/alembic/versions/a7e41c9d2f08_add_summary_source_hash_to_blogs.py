@@ -0,0 +1,27 @@
+"""Add summary_source_hash to blogs
+
+Revision ID: a7e41c9d2f08
+Revises: 3f9c2a7d1b64
+Create Date: 2026-10-19 14:03:27.518904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7e41c9d2f08'
+down_revision: Union[str, None] = '3f9c2a7d1b64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('blogs', sa.Column('summary_source_hash', sqlmodel.sql.sqltypes.AutoString(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('blogs', 'summary_source_hash')
@@ -0,0 +1,33 @@
+"""Add unique partial index on blogs title
+
+Revision ID: b7d2f5a8c316
+Revises: a3c6e9f1d274
+Create Date: 2026-10-19 20:48:03.215774
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d2f5a8c316'
+down_revision: Union[str, None] = 'a3c6e9f1d274'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 先前查询后插入的检查有竞态，已有的重名博客保留最早的一篇，其余在标题后加上 id
+    op.execute(
+        "UPDATE blogs SET title = title || ' (' || CAST(id AS VARCHAR) || ')' "
+        "WHERE deleted_at IS NULL AND id NOT IN "
+        "(SELECT MIN(id) FROM blogs WHERE deleted_at IS NULL GROUP BY title)"
+    )
+    where = sa.text('deleted_at IS NULL')
+    op.create_index('ix_blogs_active_title', 'blogs', ['title'], unique=True,
+                    sqlite_where=where, postgresql_where=where)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_blogs_active_title', table_name='blogs')
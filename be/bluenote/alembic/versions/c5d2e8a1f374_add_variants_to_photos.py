@@ -0,0 +1,26 @@
+"""Add variants to photos
+
+Revision ID: c5d2e8a1f374
+Revises: a7e41c9d2f08
+Create Date: 2026-10-19 17:32:10.284117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5d2e8a1f374'
+down_revision: Union[str, None] = 'a7e41c9d2f08'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('photos', sa.Column('variants', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('photos', 'variants')
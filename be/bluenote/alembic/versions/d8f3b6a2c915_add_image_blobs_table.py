@@ -0,0 +1,38 @@
+"""Add image_blobs table
+
+Revision ID: d8f3b6a2c915
+Revises: c5d2e8a1f374
+Create Date: 2026-10-19 18:05:42.518330
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+import bluenote.schemas.common
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8f3b6a2c915'
+down_revision: Union[str, None] = 'c5d2e8a1f374'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 已有文件和引用数由首次垃圾回收时的对账登记
+    op.create_table(
+        'image_blobs',
+        sa.Column('name', sqlmodel.sql.sqltypes.AutoString(length=80), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('content_type', sqlmodel.sql.sqltypes.AutoString(length=50), nullable=True),
+        sa.Column('ref_count', sa.Integer(), nullable=False),
+        sa.Column('created_at', bluenote.schemas.common.UTCDateTime(), nullable=False),
+        sa.Column('updated_at', bluenote.schemas.common.UTCDateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('name'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('image_blobs')
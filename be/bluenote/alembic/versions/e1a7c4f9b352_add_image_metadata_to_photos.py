@@ -0,0 +1,39 @@
+"""Add image metadata to photos
+
+Revision ID: e1a7c4f9b352
+Revises: d8f3b6a2c915
+Create Date: 2026-10-19 18:41:07.903215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e1a7c4f9b352'
+down_revision: Union[str, None] = 'd8f3b6a2c915'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('photos', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('width', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('height', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('orientation', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('latitude', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('longitude', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('dominant_color', sqlmodel.sql.sqltypes.AutoString(length=7), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('photos', schema=None) as batch_op:
+        batch_op.drop_column('dominant_color')
+        batch_op.drop_column('longitude')
+        batch_op.drop_column('latitude')
+        batch_op.drop_column('orientation')
+        batch_op.drop_column('height')
+        batch_op.drop_column('width')
@@ -0,0 +1,37 @@
+"""Add rate_limits table
+
+Revision ID: e6b3a9d4c127
+Revises: b7d2f5a8c316
+Create Date: 2026-10-19 22:41:09.337218
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6b3a9d4c127'
+down_revision: Union[str, None] = 'b7d2f5a8c316'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'rate_limits',
+        sa.Column('key', sqlmodel.sql.sqltypes.AutoString(length=300), nullable=False),
+        sa.Column('window_start', sa.Float(), nullable=False),
+        sa.Column('previous', sa.Integer(), nullable=False),
+        sa.Column('current', sa.Integer(), nullable=False),
+        sa.Column('locked_until', sa.Float(), nullable=True),
+        sa.PrimaryKeyConstraint('key'),
+    )
+    op.create_index(op.f('ix_rate_limits_window_start'), 'rate_limits', ['window_start'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_rate_limits_window_start'), table_name='rate_limits')
+    op.drop_table('rate_limits')
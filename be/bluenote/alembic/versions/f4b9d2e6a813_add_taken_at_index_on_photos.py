@@ -0,0 +1,27 @@
+"""Add partial index on photos taken_at
+
+Revision ID: f4b9d2e6a813
+Revises: e1a7c4f9b352
+Create Date: 2026-10-19 19:12:36.471902
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4b9d2e6a813'
+down_revision: Union[str, None] = 'e1a7c4f9b352'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    where = sa.text('deleted_at IS NULL')
+    op.create_index('ix_photos_active_taken_at', 'photos', ['taken_at', 'id'], unique=False,
+                    sqlite_where=where, postgresql_where=where)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_photos_active_taken_at', table_name='photos')
@@ -62,6 +62,9 @@ InternalServerErrorException = http_exception_factory(
     "InternalServerError",
     "Internal server error",
 )
+PayloadTooLargeException = http_exception_factory(
+    status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, "PayloadTooLarge", "Payload too large"
+)
 ServiceUnavailableException = http_exception_factory(
     status.HTTP_503_SERVICE_UNAVAILABLE, "ServiceUnavailable", "Service unavailable"
 )
@@ -1,13 +1,83 @@
-from datetime import datetime, timezone
+import time
 import logging  # 改为导入标准库的 logging
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from bluenote.server.instrumentation import QueryStats, current_query_stats, record_request
+from bluenote.utils import metrics
 
 logger = logging.getLogger(__name__)
 
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+http_requests_in_flight = metrics.gauge(
+    "http_requests_in_flight", "HTTP requests currently being served"
+)
+http_requests_total = metrics.counter(
+    "http_requests_total", "HTTP requests served", labelnames=("method", "route", "status")
+)
+http_request_duration_seconds = metrics.histogram(
+    "http_request_duration_seconds",
+    "Time from receiving an HTTP request to sending the last byte of its response",
+    labelnames=("method", "route"),
+)
+http_response_size_bytes = metrics.histogram(
+    "http_response_size_bytes",
+    "Size of HTTP response bodies",
+    buckets=SIZE_BUCKETS,
+    labelnames=("method", "route"),
+)
+
+
+class MetricsMiddleware:
+    """纯 ASGI 中间件：按路由记录请求耗时、响应大小和进行中的请求数
+
+    路由取匹配到的路径模板（如 /v1/blogs/{blog_id}），未匹配的请求记为 unmatched，
+    避免标签数量随 URL 增长。响应头中附加 Server-Timing：收到请求到开始响应的耗时，
+    以及在此之前执行的 SQL 语句数和耗时。
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started_at = time.perf_counter()
+        status_code = 500
+        response_size = 0
+        query_stats = QueryStats(scope["path"])
+        query_stats_token = current_query_stats.set(query_stats)
+
+        async def send_with_metrics(message: Message):
+            nonlocal status_code, response_size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                duration_ms = (time.perf_counter() - started_at) * 1000
+                headers = list(message.get("headers", []))
+                server_timing = (
+                    f'app;dur={duration_ms:.1f}, '
+                    f'db;dur={query_stats.duration * 1000:.1f};desc="{query_stats.count} queries"'
+                )
+                headers.append((b"server-timing", server_timing.encode()))
+                message = {**message, "headers": headers}
+            elif message["type"] == "http.response.body":
+                response_size += len(message.get("body", b""))
+            await send(message)
 
-class RequestTimeMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        request.state.start_time = datetime.now(timezone.utc)
-        response = await call_next(request)
-        return response
\ No newline at end of file
+        http_requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            current_query_stats.reset(query_stats_token)
+            http_requests_in_flight.dec()
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            http_requests_total.labels(method, route_path, str(status_code)).inc()
+            http_request_duration_seconds.labels(method, route_path).observe(
+                time.perf_counter() - started_at
+            )
+            http_response_size_bytes.labels(method, route_path).observe(response_size)
+            record_request(query_stats, route_path)
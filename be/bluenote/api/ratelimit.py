@@ -0,0 +1,290 @@
+import ipaddress
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from sqlalchemy import case, delete, insert, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from bluenote.schemas.ratelimits import RateLimitCounter
+from bluenote.server.db import get_engine
+
+
+def resolve_client_ip(peer: Optional[str], forwarded_for: Optional[str], trusted_proxies: Iterable[str]) -> str:
+    """Return the address of the client behind any trusted reverse proxies.
+
+    `X-Forwarded-For` is only believed when the direct peer is a trusted
+    proxy; its entries are then read right to left, skipping trusted proxies,
+    and the first untrusted one is the client. Anything left of it may have
+    been written by the client itself and is ignored.
+    """
+    networks = [ipaddress.ip_network(proxy, strict=False) for proxy in trusted_proxies]
+
+    def trusted(address: str) -> bool:
+        try:
+            ip = ipaddress.ip_address(address)
+        except ValueError:
+            return False
+        return any(ip in network for network in networks)
+
+    if not peer:
+        return "unknown"
+    if not forwarded_for or not trusted(peer):
+        return peer
+    client = peer
+    for address in reversed([part.strip() for part in forwarded_for.split(",") if part.strip()]):
+        client = address
+        if not trusted(address):
+            break
+    return client
+
+
+class RateLimitStore(ABC):
+    """Storage backend for sliding-window counters and lockouts.
+
+    Counters use the sliding-window approximation: each key keeps the count
+    of the current fixed window and of the previous one, and the previous
+    count is weighted by how much of it still overlaps the sliding window.
+    The in-memory store only limits a single process; the database store
+    enforces the limits across all workers.
+    """
+
+    @abstractmethod
+    async def retry_after(self, key: str, limit: int, window: float) -> float:
+        """Return how many seconds until another hit on `key` fits under `limit`, 0 if it already does."""
+
+    @abstractmethod
+    async def hit(self, key: str, window: float):
+        ...
+
+    @abstractmethod
+    async def reset(self, key: str):
+        ...
+
+    @abstractmethod
+    async def lock(self, key: str, seconds: float):
+        ...
+
+    @abstractmethod
+    async def lock_remaining(self, key: str) -> float:
+        """Return the seconds left on the lock of `key`, 0 if it is not locked."""
+
+
+def _shift(start: float, previous: int, current: int, new_start: float, window: float) -> tuple:
+    """Move a `(start, previous, current)` window state forward to `new_start`."""
+    if start == new_start:
+        return start, previous, current
+    # Moving one window ahead shifts current into previous, moving further clears both
+    return new_start, current if new_start - start == window else 0, 0
+
+
+def _retry_after(start: float, previous: int, current: int, limit: int, window: float, now: float) -> float:
+    # The next hit fits once previous * (1 - elapsed / window) + current <= limit - 1
+    budget = limit - 1
+    if current <= budget:
+        if previous <= budget - current:
+            return 0.0
+        elapsed = window * (1 - (budget - current) / previous)
+        return max(0.0, start + elapsed - now)
+    elapsed = window * (1 - budget / current)
+    return max(0.0, start + window + elapsed - now)
+
+
+class MemoryRateLimitStore(RateLimitStore):
+    """In-process store, least recently used keys are evicted past `maxsize`."""
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        # key -> [current window start, previous window count, current window count]
+        self._windows: "OrderedDict[str, list]" = OrderedDict()
+        self._locks: "OrderedDict[str, float]" = OrderedDict()
+
+    def _window(self, key: str, window: float, now: float) -> list:
+        start = now - now % window
+        state = self._windows.get(key)
+        if state is None:
+            state = [start, 0, 0]
+            self._windows[key] = state
+        elif state[0] != start:
+            state[:] = _shift(*state, start, window)
+        self._windows.move_to_end(key)
+        while len(self._windows) > self.maxsize:
+            self._windows.popitem(last=False)
+        return state
+
+    async def retry_after(self, key: str, limit: int, window: float) -> float:
+        if key not in self._windows:
+            return 0.0
+        now = time.time()
+        return _retry_after(*self._window(key, window, now), limit, window, now)
+
+    async def hit(self, key: str, window: float):
+        self._window(key, window, time.time())[2] += 1
+
+    async def reset(self, key: str):
+        self._windows.pop(key, None)
+        self._locks.pop(key, None)
+
+    async def lock(self, key: str, seconds: float):
+        self._locks[key] = time.time() + seconds
+        self._locks.move_to_end(key)
+        while len(self._locks) > self.maxsize:
+            self._locks.popitem(last=False)
+
+    async def lock_remaining(self, key: str) -> float:
+        until = self._locks.get(key)
+        if until is None:
+            return 0.0
+        remaining = until - time.time()
+        if remaining <= 0:
+            del self._locks[key]
+            return 0.0
+        return remaining
+
+
+class DatabaseRateLimitStore(RateLimitStore):
+    """Store backed by the `rate_limits` table, shared by every worker process.
+
+    Each hit is a single UPDATE that shifts the window and increments the
+    counter in the database, so concurrent hits from different workers are
+    never lost. The first hit on a key inserts its row; an insert that loses
+    the race to another worker falls back to the UPDATE. Rows whose window
+    and lock have both expired are deleted at most every `prune_seconds`
+    seconds, after `retention_seconds` without a hit.
+    """
+
+    def __init__(self, retention_seconds: float, prune_seconds: float = 60.0):
+        self.retention_seconds = retention_seconds
+        self.prune_seconds = prune_seconds
+        self._pruned_at = 0.0
+
+    @staticmethod
+    def _session() -> AsyncSession:
+        return AsyncSession(get_engine())
+
+    async def _row(self, key: str) -> Optional[RateLimitCounter]:
+        async with self._session() as session:
+            return await session.get(RateLimitCounter, key)
+
+    async def _upsert(self, key: str, values: dict, row: dict):
+        """Run the UPDATE `values` on `key`, inserting `row` first if the key has no row yet."""
+        statement = update(RateLimitCounter).where(RateLimitCounter.key == key).values(**values)
+        async with self._session() as session:
+            result = await session.exec(statement)
+            if not result.rowcount:
+                try:
+                    await session.exec(insert(RateLimitCounter).values(key=key, **row))
+                    await session.commit()
+                    return
+                except IntegrityError:
+                    await session.rollback()
+                    await session.exec(statement)
+            await session.commit()
+
+    async def retry_after(self, key: str, limit: int, window: float) -> float:
+        row = await self._row(key)
+        if row is None:
+            return 0.0
+        now = time.time()
+        state = _shift(row.window_start, row.previous, row.current, now - now % window, window)
+        return _retry_after(*state, limit, window, now)
+
+    async def hit(self, key: str, window: float):
+        now = time.time()
+        start = now - now % window
+        # SET expressions all read the values from before the update, as in _shift
+        await self._upsert(
+            key,
+            {
+                "previous": case(
+                    (RateLimitCounter.window_start == start, RateLimitCounter.previous),
+                    (RateLimitCounter.window_start == start - window, RateLimitCounter.current),
+                    else_=0,
+                ),
+                "current": case(
+                    (RateLimitCounter.window_start == start, RateLimitCounter.current + 1),
+                    else_=1,
+                ),
+                "window_start": start,
+            },
+            {"window_start": start, "previous": 0, "current": 1},
+        )
+        if now - self._pruned_at >= self.prune_seconds:
+            self._pruned_at = now
+            await self.prune(now)
+
+    async def reset(self, key: str):
+        async with self._session() as session:
+            await session.exec(delete(RateLimitCounter).where(RateLimitCounter.key == key))
+            await session.commit()
+
+    async def lock(self, key: str, seconds: float):
+        until = time.time() + seconds
+        await self._upsert(key, {"locked_until": until}, {"locked_until": until})
+
+    async def lock_remaining(self, key: str) -> float:
+        row = await self._row(key)
+        if row is None or row.locked_until is None:
+            return 0.0
+        return max(0.0, row.locked_until - time.time())
+
+    async def prune(self, now: Optional[float] = None):
+        """Delete rows that have neither a recent window nor an active lock."""
+        now = time.time() if now is None else now
+        async with self._session() as session:
+            await session.exec(
+                delete(RateLimitCounter).where(
+                    RateLimitCounter.window_start < now - self.retention_seconds,
+                    or_(RateLimitCounter.locked_until.is_(None), RateLimitCounter.locked_until < now),
+                )
+            )
+            await session.commit()
+
+
+class LoginRateLimiter:
+    """Throttle login attempts per client IP and lock out usernames after repeated failures.
+
+    Every attempt counts against the IP, only failed attempts count against
+    the username. `check` must run before the password is verified so that
+    rejected attempts never reach the hasher.
+    """
+
+    def __init__(
+        self,
+        store: RateLimitStore,
+        ip_limit: int,
+        username_limit: int,
+        window_seconds: float,
+        lockout_seconds: float,
+    ):
+        self.store = store
+        self.ip_limit = ip_limit
+        self.username_limit = username_limit
+        self.window_seconds = window_seconds
+        self.lockout_seconds = lockout_seconds
+        self.rejected = 0
+
+    async def check(self, ip: str, username: str) -> Optional[int]:
+        """Record an attempt, return the Retry-After seconds if it must be rejected."""
+        ip_key = f"login:ip:{ip}"
+        user_key = f"login:user:{username}"
+        retry_after = max(
+            await self.store.lock_remaining(user_key),
+            await self.store.retry_after(ip_key, self.ip_limit, self.window_seconds),
+        )
+        if retry_after > 0:
+            self.rejected += 1
+            return max(1, int(retry_after + 0.999))
+        await self.store.hit(ip_key, self.window_seconds)
+        return None
+
+    async def record_failure(self, username: str):
+        user_key = f"login:user:{username}"
+        await self.store.hit(user_key, self.window_seconds)
+        if await self.store.retry_after(user_key, self.username_limit, self.window_seconds) > 0:
+            await self.store.lock(user_key, self.lockout_seconds)
+
+    async def record_success(self, username: str):
+        await self.store.reset(f"login:user:{username}")
@@ -0,0 +1,201 @@
+import asyncio
+import json
+from typing import Any, AsyncIterator, Optional, Set
+
+from fastapi import Request
+
+from bluenote.server.bus import event_bus
+from bluenote.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+}
+
+_END = object()
+_WAKE = object()
+
+# Upstream producers that were cancelled but are still closing their connection
+_closing_producers: Set[asyncio.Task] = set()
+
+# Queues of the relays in flight, woken up when draining starts
+_relay_queues: Set[asyncio.Queue] = set()
+
+# Event loop time by which relays still running at shutdown must end
+_drain_deadline: Optional[float] = None
+
+# Time left after ending the relays for the final events to reach the clients
+DRAIN_MARGIN_SECONDS = 1.0
+
+
+def sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def begin_drain(grace_seconds: float):
+    """Start draining streams before the server stops.
+
+    Relays in flight keep streaming until `grace_seconds` (less a margin) have
+    passed, then end with an `error` event the client can retry on, instead of
+    being cut off when the server gives up waiting. Event bus subscriptions
+    are told to end right away.
+    """
+    global _drain_deadline
+    _drain_deadline = asyncio.get_running_loop().time() + max(0.0, grace_seconds - DRAIN_MARGIN_SECONDS)
+    for queue in _relay_queues:
+        try:
+            queue.put_nowait(_WAKE)
+        except asyncio.QueueFull:
+            # a full queue means the relay is not waiting on it
+            pass
+    event_bus.drain()
+    logger.info("[SSE] 开始关闭流式响应: relays=%s, grace=%ss", len(_relay_queues), grace_seconds)
+
+
+class StreamRelay:
+    """Relay a stream of text deltas to a client as Server-Sent Events.
+
+    Deltas are coalesced into one `delta` event once `max_chars` are buffered
+    or `flush_interval` seconds after the first buffered delta, whichever
+    comes first. Upstream is read by a separate task through a queue of
+    `queue_size` deltas, so a slow client slows down the upstream read
+    instead of buffering without bound. The client is checked for a
+    disconnect every `disconnect_poll_interval` seconds, also while
+    upstream is stalled, and when it has gone away the upstream iterator is
+    closed right away. The stream ends with a `done`
+    event carrying usage and timing, or an `error` event (also sent when the
+    server shuts down before the stream finishes, see `begin_drain`).
+    """
+
+    def __init__(
+        self,
+        max_chars: int = 64,
+        flush_interval: float = 0.05,
+        queue_size: int = 64,
+        disconnect_poll_interval: float = 0.5,
+    ):
+        self.max_chars = max_chars
+        self.flush_interval = flush_interval
+        self.queue_size = queue_size
+        self.disconnect_poll_interval = disconnect_poll_interval
+
+    async def relay(
+        self,
+        request: Request,
+        deltas: AsyncIterator[str],
+        usage: Optional[dict] = None,
+        started_at: Optional[float] = None,
+    ) -> AsyncIterator[str]:
+        """`started_at` is the event loop time the timing metadata is measured from."""
+        loop = asyncio.get_running_loop()
+        if started_at is None:
+            started_at = loop.time()
+        first_delta_at = None
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        producer = asyncio.create_task(self._produce(deltas, queue))
+        disconnected = asyncio.create_task(self._wait_disconnected(request))
+        _relay_queues.add(queue)
+
+        buffer = []
+        buffered = 0
+        flush_at = None
+        frames = 0
+        delta_count = 0
+        chars = 0
+        try:
+            while True:
+                now = loop.time()
+                if _drain_deadline is not None and now >= _drain_deadline:
+                    logger.warning("[SSE] 服务关闭，结束未完成的流式响应: frames=%s", frames)
+                    if buffer:
+                        yield sse_event("delta", {"content": "".join(buffer)})
+                    yield sse_event("error", {"message": "Server is shutting down, please retry"})
+                    return
+                wake_at = min((t for t in (flush_at, _drain_deadline) if t is not None), default=None)
+                timeout = None if wake_at is None else max(0.0, wake_at - now)
+                if not queue.empty():
+                    item = queue.get_nowait()
+                else:
+                    # Wait for upstream and the client together, so a client that leaves while
+                    # upstream is stalled releases its upstream request right away
+                    getter = asyncio.ensure_future(queue.get())
+                    await asyncio.wait((getter, disconnected), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                    if not getter.done():
+                        # Cancelling a pending get leaves its item in the queue
+                        getter.cancel()
+                        item = None
+                    else:
+                        item = getter.result()
+                    if disconnected.done():
+                        logger.info("[SSE] 客户端已断开，取消上游请求: frames=%s", frames)
+                        return
+                if item is _WAKE:
+                    continue
+
+                if isinstance(item, BaseException):
+                    logger.error("[SSE] 上游流式响应失败: %s", item)
+                    yield sse_event("error", {"message": str(item)})
+                    return
+                if isinstance(item, str):
+                    if first_delta_at is None:
+                        first_delta_at = loop.time()
+                    if not buffer:
+                        flush_at = loop.time() + self.flush_interval
+                    buffer.append(item)
+                    buffered += len(item)
+                    delta_count += 1
+                    if buffered < self.max_chars:
+                        continue
+
+                if buffer:
+                    if disconnected.done():
+                        logger.info("[SSE] 客户端已断开，取消上游请求: frames=%s", frames)
+                        return
+                    yield sse_event("delta", {"content": "".join(buffer)})
+                    frames += 1
+                    chars += buffered
+                    buffer = []
+                    buffered = 0
+                    flush_at = None
+                if item is _END:
+                    break
+
+            finished_at = loop.time()
+            yield sse_event("done", {
+                "usage": usage or None,
+                "timing": {
+                    "first_delta_ms": None if first_delta_at is None
+                    else round((first_delta_at - started_at) * 1000, 1),
+                    "total_ms": round((finished_at - started_at) * 1000, 1),
+                },
+                "frames": frames,
+                "deltas": delta_count,
+                "chars": chars,
+            })
+        finally:
+            _relay_queues.discard(queue)
+            disconnected.cancel()
+            if not producer.done():
+                # Not awaited: this generator may itself be getting cancelled
+                producer.cancel()
+                _closing_producers.add(producer)
+                producer.add_done_callback(_closing_producers.discard)
+
+    async def _wait_disconnected(self, request: Request):
+        while not await request.is_disconnected():
+            await asyncio.sleep(self.disconnect_poll_interval)
+
+    @staticmethod
+    async def _produce(deltas: AsyncIterator[str], queue: asyncio.Queue):
+        try:
+            async for delta in deltas:
+                await queue.put(delta)
+            await queue.put(_END)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await queue.put(e)
+        finally:
+            await deltas.aclose()
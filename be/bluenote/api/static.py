@@ -0,0 +1,204 @@
+import os
+import re
+import stat
+from email.utils import formatdate
+from mimetypes import guess_type
+from typing import Mapping, Optional, Tuple
+
+import anyio
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+# Uploads are named by the SHA-256 of their content (`<sha256>.<ext>`), and
+# generated variants by the original's hash plus width (`<sha256>.w640.webp`).
+HASHED_NAME_PATTERN = re.compile(r"^[0-9a-f]{64}(\.w\d+)?\.[a-z0-9]+$")
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, max-age=0, must-revalidate"
+
+# Precompressed siblings served when the client accepts the encoding, in order of preference
+PRECOMPRESSED_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def parse_range(value: str, size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single `bytes=` range into an inclusive (start, end) pair.
+
+    Returns None when the header should be ignored and the whole file sent
+    (malformed, or several ranges). Raises ValueError when the range lies
+    outside the file, which the caller turns into 416.
+    """
+    match = RANGE_PATTERN.match(value.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError(value)
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or (last and int(last) < start):
+        raise ValueError(value)
+    return start, end
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # weak comparison, as If-None-Match requires
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return etag in tags
+
+
+def _accepted_encodings(header: Optional[str]) -> set:
+    accepted = set()
+    for item in (header or "").split(","):
+        coding, _, params = item.partition(";")
+        params = params.replace(" ", "")
+        if params.startswith("q="):
+            try:
+                if float(params[2:]) <= 0:
+                    continue
+            except ValueError:
+                pass
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+def _stat_file(path: str) -> Optional[os.stat_result]:
+    try:
+        result = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    return result if stat.S_ISREG(result.st_mode) else None
+
+
+def select_representation(
+    path: str, accept_encoding: Optional[str]
+) -> Optional[Tuple[str, os.stat_result, Optional[str]]]:
+    """Pick the file to send for `path`: a precompressed sibling when the client
+    accepts its encoding, else the file itself. Blocking, run in a thread."""
+    accepted = _accepted_encodings(accept_encoding)
+    for encoding, suffix in PRECOMPRESSED_ENCODINGS:
+        if encoding in accepted:
+            stat_result = _stat_file(path + suffix)
+            if stat_result is not None:
+                return path + suffix, stat_result, encoding
+    stat_result = _stat_file(path)
+    if stat_result is None:
+        return None
+    return path, stat_result, None
+
+
+class StaticFileResponse(Response):
+    """Send a file, or one byte range of it, with validators and cache headers.
+
+    Content-addressed names get an ETag derived from the name and an
+    immutable Cache-Control, so browsers and CDNs never revalidate them;
+    other files fall back to an mtime/size ETag and revalidate every time.
+    If-None-Match answers 304 and If-Range is honoured. When the server
+    implements the ASGI `http.response.pathsend` extension the whole-file
+    case is handed to it to send with sendfile(2); otherwise the file is read
+    in `chunk_size` pieces off the event loop.
+    """
+
+    chunk_size = 256 * 1024
+
+    def __init__(
+        self,
+        path: str,
+        name: str,
+        stat_result: os.stat_result,
+        request_headers: Mapping[str, str],
+        encoding: Optional[str] = None,
+        method: str = "GET",
+    ):
+        self.path = path
+        self.background = None
+        self.send_header_only = method.upper() == "HEAD"
+        self.media_type = guess_type(name)[0] or "application/octet-stream"
+        self.range: Optional[Tuple[int, int]] = None
+        size = stat_result.st_size
+
+        hashed = HASHED_NAME_PATTERN.match(name) is not None
+        if hashed:
+            tag = name
+        else:
+            tag = f"{int(stat_result.st_mtime_ns)}-{size}"
+        if encoding:
+            tag = f"{tag}-{encoding}"
+        etag = f'"{tag}"'
+
+        self.init_headers(
+            {
+                "etag": etag,
+                "last-modified": formatdate(stat_result.st_mtime, usegmt=True),
+                "cache-control": IMMUTABLE_CACHE_CONTROL if hashed else REVALIDATE_CACHE_CONTROL,
+                "accept-ranges": "bytes",
+                "vary": "Accept-Encoding",
+            }
+        )
+        if encoding:
+            self.headers["content-encoding"] = encoding
+
+        if etag_matches(request_headers.get("if-none-match"), etag):
+            self.status_code = 304
+            self.send_header_only = True
+            del self.headers["content-type"]
+            return
+
+        range_header = request_headers.get("range")
+        if_range = request_headers.get("if-range")
+        if range_header and (if_range is None or if_range.strip() == etag):
+            try:
+                self.range = parse_range(range_header, size)
+            except ValueError:
+                self.status_code = 416
+                self.send_header_only = True
+                self.headers["content-range"] = f"bytes */{size}"
+                self.headers["content-length"] = "0"
+                return
+
+        if self.range is not None:
+            start, end = self.range
+            self.status_code = 206
+            self.headers["content-range"] = f"bytes {start}-{end}/{size}"
+            self.headers["content-length"] = str(end - start + 1)
+        else:
+            self.status_code = 200
+            self.headers["content-length"] = str(size)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if self.send_header_only:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        if self.range is None and "http.response.pathsend" in scope.get("extensions", {}):
+            await send({"type": "http.response.pathsend", "path": self.path})
+            return
+
+        start, end = self.range if self.range is not None else (0, int(self.headers["content-length"]) - 1)
+        remaining = end - start + 1
+        if remaining <= 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            if start:
+                await file.seek(start)
+            while remaining > 0:
+                chunk = await file.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    # the file shrank underneath us; end the body rather than hang
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        if remaining > 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
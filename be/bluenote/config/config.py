@@ -1,6 +1,9 @@
 import os
 from typing import Optional
 
+# WorkerSupervisor 通过这个环境变量把 worker 的编号（0 到 SERVER_WORKERS-1）传给 worker 进程
+WORKER_ID_ENV = "BLUENOTE_WORKER_ID"
+
 class Settings:
     """应用配置类"""
     
@@ -9,15 +12,99 @@ class Settings:
     PORT: int = 8000
     RELOAD: bool = True
     LOG_LEVEL: str = "info"
+    # 运行模式：development 为单进程热重载，production 为多 worker 进程
+    SERVER_MODE: str = os.getenv("SERVER_MODE", "development")
+    # production 模式的 worker 进程数，默认与 CPU 核数相同
+    SERVER_WORKERS: int = os.cpu_count() or 1
+    # worker 处理这么多请求后重启（加上随机抖动，避免同时重启），0 表示不重启
+    SERVER_MAX_REQUESTS: int = 10000
+    SERVER_MAX_REQUESTS_JITTER: int = 1000
+    # 收到 SIGTERM 后等待进行中的请求和流式响应结束的时间，应大于 AI 请求的截止时间
+    SERVER_GRACEFUL_TIMEOUT_SECONDS: int = 65
+    # 在主进程中导入应用后再创建 worker（需要 gunicorn），worker 之间共享导入的模块
+    SERVER_PRELOAD: bool = True
+    # worker 启动失败或异常退出后按指数退避重启，连续失败这么多次后停止服务
+    SERVER_MAX_WORKER_CRASHES: int = 5
+    # worker 之间协调用的锁文件目录：启动时建表、选出运行定期任务的 worker、图片落盘与回收互斥、用户缓存失效、汇总指标
+    SERVER_LOCK_DIR: str = "run"
     
     # 日志配置
     LOG_FILE: str = "logs/bluenote.log"
     LOG_FORMAT: str = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
     LOG_MAX_BYTES: int = 10 * 1024 * 1024  # 10MB
     LOG_BACKUP_COUNT: int = 5
+    # 输出为每行一条 JSON，便于日志系统采集
+    LOG_JSON: bool = False
+    # 待写日志队列长度，写入跟不上时丢弃新日志而不阻塞请求
+    LOG_QUEUE_SIZE: int = 10000
+    # 热点路径 INFO 日志的采样比例，1.0 表示全部记录
+    LOG_SAMPLE_RATE: float = 1.0
     
     # 数据库配置
     DATABASE_URL: str = "sqlite+aiosqlite:///../db/bluenote.db"
+    # 启动时是否用 create_all 建表；表结构由 Alembic 迁移管理时可关闭，省去启动时的检查
+    DB_CREATE_ALL: bool = True
+
+    # 数据库查询监控：慢查询阈值（毫秒）、单个请求内同一语句重复多少次视为 N+1
+    DB_SLOW_QUERY_MS: float = 200.0
+    DB_N_PLUS_ONE_THRESHOLD: int = 10
+
+    # 软删除清理配置：墓碑保留天数、清理间隔、每批删除行数
+    SOFT_DELETE_RETENTION_DAYS: int = 30
+    SOFT_DELETE_PURGE_INTERVAL_SECONDS: int = 6 * 60 * 60
+    SOFT_DELETE_PURGE_BATCH_SIZE: int = 500
+
+    # OpenAI 配置：密钥和服务地址从环境变量读取
+    OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
+    OPENAI_BASE_URL: str = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+    OPENAI_TIMEOUT: float = 60.0
+    OPENAI_DEFAULT_MODEL: str = os.getenv("OPENAI_DEFAULT_MODEL", "gpt-4o-mini")
+    OPENAI_MAX_TOKENS: int = 1024
+    OPENAI_TEMPERATURE: float = 0.7
+    # 共享连接池大小、同时进行的补全请求数、最大排队数、每个请求的截止秒数（含排队时间）
+    OPENAI_MAX_CONNECTIONS: int = 100
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    OPENAI_MAX_CONCURRENT_REQUESTS: int = 16
+    OPENAI_MAX_QUEUED_REQUESTS: int = 256
+    OPENAI_REQUEST_DEADLINE_SECONDS: float = 60.0
+    # 流式响应转发：累积到多少字符或等待多少毫秒就发送一帧、上游与客户端之间最多缓冲的片段数、
+    # 等待上游时每隔多少毫秒检查一次客户端是否已断开
+    OPENAI_STREAM_FRAME_MAX_CHARS: int = 64
+    OPENAI_STREAM_FLUSH_INTERVAL_MS: int = 50
+    OPENAI_STREAM_QUEUE_SIZE: int = 64
+    OPENAI_STREAM_DISCONNECT_POLL_MS: int = 500
+    # 补全结果缓存：内存条目数、过期秒数、磁盘目录（为空则只用内存）和磁盘容量上限
+    OPENAI_CACHE_ENABLED: bool = True
+    OPENAI_CACHE_MEMORY_MAX_ENTRIES: int = 512
+    OPENAI_CACHE_TTL_SECONDS: int = 24 * 60 * 60
+    OPENAI_CACHE_DIR: str = "cache/completions"
+    OPENAI_CACHE_DISK_MAX_BYTES: int = 100 * 1024 * 1024
+
+    # 博客摘要自动生成：是否启用（还需配置 OPENAI_API_KEY）、事件防抖秒数、送入模型的最大内容字符数
+    BLOG_SUMMARY_ENABLED: bool = True
+    BLOG_SUMMARY_DEBOUNCE_SECONDS: float = 30.0
+    BLOG_SUMMARY_MAX_CONTENT_CHARS: int = 8000
+
+    # 图片上传：保存目录和对外 URL 前缀、每次写盘的块大小、单个文件上限、未完成的断点续传保留秒数、
+    # 没有照片引用的文件保留多少秒后被回收
+    UPLOAD_DIR: str = "imgs"
+    UPLOAD_URL_PREFIX: str = "/imgs"
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024
+    UPLOAD_MAX_BYTES: int = 50 * 1024 * 1024
+    UPLOAD_PARTIAL_TTL_SECONDS: int = 24 * 60 * 60
+    UPLOAD_GC_GRACE_SECONDS: int = 24 * 60 * 60
+
+    # 照片缩略图：是否在后台生成、生成的宽度和格式、编码质量、进程池大小
+    PHOTO_VARIANTS_ENABLED: bool = True
+    PHOTO_VARIANT_WIDTHS: tuple = (320, 640, 1280)
+    PHOTO_VARIANT_FORMATS: tuple = ("webp", "avif")
+    PHOTO_VARIANT_QUALITY: int = 75
+    PHOTO_VARIANT_WORKERS: int = 2
+
+    # 统计：是否由事件增量维护统计表、全量对账间隔秒数、无法增量更新时多少秒后对账
+    STATS_ENABLED: bool = True
+    STATS_RECONCILE_INTERVAL_SECONDS: int = 10 * 60
+    STATS_DIRTY_DELAY_SECONDS: float = 5.0
 
     # 初始管理员账号密码
     INIT_ADMIN_USERNAME: str = "admin"
@@ -27,10 +114,35 @@ class Settings:
     JWT_SECRET_KEY: str = "your-super-secret-jwt-key-change-this-in-production"
     JWT_ALGORITHM: str = "HS256"
     JWT_EXPIRE_MINUTES: int = 120
+    # 已验证 token 缓存的最大条目数，0 表示不缓存
+    JWT_TOKEN_CACHE_MAX_SIZE: int = 4096
+    
+    # 密码哈希线程池配置：并发工作线程数（0 表示在事件循环内直接计算）和最大排队数
+    PASSWORD_HASH_WORKERS: int = min(4, os.cpu_count() or 1)
+    PASSWORD_HASH_MAX_PENDING: int = 64
+    
+    # 认证缓存配置：已认证用户缓存的过期秒数和最大条目数
+    AUTH_USER_CACHE_TTL_SECONDS: int = 60
+    AUTH_USER_CACHE_MAX_SIZE: int = 1024
+    
+    # 登录限流配置：滑动窗口内每个 IP 的尝试次数、每个用户名的失败次数，超出失败次数后锁定
+    LOGIN_RATE_LIMIT_ENABLED: bool = True
+    LOGIN_RATE_LIMIT_WINDOW_SECONDS: int = 60
+    LOGIN_RATE_LIMIT_PER_IP: int = 20
+    LOGIN_RATE_LIMIT_PER_USERNAME: int = 5
+    LOGIN_LOCKOUT_SECONDS: int = 15 * 60
+    LOGIN_RATE_LIMIT_MAX_KEYS: int = 10000
+    # 可信的反向代理地址（可以是网段）：只有来自这些地址的请求才按 X-Forwarded-For 取客户端 IP，
+    # 否则经过前端（Next.js 服务端）或 nginx 转发的请求都会算在代理的 IP 上
+    TRUSTED_PROXIES: tuple = ("127.0.0.1", "::1")
     
     
     # FastAPI 配置
     APP_TITLE: str = "Bluenote"
+    # 是否在 /metrics 暴露 Prometheus 指标
+    METRICS_ENABLED: bool = True
+    # 多 worker 时每个 worker 把指标写到 SERVER_LOCK_DIR 的间隔秒数，/metrics 汇总所有 worker
+    METRICS_SHARE_INTERVAL_SECONDS: float = 5.0
     
     def __init__(self):
         """初始化配置，可以在这里添加配置验证逻辑"""
@@ -51,8 +163,88 @@ class Settings:
             "default_model": cls.OPENAI_DEFAULT_MODEL,
             "max_tokens": cls.OPENAI_MAX_TOKENS,
             "temperature": cls.OPENAI_TEMPERATURE,
+            "max_connections": cls.OPENAI_MAX_CONNECTIONS,
+            "max_keepalive_connections": cls.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            "max_concurrent_requests": cls.OPENAI_MAX_CONCURRENT_REQUESTS,
+            "max_queued_requests": cls.OPENAI_MAX_QUEUED_REQUESTS,
+            "request_deadline": cls.OPENAI_REQUEST_DEADLINE_SECONDS,
+        }
+    
+    @classmethod
+    def get_stream_relay_config(cls) -> dict:
+        """获取流式响应转发配置"""
+        return {
+            "max_chars": cls.OPENAI_STREAM_FRAME_MAX_CHARS,
+            "flush_interval": cls.OPENAI_STREAM_FLUSH_INTERVAL_MS / 1000,
+            "queue_size": cls.OPENAI_STREAM_QUEUE_SIZE,
+            "disconnect_poll_interval": cls.OPENAI_STREAM_DISCONNECT_POLL_MS / 1000,
+        }
+    
+    @classmethod
+    def get_completion_cache_config(cls) -> dict:
+        """获取补全结果缓存配置"""
+        return {
+            "enabled": cls.OPENAI_CACHE_ENABLED,
+            "memory_max_entries": cls.OPENAI_CACHE_MEMORY_MAX_ENTRIES,
+            "ttl_seconds": cls.OPENAI_CACHE_TTL_SECONDS,
+            "dir": cls.OPENAI_CACHE_DIR,
+            "disk_max_bytes": cls.OPENAI_CACHE_DISK_MAX_BYTES,
+        }
+    
+    @classmethod
+    def get_blog_summary_config(cls) -> dict:
+        """获取博客摘要自动生成配置"""
+        return {
+            "enabled": cls.BLOG_SUMMARY_ENABLED,
+            "debounce_seconds": cls.BLOG_SUMMARY_DEBOUNCE_SECONDS,
+            "max_content_chars": cls.BLOG_SUMMARY_MAX_CONTENT_CHARS,
+        }
+    
+    @classmethod
+    def get_upload_config(cls) -> dict:
+        """获取图片上传配置"""
+        return {
+            "directory": cls.UPLOAD_DIR,
+            "url_prefix": cls.UPLOAD_URL_PREFIX,
+            "chunk_size": cls.UPLOAD_CHUNK_SIZE,
+            "max_bytes": cls.UPLOAD_MAX_BYTES,
+            "partial_ttl_seconds": cls.UPLOAD_PARTIAL_TTL_SECONDS,
+            "gc_grace_seconds": cls.UPLOAD_GC_GRACE_SECONDS,
+        }
+    
+    @classmethod
+    def get_photo_variants_config(cls) -> dict:
+        """获取照片缩略图配置"""
+        return {
+            "enabled": cls.PHOTO_VARIANTS_ENABLED,
+            "widths": cls.PHOTO_VARIANT_WIDTHS,
+            "formats": cls.PHOTO_VARIANT_FORMATS,
+            "quality": cls.PHOTO_VARIANT_QUALITY,
+            "workers": cls.PHOTO_VARIANT_WORKERS,
         }
     
+    @classmethod
+    def get_stats_config(cls) -> dict:
+        """获取统计配置"""
+        return {
+            "enabled": cls.STATS_ENABLED,
+            "reconcile_interval_seconds": cls.STATS_RECONCILE_INTERVAL_SECONDS,
+            "dirty_delay_seconds": cls.STATS_DIRTY_DELAY_SECONDS,
+        }
+    
+    @classmethod
+    def get_worker_count(cls) -> int:
+        """同时处理请求的进程数，开发模式为 1
+
+        多 worker 时登录限流等原本保存在进程内的状态改为共享存储，见下面的配置。
+        """
+        return max(1, cls.SERVER_WORKERS) if cls.SERVER_MODE == "production" else 1
+    
+    @classmethod
+    def get_worker_id(cls) -> Optional[str]:
+        """当前 worker 的编号，主进程和单进程运行时为 None"""
+        return os.environ.get(WORKER_ID_ENV)
+    
     @classmethod
     def get_server_config(cls) -> dict:
         """获取服务器配置"""
@@ -61,6 +253,14 @@ class Settings:
             "port": cls.PORT,
             "reload": cls.RELOAD,
             "log_level": cls.LOG_LEVEL,
+            "mode": cls.SERVER_MODE,
+            "workers": cls.SERVER_WORKERS,
+            "max_requests": cls.SERVER_MAX_REQUESTS,
+            "max_requests_jitter": cls.SERVER_MAX_REQUESTS_JITTER,
+            "graceful_timeout": cls.SERVER_GRACEFUL_TIMEOUT_SECONDS,
+            "preload": cls.SERVER_PRELOAD,
+            "max_worker_crashes": cls.SERVER_MAX_WORKER_CRASHES,
+            "lock_dir": cls.SERVER_LOCK_DIR,
         }
     
     @classmethod
@@ -68,9 +268,33 @@ class Settings:
         """获取日志配置"""
         return {
             "log_file": cls.LOG_FILE,
+            # RotatingFileHandler 的轮转不支持多个进程写同一个文件，多 worker 时每个 worker 写自己的文件
+            "log_file_per_worker": cls.get_worker_count() > 1,
             "log_format": cls.LOG_FORMAT,
             "log_max_bytes": cls.LOG_MAX_BYTES,
             "log_backup_count": cls.LOG_BACKUP_COUNT,
+            "log_json": cls.LOG_JSON,
+            "log_queue_size": cls.LOG_QUEUE_SIZE,
+            "log_sample_rate": cls.LOG_SAMPLE_RATE,
+        }
+    
+    @classmethod
+    def get_metrics_config(cls) -> dict:
+        """获取指标配置"""
+        return {
+            "enabled": cls.METRICS_ENABLED,
+            # 只有一个 worker 时直接输出本进程的指标
+            "share_dir": os.path.join(cls.SERVER_LOCK_DIR, "metrics") if cls.get_worker_count() > 1 else None,
+            "share_interval_seconds": cls.METRICS_SHARE_INTERVAL_SECONDS,
+        }
+    
+    @classmethod
+    def get_soft_delete_config(cls) -> dict:
+        """获取软删除清理配置"""
+        return {
+            "retention_days": cls.SOFT_DELETE_RETENTION_DAYS,
+            "purge_interval_seconds": cls.SOFT_DELETE_PURGE_INTERVAL_SECONDS,
+            "purge_batch_size": cls.SOFT_DELETE_PURGE_BATCH_SIZE,
         }
     
     @classmethod
@@ -80,6 +304,45 @@ class Settings:
             "secret_key": cls.JWT_SECRET_KEY,
             "algorithm": cls.JWT_ALGORITHM,
             "expire_minutes": cls.JWT_EXPIRE_MINUTES,
+            "token_cache_max_size": cls.JWT_TOKEN_CACHE_MAX_SIZE,
+        }
+    
+    @classmethod
+    def get_password_hashing_config(cls) -> dict:
+        """获取密码哈希线程池配置"""
+        return {
+            "workers": cls.PASSWORD_HASH_WORKERS,
+            "max_pending": cls.PASSWORD_HASH_MAX_PENDING,
+        }
+    
+    @classmethod
+    def get_auth_cache_config(cls) -> dict:
+        """获取认证缓存配置"""
+        return {
+            "user_ttl_seconds": cls.AUTH_USER_CACHE_TTL_SECONDS,
+            "user_max_size": cls.AUTH_USER_CACHE_MAX_SIZE,
+            # 多 worker 时修改用户会递增这个文件中的计数，各 worker 命中缓存时发现计数变了就重新查询，
+            # 否则被降权或删除的用户在其他 worker 上到 TTL 之前仍然有效
+            "epoch_file": (
+                os.path.join(cls.SERVER_LOCK_DIR, "auth_user_cache.epoch") if cls.get_worker_count() > 1 else None
+            ),
+        }
+    
+    @classmethod
+    def get_login_rate_limit_config(cls) -> dict:
+        """获取登录限流配置
+
+        多 worker 时计数保存在数据库的 rate_limits 表中，所有 worker 共用同一份计数。
+        """
+        return {
+            "enabled": cls.LOGIN_RATE_LIMIT_ENABLED,
+            "shared": cls.get_worker_count() > 1,
+            "window_seconds": cls.LOGIN_RATE_LIMIT_WINDOW_SECONDS,
+            "ip_limit": cls.LOGIN_RATE_LIMIT_PER_IP,
+            "username_limit": cls.LOGIN_RATE_LIMIT_PER_USERNAME,
+            "lockout_seconds": cls.LOGIN_LOCKOUT_SECONDS,
+            "max_keys": cls.LOGIN_RATE_LIMIT_MAX_KEYS,
+            "trusted_proxies": cls.TRUSTED_PROXIES,
         }
 
 # 创建全局配置实例
@@ -1,6 +1,6 @@
 from .active_record import ActiveRecordMixin
-from .timestamp import TimestampsMixin
+from .timestamp import TimestampsMixin, active_rows_index
 
 
 class BaseModelMixin(ActiveRecordMixin, TimestampsMixin):
-    pass
+    __soft_delete__ = True
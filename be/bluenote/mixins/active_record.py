@@ -1,26 +1,52 @@
 import asyncio
+from contextlib import asynccontextmanager
+import copy
 from datetime import datetime, timedelta, timezone
 import importlib
 import json
 import math
-from typing import Any, AsyncGenerator, Callable, List, Optional, Union, overload, Tuple
+from typing import Any, AsyncGenerator, Callable, List, Optional, Sequence, Union, overload, Tuple
 
 from fastapi.encoders import jsonable_encoder
-from sqlalchemy import func
+from sqlalchemy import UniqueConstraint, delete as sa_delete, event as sa_event, func, inspect as sa_inspect, update as sa_update
 from sqlmodel import SQLModel, and_, asc, col, desc, or_, select
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import ONETOMANY, Session, with_loader_criteria
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlalchemy.orm.exc import FlushError
 from sqlalchemy.ext.asyncio import AsyncEngine
+from bluenote.api.exceptions import AlreadyExistsException
 from bluenote.schemas.common import PaginatedList, Pagination
 from bluenote.server.bus import Event, EventType, event_bus
 from bluenote.utils.logger import setup_logger
 
+logger = setup_logger(__name__)
+
+UNIT_OF_WORK_KEY = "bluenote_unit_of_work"
+
+
+class UnitOfWork:
+    """Events collected while a unit of work is open, published after commit."""
+
+    def __init__(self):
+        self.events: List[Tuple[str, Event]] = []
+
+    def add_event(self, topic: str, event: Event):
+        self.events.append((topic, event))
+
 
 class ActiveRecordMixin:
-    """ActiveRecordMixin provides a set of methods to interact with the database."""
+    """ActiveRecordMixin provides a set of methods to interact with the database.
+
+    Models with `__soft_delete__ = True` and a `deleted_at` column are soft deleted:
+    `delete` only stamps `deleted_at`, ORM queries skip stamped rows unless executed
+    with `execution_options(include_deleted=True)`, and `purge_soft_deleted`
+    removes the tombstones for good.
+    """
 
     __config__ = None
+    __soft_delete__ = False
 
     @property
     def primary_key(self):
@@ -28,6 +54,58 @@ class ActiveRecordMixin:
 
         return self.__mapper__.primary_key_from_instance(self)
 
+    @classmethod
+    @asynccontextmanager
+    async def unit_of_work(cls, session: AsyncSession) -> AsyncGenerator[UnitOfWork, None]:
+        """
+        Defer commits and event publication until the end of the block.
+
+        Inside the block `save`, `create`, `update` and `delete` only flush, so
+        every change is committed in a single transaction when the block exits.
+        Events raised in between are published in one batch after the commit,
+        or dropped if the block raises. Nested blocks join the outermost one.
+        """
+
+        uow = session.info.get(UNIT_OF_WORK_KEY)
+        if uow is not None:
+            yield uow
+            return
+
+        uow = UnitOfWork()
+        session.info[UNIT_OF_WORK_KEY] = uow
+        try:
+            yield uow
+            # objects were refreshed after each flush, no need to expire them
+            expire_on_commit = session.sync_session.expire_on_commit
+            session.sync_session.expire_on_commit = False
+            try:
+                await session.commit()
+            finally:
+                session.sync_session.expire_on_commit = expire_on_commit
+        except BaseException:
+            await session.rollback()
+            raise
+        finally:
+            session.info.pop(UNIT_OF_WORK_KEY, None)
+
+        await cls._publish_events(uow.events)
+
+    @staticmethod
+    def _in_unit_of_work(session: AsyncSession) -> bool:
+        return session.info.get(UNIT_OF_WORK_KEY) is not None
+
+    def detached_copy(self):
+        """Return a copy of the loaded column values that is not bound to any session."""
+
+        state = sa_inspect(self)
+        clone = state.manager.new_instance()
+        for key in state.mapper.column_attrs.keys():
+            if key in state.dict:
+                set_committed_value(clone, key, copy.deepcopy(state.dict[key]))
+        object.__setattr__(clone, "__pydantic_extra__", None)
+        object.__setattr__(clone, "__pydantic_private__", None)
+        return clone
+
     @classmethod
     async def first(cls, session: AsyncSession):
         """Return the first object of the model."""
@@ -217,9 +295,68 @@ class ActiveRecordMixin:
             return None
 
         await obj.save(session)
-        await cls._publish_event(EventType.CREATED, obj)
+        await cls._publish_event(EventType.CREATED, obj, session)
         return obj
 
+    @classmethod
+    async def create_unique(
+        cls,
+        session: AsyncSession,
+        source: Union[dict, SQLModel],
+        conflict_on: Sequence[str],
+        update: Optional[dict] = None,
+    ) -> Optional[SQLModel]:
+        """
+        Create a record that must be unique on the `conflict_on` columns.
+
+        Uniqueness is enforced by a unique index on those columns rather than a
+        lookup before the insert, so the insert is the only round trip and
+        concurrent creates cannot both succeed. A violation of that index is
+        raised as `AlreadyExistsException`; other integrity errors propagate.
+        """
+
+        obj = cls.convert_without_saving(source, update)
+        if obj is None:
+            return None
+
+        values = ", ".join(f"{key}={getattr(obj, key)!r}" for key in conflict_on)
+        try:
+            await obj.save(session)
+        except IntegrityError as e:
+            if not cls.is_unique_violation(e, conflict_on):
+                raise
+            raise AlreadyExistsException(message=f"{cls.__name__} with {values} already exists") from e
+
+        await cls._publish_event(EventType.CREATED, obj, session)
+        return obj
+
+    @classmethod
+    def is_unique_violation(cls, error: IntegrityError, columns: Sequence[str]) -> bool:
+        """Whether `error` is a violation of a unique index or constraint on exactly `columns`."""
+
+        message = str(error.orig)
+        # SQLite: "UNIQUE constraint failed: blogs.title"
+        if "UNIQUE constraint failed" in message:
+            failed = message.split(":", 1)[-1]
+            return {name.strip() for name in failed.split(",")} == {
+                f"{cls.__tablename__}.{column}" for column in columns
+            }
+
+        # PostgreSQL (SQLSTATE 23505): 'duplicate key value violates unique constraint "<name>"'
+        if getattr(error.orig, "sqlstate", None) != "23505":
+            return False
+        names = [
+            index.name
+            for index in cls.__table__.indexes
+            if index.unique and {column.name for column in index.columns} == set(columns)
+        ] + [
+            constraint.name
+            for constraint in cls.__table__.constraints
+            if isinstance(constraint, UniqueConstraint)
+            and {column.name for column in constraint.columns} == set(columns)
+        ]
+        return any(f'"{name}"' in message for name in names if name)
+
     @classmethod
     async def create_or_update(
         cls,
@@ -258,6 +395,12 @@ class ActiveRecordMixin:
         """Save the object to the database. Raise exception if failed."""
 
         session.add(self)
+        if self._in_unit_of_work(session):
+            # the enclosing unit of work commits or rolls back
+            await session.flush()
+            await session.refresh(self)
+            return
+
         try:
             await session.commit()
             await session.refresh(self)
@@ -277,41 +420,203 @@ class ActiveRecordMixin:
 
         for key, value in source.items():
             setattr(self, key, value)
+        previous = self._previous_values()
         await self.save(session)
-        await self._publish_event(EventType.UPDATED, self)
+        await self._publish_event(EventType.UPDATED, self, session, previous=previous)
+
+    def _previous_values(self) -> Optional[dict]:
+        """Return the loaded values of the columns changed since the last flush, or None if one was not loaded."""
+
+        state = sa_inspect(self)
+        if state.key is None:
+            return None
+        previous = {}
+        for key in state.mapper.column_attrs.keys():
+            history = state.attrs[key].history
+            if history.has_changes():
+                if not history.deleted:
+                    return None
+                previous[key] = copy.deepcopy(history.deleted[0])
+        return previous
 
     async def delete(self, session: AsyncSession):
-        """Delete the object from the database."""
+        """Delete the object and its cascades from the database in one transaction."""
+
+        if self._is_soft_deletable():
+            await self.soft_delete(session)
+            return
 
-        if self._has_cascade_delete():
-            if hasattr(self, "deleted_at"):
-                # timestamp is stored without timezone in db
-                self.deleted_at = datetime.now(timezone.utc).replace(tzinfo=None)
-                await self.save(session)
-            await self._handle_cascade_delete(session)
+        await self._hard_delete(session)
 
-        await session.delete(self)
-        await session.commit()
-        await self._publish_event(EventType.DELETED, self)
+    async def _hard_delete(self, session: AsyncSession):
+        async with self.unit_of_work(session):
+            if self._has_cascade_delete():
+                await self._handle_cascade_delete(session)
 
-    async def _handle_cascade_delete(self, session: AsyncSession):
-        """Handle cascading deletes for all defined relationships."""
+            await session.delete(self)
+            if getattr(self, "deleted_at", None) is None:
+                # tombstones published DELETED when they were soft deleted
+                await self._publish_event(EventType.DELETED, self, session)
+
+    async def _cascade_delete(self, session: AsyncSession, soft: bool):
+        """Delete an object reached through a cascade.
+
+        A soft delete leaves objects that cannot be soft deleted in place, so
+        they are still there if the parent is restored, and are removed when the
+        parent is purged. A hard delete removes soft-deletable objects too.
+        """
+        if not soft:
+            await self._hard_delete(session)
+        elif self._is_soft_deletable():
+            await self.soft_delete(session)
+
+    async def soft_delete(self, session: AsyncSession):
+        """Stamp `deleted_at` on the object and its cascades, keeping the rows until purged."""
+
+        async with self.unit_of_work(session):
+            # timestamp is stored without timezone in db
+            self.deleted_at = datetime.now(timezone.utc).replace(tzinfo=None)
+            await self.save(session)
+            if self._has_cascade_delete():
+                await self._handle_cascade_delete(session, soft=True)
+
+            await self._publish_event(EventType.DELETED, self, session)
+
+    @classmethod
+    async def purge_soft_deleted(
+        cls, session: AsyncSession, older_than: timedelta, batch_size: int = 500
+    ) -> int:
+        """
+        Hard-delete rows soft deleted more than `older_than` ago, together with their
+        cascades, committing every `batch_size` rows. Return the number of rows purged.
+
+        Purged rows publish no events: each one already published DELETED when
+        it was soft deleted, and subscribers (stats, watch streams) have
+        counted it gone since. Cascaded rows that were kept alive until now,
+        because they cannot be soft deleted, do publish DELETED here.
+        Reference counts that include tombstones, like `ImageBlob.ref_count`,
+        are recounted by the job that runs after the purge.
+        """
+
+        if not cls._is_soft_deletable():
+            return 0
+
+        table = cls.__table__
+        (pk,) = table.primary_key.columns
+        cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - older_than
+        purged = 0
+        while True:
+            statement = (
+                select(pk)
+                .where(table.c.deleted_at.is_not(None), table.c.deleted_at < cutoff)
+                .limit(batch_size)
+            )
+            ids = (await session.exec(statement)).all()
+            if not ids:
+                break
+
+            async with cls.unit_of_work(session):
+                await cls._cascade_delete_where(session, pk.in_(ids), soft=False)
+            purged += len(ids)
+            if len(ids) < batch_size:
+                break
+
+        return purged
+
+    async def _handle_cascade_delete(self, session: AsyncSession, soft: bool = False):
+        """
+        Handle cascading deletes for all defined relationships.
+
+        One-to-many relationships are deleted with one set-based statement per
+        related table (`DELETE ... WHERE parent_id IN (...)`, or an `UPDATE` of
+        `deleted_at` when `soft` is set), recursing through the related models'
+        own cascades. Other relationships fall back to per-object deletes.
+        When `soft` is set, related models that cannot be soft deleted are
+        left in place until the parent is purged.
+        """
         for rel in self.__mapper__.relationships:
-            if rel.cascade.delete:
-                # Load the related objects
-                await session.refresh(self)
-                related_objects = getattr(self, rel.key)
-
-                # Delete each related object
-                if isinstance(related_objects, list):
-                    for related_object in related_objects:
-                        await related_object.delete(session)
-                elif related_objects:
-                    await related_objects.delete(session)
-
-    def _has_cascade_delete(self):
+            if not rel.cascade.delete:
+                continue
+
+            if self._is_set_based_cascade(rel):
+                parent_column, child_column = rel.local_remote_pairs[0]
+                key = getattr(self, self.__mapper__.get_property_by_column(parent_column).key)
+                await rel.mapper.class_._cascade_delete_where(
+                    session, child_column.in_([key]), soft
+                )
+                # the related rows are handled, keep the ORM from cascading over them again
+                set_committed_value(self, rel.key, [] if rel.uselist else None)
+                continue
+
+            await session.refresh(self, attribute_names=[rel.key])
+            related_objects = getattr(self, rel.key)
+            if isinstance(related_objects, list):
+                for related_object in related_objects:
+                    await related_object._cascade_delete(session, soft)
+            elif related_objects:
+                await related_objects._cascade_delete(session, soft)
+
+    @classmethod
+    async def _cascade_delete_where(cls, session: AsyncSession, criterion, soft: bool):
+        """Delete the rows matching `criterion`, after their own cascades.
+
+        A soft delete skips models that cannot be soft deleted (see `_cascade_delete`).
+        DELETED events are only published for rows the ORM can see, which
+        leaves out tombstones: they published theirs when they were soft deleted.
+        """
+
+        table = cls.__table__
+        if soft:
+            if not cls._is_soft_deletable():
+                return
+            criterion = and_(criterion, table.c.deleted_at.is_(None))
+
+        rels = [rel for rel in cls.__mapper__.relationships if rel.cascade.delete]
+        if not all(cls._is_set_based_cascade(rel) for rel in rels):
+            statement = select(cls).where(criterion).execution_options(include_deleted=not soft)
+            for obj in (await session.exec(statement)).all():
+                await obj._cascade_delete(session, soft)
+            return
+
+        for rel in rels:
+            parent_column, child_column = rel.local_remote_pairs[0]
+            parent_keys = select(parent_column).where(criterion)
+            await rel.mapper.class_._cascade_delete_where(
+                session, child_column.in_(parent_keys), soft
+            )
+
+        topic = cls.__name__.lower()
+        if event_bus.has_subscribers(topic):
+            # only materialize the rows when someone listens for their events
+            for obj in (await session.exec(select(cls).where(criterion))).all():
+                await cls._publish_event(EventType.DELETED, obj, session)
+                session.expunge(obj)
+
+        if soft:
+            # timestamp is stored without timezone in db
+            deleted_at = datetime.now(timezone.utc).replace(tzinfo=None)
+            statement = sa_update(table).where(criterion).values(deleted_at=deleted_at)
+        else:
+            statement = sa_delete(table).where(criterion)
+        await session.exec(statement)
+
+    @staticmethod
+    def _is_set_based_cascade(rel) -> bool:
+        """Whether a cascade can be compiled into a single statement on the related table."""
+        return (
+            rel.direction is ONETOMANY
+            and rel.secondary is None
+            and len(rel.local_remote_pairs) == 1
+        )
+
+    @classmethod
+    def _is_soft_deletable(cls) -> bool:
+        return cls.__soft_delete__ and "deleted_at" in cls.__table__.c
+
+    @classmethod
+    def _has_cascade_delete(cls):
         """Check if the model has cascade delete relationships."""
-        return any(rel.cascade.delete for rel in self.__mapper__.relationships)
+        return any(rel.cascade.delete for rel in cls.__mapper__.relationships)
 
     @classmethod
     async def all(cls, session: AsyncSession):
@@ -324,18 +629,35 @@ class ActiveRecordMixin:
     async def delete_all(cls, session: AsyncSession):
         """Delete all objects of the model."""
 
-        for obj in await cls.all(session):
-            await obj.delete(session)
-            await cls._publish_event(EventType.DELETED, obj)
+        async with cls.unit_of_work(session):
+            for obj in await cls.all(session):
+                await obj.delete(session)
 
     @classmethod
-    async def _publish_event(cls, event_type: str, data: Any):
-        try:
-            await event_bus.publish(
-                cls.__name__.lower(), Event(type=event_type, data=data)
-            )
-        except Exception as e:
-            logger.error(f"Error publishing event: {e}")
+    async def _publish_event(
+        cls,
+        event_type: str,
+        data: Any,
+        session: Optional[AsyncSession] = None,
+        previous: Optional[dict] = None,
+    ):
+        topic = cls.__name__.lower()
+        event = Event(type=event_type, data=data, previous=previous)
+        uow = session.info.get(UNIT_OF_WORK_KEY) if session is not None else None
+        if uow is not None:
+            uow.add_event(topic, event)
+            return
+
+        await cls._publish_events([(topic, event)])
+
+    @staticmethod
+    async def _publish_events(events: List[Tuple[str, Event]]):
+        # Publish in order; a failing event is logged and does not drop the rest of the batch
+        for topic, event in events:
+            try:
+                await event_bus.publish(topic, event)
+            except Exception as e:
+                logger.error("Error publishing event: topic=%s, error=%s", topic, e)
 
     @overload
     @classmethod
@@ -376,6 +698,9 @@ class ActiveRecordMixin:
                     event = await asyncio.wait_for(
                         subscriber.receive(), timeout=heartbeat_interval.total_seconds()
                     )
+                    if event.type == EventType.SHUTDOWN:
+                        # the server is draining, end the stream so the client reconnects elsewhere
+                        return
                     yield event
                 except asyncio.TimeoutError:
                     if (
@@ -439,4 +764,39 @@ class ActiveRecordMixin:
     @staticmethod
     def _format_event(event: Any) -> str:
         """Format the event as a JSON string."""
-        return json.dumps(jsonable_encoder(event), separators=(",", ":")) + "\n\n"
+        # `previous` stays server-side, it may hold columns the Public class leaves out
+        payload = {"type": event.type, "data": event.data}
+        return json.dumps(jsonable_encoder(payload), separators=(",", ":")) + "\n\n"
+
+
+_soft_deleted_criteria = []
+
+
+@sa_event.listens_for(ActiveRecordMixin, "mapper_configured", propagate=True)
+def _register_soft_deletable(mapper, cls):
+    if cls._is_soft_deletable():
+        _soft_deleted_criteria.append(
+            with_loader_criteria(cls, cls.deleted_at.is_(None), include_aliases=True)
+        )
+
+
+@sa_event.listens_for(Session, "do_orm_execute")
+def _exclude_soft_deleted(execute_state):
+    """Add `deleted_at IS NULL` to ORM selects of soft-deletable models."""
+    if (
+        execute_state.is_select
+        and not execute_state.is_column_load
+        and not execute_state.is_relationship_load
+        and not execute_state.execution_options.get("include_deleted", False)
+    ):
+        execute_state.statement = execute_state.statement.options(*_soft_deleted_criteria)
+
+
+@sa_event.listens_for(ActiveRecordMixin, "load", propagate=True)
+def _init_pydantic_private_attrs(target, context):
+    """
+    sqlmodel only sets `__pydantic_fields_set__` on rows loaded from the database,
+    initialize the remaining pydantic attributes so events carrying them can be copied.
+    """
+    object.__setattr__(target, "__pydantic_extra__", None)
+    object.__setattr__(target, "__pydantic_private__", None)
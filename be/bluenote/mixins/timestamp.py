@@ -35,3 +35,11 @@ class TimestampsMixin:
     deleted_at: Optional[datetime] = Field(
         sa_column=sa.Column(UTCDateTime), default=None
     )
+
+
+def active_rows_index(name: str, *columns: str, unique: bool = False) -> sa.Index:
+    """Partial index over the rows that are not soft deleted."""
+    where = sa.text("deleted_at IS NULL")
+    return sa.Index(
+        name, *columns, unique=unique, sqlite_where=where, postgresql_where=where
+    )
@@ -0,0 +1,111 @@
+import asyncio
+from typing import AsyncIterator, Dict, List, Optional
+
+from fastapi import APIRouter, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from bluenote.api.exceptions import (
+    BadRequestException,
+    ForbiddenException,
+    HTTPException,
+    InternalServerErrorException,
+)
+from bluenote.api.sse import SSE_HEADERS, StreamRelay
+from bluenote.config.config import settings
+from bluenote.routes.auth import CurrentUserDep
+from bluenote.schemas.users import User
+from bluenote.services.ai_scheduler import Priority
+from bluenote.services.openai import get_openai_service
+from bluenote.utils.logger import setup_logger
+
+router = APIRouter()
+logger = setup_logger(__name__)
+stream_relay = StreamRelay(**settings.get_stream_relay_config())
+
+
+class ChatRequest(BaseModel):
+    """聊天请求，message 与 messages（带历史记录）二选一"""
+    message: Optional[str] = None
+    messages: Optional[List[Dict[str, str]]] = None
+    model: Optional[str] = None
+
+
+class ChatResponse(BaseModel):
+    content: str
+
+
+def _to_messages(chat_in: ChatRequest) -> List[Dict[str, str]]:
+    if chat_in.messages:
+        return chat_in.messages
+    if chat_in.message and chat_in.message.strip():
+        return [{"role": "user", "content": chat_in.message}]
+    raise BadRequestException(message="Either message or messages is required")
+
+
+def _priority(user: User) -> Priority:
+    """管理员的请求优先调度"""
+    return Priority.ADMIN if user.is_admin else Priority.PUBLIC
+
+
+@router.post("/chat", response_model=ChatResponse)
+async def chat(chat_in: ChatRequest, current_user: CurrentUserDep):
+    messages = _to_messages(chat_in)
+    logger.info("[AI_CHAT] 收到聊天请求: user=%s, messages=%s", current_user.username, len(messages))
+
+    try:
+        content = await get_openai_service().chat_with_history(
+            messages, chat_in.model, user=current_user.username, priority=_priority(current_user)
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("[AI_CHAT] 聊天失败: %s", e)
+        raise InternalServerErrorException(message=f"Failed to chat: {e}")
+
+    return ChatResponse(content=content or "")
+
+
+@router.post("/chat/stream")
+async def chat_stream(chat_in: ChatRequest, request: Request, current_user: CurrentUserDep):
+    """流式聊天，以 SSE 返回：多个 delta 事件，最后是带用量和耗时的 done 事件"""
+    messages = _to_messages(chat_in)
+    logger.info("[AI_CHAT_STREAM] 收到流式聊天请求: user=%s, messages=%s", current_user.username, len(messages))
+
+    started_at = asyncio.get_running_loop().time()
+    usage = {}
+    stream = get_openai_service().chat_with_history_stream(
+        messages, chat_in.model, user=current_user.username, priority=_priority(current_user), usage=usage
+    )
+    # 先取第一段内容，并发名额已满或上游失败时仍能返回正常的错误响应
+    try:
+        first = await anext(stream, None)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("[AI_CHAT_STREAM] 流式聊天失败: %s", e)
+        raise InternalServerErrorException(message=f"Failed to chat: {e}")
+
+    async def deltas() -> AsyncIterator[str]:
+        try:
+            if first is None:
+                return
+            yield first
+            async for content in stream:
+                yield content
+        finally:
+            await stream.aclose()
+
+    return StreamingResponse(
+        stream_relay.relay(request, deltas(), usage, started_at),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
+
+@router.get("/stats")
+async def ai_stats(current_user: CurrentUserDep):
+    """AI 调度与缓存统计（仅管理员）"""
+    if not current_user.is_admin:
+        raise ForbiddenException(message="Not enough permissions")
+    return get_openai_service().stats()
@@ -1,9 +1,10 @@
 from datetime import timedelta
 from typing import Annotated, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlmodel import select, SQLModel
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import make_transient_to_detached
 
 from bluenote.schemas.users import (
     User, UserCreate, UserUpdate, UserPublic, UsersPublic, UpdatePassword
@@ -11,9 +12,14 @@ from bluenote.schemas.users import (
 from bluenote.schemas.common import ListParams
 from bluenote.server.deps import SessionDep, ListParamsDep
 from bluenote.security import (
-    get_secret_hash, verify_hashed_secret, JWTManager, generate_secure_password
+    get_secret_hash_async, verify_hashed_secret_async, JWTManager, generate_secure_password
 )
 from bluenote.config.config import settings
+from bluenote.api.ratelimit import (
+    DatabaseRateLimitStore, LoginRateLimiter, MemoryRateLimitStore, resolve_client_ip
+)
+from bluenote.utils.cache import TTLCache
+from bluenote.utils.locks import FileEpoch
 
 # 创建路由器
 router = APIRouter(prefix="/auth", tags=["Authentication"])
@@ -23,12 +29,59 @@ jwt_config = settings.get_jwt_config()
 jwt_manager = JWTManager(
     secret_key=jwt_config["secret_key"],
     algorithm=jwt_config["algorithm"],
-    expires_delta=timedelta(minutes=jwt_config["expire_minutes"])
+    expires_delta=timedelta(minutes=jwt_config["expire_minutes"]),
+    token_cache_size=jwt_config["token_cache_max_size"],
 )
 
 # HTTP Bearer认证
 security = HTTPBearer()
 
+# 已认证用户缓存，键为 (username, jti)，值为 (缓存时的失效计数, 用户)，用户被修改时失效
+auth_cache_config = settings.get_auth_cache_config()
+user_cache = TTLCache(
+    maxsize=auth_cache_config["user_max_size"],
+    ttl=auth_cache_config["user_ttl_seconds"],
+)
+# 多 worker 时的失效计数，其他 worker 修改用户后本进程缓存的所有用户都不再使用
+user_cache_epoch = FileEpoch(auth_cache_config["epoch_file"]) if auth_cache_config["epoch_file"] else None
+
+
+def current_user_cache_epoch() -> int:
+    return user_cache_epoch.current() if user_cache_epoch is not None else 0
+
+
+# 登录限流器，多 worker 时计数保存在数据库中
+login_rate_limit_config = settings.get_login_rate_limit_config()
+if login_rate_limit_config["shared"]:
+    login_rate_limit_store = DatabaseRateLimitStore(retention_seconds=2 * login_rate_limit_config["window_seconds"])
+else:
+    login_rate_limit_store = MemoryRateLimitStore(maxsize=login_rate_limit_config["max_keys"])
+login_rate_limiter = LoginRateLimiter(
+    store=login_rate_limit_store,
+    ip_limit=login_rate_limit_config["ip_limit"],
+    username_limit=login_rate_limit_config["username_limit"],
+    window_seconds=login_rate_limit_config["window_seconds"],
+    lockout_seconds=login_rate_limit_config["lockout_seconds"],
+)
+
+
+def cache_user(key: tuple, user: User, epoch: int):
+    """缓存用户的脱离会话副本，避免缓存对象被请求中的提交过期
+
+    epoch 是查询用户之前读到的失效计数：查询期间其他 worker 修改了用户时，这个条目不会被使用。
+    """
+    snapshot = user.detached_copy()
+    make_transient_to_detached(snapshot)
+    user_cache.set(key, (epoch, snapshot))
+
+
+def invalidate_cached_user(username: str):
+    """使指定用户名的所有缓存条目失效，包括已验证的 token；多 worker 时通知其他 worker"""
+    user_cache.invalidate(lambda key, _: key[0] == username)
+    jwt_manager.invalidate_subject(username)
+    if user_cache_epoch is not None:
+        user_cache_epoch.bump()
+
 
 async def get_current_user(
     session: SessionDep,
@@ -51,7 +104,14 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    statement = select(User).where(User.username == username, User.deleted_at.is_(None))
+    cache_key = (username, payload.get("jti"))
+    epoch = current_user_cache_epoch()
+    cached = user_cache.get(cache_key)
+    if cached is not None and cached[0] == epoch:
+        # 合并到当前会话，不查询数据库
+        return await session.merge(cached[1], load=False)
+    
+    statement = select(User).where(User.username == username)
     result = await session.exec(statement)
     user = result.first()
     
@@ -62,6 +122,7 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    cache_user(cache_key, user, epoch)
     return user
 
 
@@ -72,7 +133,7 @@ CurrentUserDep = Annotated[User, Depends(get_current_user)]
 async def register_user(user_data: UserCreate, session: SessionDep):
     """用户注册"""
     # 检查用户名是否已存在
-    statement = select(User).where(User.username == user_data.username, User.deleted_at.is_(None))
+    statement = select(User).where(User.username == user_data.username)
     result = await session.exec(statement)
     existing_user = result.first()
     
@@ -83,7 +144,7 @@ async def register_user(user_data: UserCreate, session: SessionDep):
         )
     
     # 创建新用户
-    hashed_password = get_secret_hash(user_data.password)
+    hashed_password = await get_secret_hash_async(user_data.password)
     user_dict = user_data.model_dump(exclude={"password"})
     user = User(**user_dict, hashed_password=hashed_password)
     
@@ -106,20 +167,42 @@ class LoginRequest(SQLModel):
 
 
 @router.post("/login")
-async def login(login_data: LoginRequest, session: SessionDep):
+async def login(login_data: LoginRequest, request: Request, session: SessionDep):
     """用户登录"""
+    # 限流检查在哈希校验之前，被拒绝的请求不消耗 CPU
+    if login_rate_limit_config["enabled"]:
+        client_ip = resolve_client_ip(
+            request.client.host if request.client else None,
+            request.headers.get("x-forwarded-for"),
+            login_rate_limit_config["trusted_proxies"],
+        )
+        retry_after = await login_rate_limiter.check(client_ip, login_data.username)
+        if retry_after is not None:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many login attempts",
+                headers={"Retry-After": str(retry_after)},
+            )
+    
     # 查找用户
-    statement = select(User).where(User.username == login_data.username, User.deleted_at.is_(None))
+    statement = select(User).where(User.username == login_data.username)
     result = await session.exec(statement)
     user = result.first()
+    # 哈希校验可能需要排队，先把数据库连接还给连接池
+    await session.close()
     
-    if not user or not verify_hashed_secret(user.hashed_password, login_data.password):
+    if not user or not await verify_hashed_secret_async(user.hashed_password, login_data.password):
+        if login_rate_limit_config["enabled"]:
+            await login_rate_limiter.record_failure(login_data.username)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    if login_rate_limit_config["enabled"]:
+        await login_rate_limiter.record_success(login_data.username)
+    
     # 生成JWT token
     access_token = jwt_manager.create_jwt_token(user.username)
     
@@ -147,8 +230,7 @@ async def update_current_user(
     if user_update.username != current_user.username:
         statement = select(User).where(
             User.username == user_update.username,
-            User.id != current_user.id,
-            User.deleted_at.is_(None)
+            User.id != current_user.id
         )
         result = await session.exec(statement)
         existing_user = result.first()
@@ -164,22 +246,27 @@ async def update_current_user(
     
     # 如果包含密码更新
     if user_update.password:
-        update_data["hashed_password"] = get_secret_hash(user_update.password)
+        update_data["hashed_password"] = await get_secret_hash_async(user_update.password)
     
+    username = current_user.username
     for field, value in update_data.items():
         setattr(current_user, field, value)
     
     try:
         session.add(current_user)
         await session.commit()
-        await session.refresh(current_user)
-        return current_user
     except IntegrityError:
         await session.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Update failed"
         )
+    # 提交之后再让缓存失效（包括已验证的 token），否则并发请求可能把旧的行（如 is_admin）重新放入缓存
+    invalidate_cached_user(username)
+    if update_data.get("username", username) != username:
+        invalidate_cached_user(update_data["username"])
+    await session.refresh(current_user)
+    return current_user
 
 
 @router.put("/me/password")
@@ -190,18 +277,20 @@ async def change_password(
 ):
     """修改密码"""
     # 验证当前密码
-    if not verify_hashed_secret(current_user.hashed_password, password_data.current_password):
+    if not await verify_hashed_secret_async(current_user.hashed_password, password_data.current_password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Current password is incorrect"
         )
     
     # 更新密码
-    current_user.hashed_password = get_secret_hash(password_data.new_password)
+    current_user.hashed_password = await get_secret_hash_async(password_data.new_password)
     current_user.require_password_change = False
     
+    username = current_user.username
     session.add(current_user)
     await session.commit()
+    invalidate_cached_user(username)
     
     return {"message": "Password updated successfully"}
 
@@ -213,6 +302,7 @@ async def delete_current_user(
 ):
     """删除当前用户（软删除）"""
     await current_user.soft_delete(session)
+    invalidate_cached_user(current_user.username)
     return {"message": "User deleted successfully"}
 
 
@@ -230,7 +320,7 @@ async def get_users(
             detail="Not enough permissions"
         )
     
-    statement = select(User).where(User.deleted_at.is_(None))
+    statement = select(User)
     
     # 应用分页
     statement = statement.offset(list_params.skip).limit(list_params.limit)
@@ -239,7 +329,7 @@ async def get_users(
     users = result.all()
     
     # 获取总数
-    count_statement = select(User).where(User.deleted_at.is_(None))
+    count_statement = select(User)
     count_result = await session.exec(count_statement)
     total = len(count_result.all())
     
@@ -263,7 +353,7 @@ async def get_user_by_id(
             detail="Not enough permissions"
         )
     
-    statement = select(User).where(User.id == user_id, User.deleted_at.is_(None))
+    statement = select(User).where(User.id == user_id)
     result = await session.exec(statement)
     user = result.first()
     
@@ -290,7 +380,7 @@ async def update_user_by_id(
             detail="Not enough permissions"
         )
     
-    statement = select(User).where(User.id == user_id, User.deleted_at.is_(None))
+    statement = select(User).where(User.id == user_id)
     result = await session.exec(statement)
     user = result.first()
     
@@ -304,8 +394,7 @@ async def update_user_by_id(
     if user_update.username and user_update.username != user.username:
         username_statement = select(User).where(
             User.username == user_update.username,
-            User.id != user_id,
-            User.deleted_at.is_(None)
+            User.id != user_id
         )
         username_result = await session.exec(username_statement)
         existing_user = username_result.first()
@@ -320,22 +409,27 @@ async def update_user_by_id(
     update_data = user_update.model_dump(exclude_unset=True, exclude={"password"})
     
     if user_update.password:
-        update_data["hashed_password"] = get_secret_hash(user_update.password)
+        update_data["hashed_password"] = await get_secret_hash_async(user_update.password)
     
+    username = user.username
     for field, value in update_data.items():
         setattr(user, field, value)
     
     try:
         session.add(user)
         await session.commit()
-        await session.refresh(user)
-        return user
     except IntegrityError:
         await session.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Update failed"
         )
+    # 提交之后再让缓存失效（包括已验证的 token），否则并发请求可能把旧的行（如 is_admin）重新放入缓存
+    invalidate_cached_user(username)
+    if update_data.get("username", username) != username:
+        invalidate_cached_user(update_data["username"])
+    await session.refresh(user)
+    return user
 
 
 @router.delete("/users/{user_id}")
@@ -351,7 +445,7 @@ async def delete_user_by_id(
             detail="Not enough permissions"
         )
     
-    statement = select(User).where(User.id == user_id, User.deleted_at.is_(None))
+    statement = select(User).where(User.id == user_id)
     result = await session.exec(statement)
     user = result.first()
     
@@ -369,6 +463,7 @@ async def delete_user_by_id(
         )
     
     await user.soft_delete(session)
+    invalidate_cached_user(user.username)
     return {"message": "User deleted successfully"}
 
 
@@ -385,7 +480,7 @@ async def reset_user_password(
             detail="Not enough permissions"
         )
     
-    statement = select(User).where(User.id == user_id, User.deleted_at.is_(None))
+    statement = select(User).where(User.id == user_id)
     result = await session.exec(statement)
     user = result.first()
     
@@ -397,11 +492,13 @@ async def reset_user_password(
     
     # 生成新密码
     new_password = generate_secure_password(12)
-    user.hashed_password = get_secret_hash(new_password)
+    user.hashed_password = await get_secret_hash_async(new_password)
     user.require_password_change = True
     
+    username = user.username
     session.add(user)
     await session.commit()
+    invalidate_cached_user(username)
     
     return {
         "message": "Password reset successfully",
@@ -1,5 +1,6 @@
 from datetime import datetime, timezone
 from fastapi import APIRouter, HTTPException
+from sqlalchemy.exc import IntegrityError
 
 from bluenote.api.exceptions import (
     AlreadyExistsException,
@@ -8,9 +9,10 @@ from bluenote.api.exceptions import (
 )
 
 from bluenote.server.deps import SessionDep, ListParamsDep
-from bluenote.schemas.blogs import BlogCreate, BlogPublic, BlogsPublic, Blog, BlogUpdate, BlogUpdateResponse
+from bluenote.schemas.blogs import BlogCreate, BlogPublic, BlogStats, BlogsPublic, Blog, BlogUpdate, BlogUpdateResponse
 from bluenote.schemas.common import PaginatedList
-from bluenote.utils.logger import setup_logger
+from bluenote.services.content_stats import read_stats
+from bluenote.utils.logger import SAMPLED, setup_logger
 
 router = APIRouter()
 logger = setup_logger(__name__)
@@ -20,27 +22,21 @@ logger = setup_logger(__name__)
 async def create_blog(
     session: SessionDep, blog_in: BlogCreate
 ):
-    logger.info(f"[CREATE_BLOG] 收到创建博客请求: {blog_in}")
+    logger.debug("[CREATE_BLOG] 收到创建博客请求: %s", blog_in)
     
     # 检查标题是否为空
     if not blog_in.title or len(blog_in.title.strip()) == 0:
-        logger.warning(f"[CREATE_BLOG] 博客标题为空")
+        logger.warning("[CREATE_BLOG] 博客标题为空")
         raise HTTPException(status_code=400, detail="Blog title cannot be empty")
     
     # 检查内容是否为空
     if not blog_in.content or len(blog_in.content.strip()) == 0:
-        logger.warning(f"[CREATE_BLOG] 博客内容为空")
+        logger.warning("[CREATE_BLOG] 博客内容为空")
         raise HTTPException(status_code=400, detail="Blog content cannot be empty")
     
-    fields = {"title": blog_in.title}
-    existing = await Blog.one_by_fields(session, fields)
-    if existing:
-        logger.warning(f"[CREATE_BLOG] 博客标题已存在: {blog_in.title}")
-        raise AlreadyExistsException(message=f"Blog {blog_in.title} already exists")
-
     try:
         current = datetime.now(timezone.utc)
-        logger.info(f"[CREATE_BLOG] 创建博客对象: title={blog_in.title}, content长度={len(blog_in.content)}")
+        logger.info("[CREATE_BLOG] 创建博客对象: title=%s, content长度=%s", blog_in.title, len(blog_in.content))
 
         blog = Blog(
             title=blog_in.title,
@@ -57,10 +53,14 @@ async def create_blog(
             created_at=current.replace(tzinfo=None),
             updated_at=current.replace(tzinfo=None),
         )
-        blog = await Blog.create(session, blog)
-        logger.info(f"[CREATE_BLOG] 博客创建成功: id={blog.id}")
+        # 标题唯一由唯一索引保证，插入冲突即标题已存在
+        blog = await Blog.create_unique(session, blog, conflict_on=("title",))
+        logger.info("[CREATE_BLOG] 博客创建成功: id=%s", blog.id)
+    except AlreadyExistsException:
+        logger.warning("[CREATE_BLOG] 博客标题已存在: %s", blog_in.title)
+        raise AlreadyExistsException(message=f"Blog {blog_in.title} already exists")
     except Exception as e:
-        logger.error(f"[CREATE_BLOG] 创建博客失败: {e}")
+        logger.error("[CREATE_BLOG] 创建博客失败: %s", e)
         raise InternalServerErrorException(message=f"Failed to create blog: {e}")
 
     # 构建数据字典，让模型验证器处理tags字段
@@ -81,23 +81,23 @@ async def create_blog(
         "updated_at": blog.updated_at,
     }
     result = BlogPublic.model_validate(blog_data)
-    logger.info(f"[CREATE_BLOG] 返回博客数据: id={result.id}, title={result.title}")
+    logger.info("[CREATE_BLOG] 返回博客数据: id=%s, title=%s", result.id, result.title)
     return result
 
 @router.get("", response_model=BlogsPublic)
 async def list_blogs(session: SessionDep, params: ListParamsDep, search: str = None, category: str = None):
-    logger.info(f"[LIST_BLOGS] 收到列表博客请求: search={search}, category={category}, page={params.page}, per_page={params.perPage}")
+    logger.info("[LIST_BLOGS] 收到列表博客请求: search=%s, category=%s, page=%s, per_page=%s", search, category, params.page, params.perPage, extra=SAMPLED)
     
     fuzzy_fields = {}
     fields = {}
     
     if search:
         fuzzy_fields = {"title": search}
-        logger.info(f"[LIST_BLOGS] 设置搜索条件: {fuzzy_fields}")
+        logger.info("[LIST_BLOGS] 设置搜索条件: %s", fuzzy_fields, extra=SAMPLED)
     
     if category:
         fields = {"category": category}
-        logger.info(f"[LIST_BLOGS] 设置分类过滤: {fields}")
+        logger.info("[LIST_BLOGS] 设置分类过滤: %s", fields, extra=SAMPLED)
 
     result = await Blog.paginated_by_query(
         session=session, 
@@ -128,27 +128,34 @@ async def list_blogs(session: SessionDep, params: ListParamsDep, search: str = N
         }
         blog_items.append(BlogPublic.model_validate(blog_data))
     
-    logger.info(f"[LIST_BLOGS] 返回博客列表: 总数={len(blog_items)}")
+    logger.info("[LIST_BLOGS] 返回博客列表: 总数=%s", len(blog_items), extra=SAMPLED)
     return PaginatedList[BlogPublic](items=blog_items, pagination=result.pagination)
 
 
 
+@router.get("/stats", response_model=BlogStats)
+async def blog_stats(session: SessionDep):
+    """博客统计，读取由事件增量维护的统计表"""
+    logger.info("[BLOG_STATS] 收到统计请求", extra=SAMPLED)
+    return await read_stats(session, "blog")
+
+
 @router.get("/{blog_id}", response_model=BlogPublic)
 async def get_blog(session: SessionDep, blog_id: int):
-    logger.info(f"[GET_BLOG] 收到获取博客请求: blog_id={blog_id}")
+    logger.info("[GET_BLOG] 收到获取博客请求: blog_id=%s", blog_id, extra=SAMPLED)
     
     blog = await Blog.one_by_id(session, blog_id)
     if not blog:
-        logger.warning(f"[GET_BLOG] 博客不存在: blog_id={blog_id}")
+        logger.warning("[GET_BLOG] 博客不存在: blog_id=%s", blog_id)
         raise NotFoundException(message=f"Blog with id {blog_id} not found")
     
     # 增加浏览数
     try:
         blog.view_count += 1
         await blog.save(session)
-        logger.info(f"[GET_BLOG] 博客浏览数已更新: blog_id={blog_id}, view_count={blog.view_count}")
+        logger.info("[GET_BLOG] 博客浏览数已更新: blog_id=%s, view_count=%s", blog_id, blog.view_count, extra=SAMPLED)
     except Exception as e:
-        logger.warning(f"[GET_BLOG] 更新浏览数失败: {e}")
+        logger.warning("[GET_BLOG] 更新浏览数失败: %s", e)
     
     # 构建数据字典，让模型验证器处理tags字段
     blog_data = {
@@ -169,29 +176,37 @@ async def get_blog(session: SessionDep, blog_id: int):
     }
     result = BlogPublic.model_validate(blog_data)
     
-    logger.info(f"[GET_BLOG] 返回博客数据: id={result.id}, title={result.title}")
+    logger.info("[GET_BLOG] 返回博客数据: id=%s, title=%s", result.id, result.title, extra=SAMPLED)
     return result
 
 
 @router.put("/{blog_id}", response_model=BlogUpdateResponse)
 async def update_blog(session: SessionDep, blog_id: int, blog_update: BlogUpdate):
-    logger.info(f"[UPDATE_BLOG] 收到更新博客请求: blog_id={blog_id}, update_data={blog_update}")
+    logger.info("[UPDATE_BLOG] 收到更新博客请求: blog_id=%s", blog_id)
+    logger.debug("[UPDATE_BLOG] 更新内容: %s", blog_update)
     
     blog = await Blog.one_by_id(session, blog_id)
     if not blog:
-        logger.warning(f"[UPDATE_BLOG] 博客不存在: blog_id={blog_id}")
+        logger.warning("[UPDATE_BLOG] 博客不存在: blog_id=%s", blog_id)
         raise NotFoundException(message=f"Blog with id {blog_id} not found")
     
     try:
-        # 更新字段
+        # 更新字段，update 会发布 UPDATED 事件（触发摘要生成等订阅者）
         update_data = blog_update.dict(exclude_unset=True)
-        for field, value in update_data.items():
-            setattr(blog, field, value)
+        if "summary" in update_data:
+            # 作者手动填写的摘要不再被自动生成覆盖
+            update_data["summary_source_hash"] = None
         
-        await blog.save(session)
-        logger.info(f"[UPDATE_BLOG] 博客更新成功: blog_id={blog_id}")
+        await blog.update(session, update_data)
+        logger.info("[UPDATE_BLOG] 博客更新成功: blog_id=%s", blog_id)
+    except IntegrityError as e:
+        if not Blog.is_unique_violation(e, ("title",)):
+            logger.error("[UPDATE_BLOG] 更新博客失败: %s", e)
+            raise InternalServerErrorException(message=f"Failed to update blog: {e}")
+        logger.warning("[UPDATE_BLOG] 博客标题已存在: %s", update_data.get("title"))
+        raise AlreadyExistsException(message=f"Blog {update_data.get('title')} already exists")
     except Exception as e:
-        logger.error(f"[UPDATE_BLOG] 更新博客失败: {e}")
+        logger.error("[UPDATE_BLOG] 更新博客失败: %s", e)
         raise InternalServerErrorException(message=f"Failed to update blog: {e}")
     
     result = BlogUpdateResponse(
@@ -205,24 +220,24 @@ async def update_blog(session: SessionDep, blog_id: int, blog_update: BlogUpdate
         category=blog.category,
     )
     
-    logger.info(f"[UPDATE_BLOG] 返回更新后的博客数据: id={result.id}, title={result.title}")
+    logger.info("[UPDATE_BLOG] 返回更新后的博客数据: id=%s, title=%s", result.id, result.title)
     return result
 
 
 @router.delete("/{blog_id}")
 async def delete_blog(session: SessionDep, blog_id: int):
-    logger.info(f"[DELETE_BLOG] 收到删除博客请求: blog_id={blog_id}")
+    logger.info("[DELETE_BLOG] 收到删除博客请求: blog_id=%s", blog_id)
     
     blog = await Blog.one_by_id(session, blog_id)
     if not blog:
-        logger.warning(f"[DELETE_BLOG] 博客不存在: blog_id={blog_id}")
+        logger.warning("[DELETE_BLOG] 博客不存在: blog_id=%s", blog_id)
         raise NotFoundException(message=f"Blog with id {blog_id} not found")
     
     try:
         await blog.delete(session)
-        logger.info(f"[DELETE_BLOG] 博客删除成功: blog_id={blog_id}")
+        logger.info("[DELETE_BLOG] 博客删除成功: blog_id=%s", blog_id)
     except Exception as e:
-        logger.error(f"[DELETE_BLOG] 删除博客失败: {e}")
+        logger.error("[DELETE_BLOG] 删除博客失败: %s", e)
         raise InternalServerErrorException(message=f"Failed to delete blog: {e}")
     
     return {"message": f"Blog {blog_id} deleted successfully"}
@@ -9,8 +9,9 @@ from bluenote.api.exceptions import (
 )
 
 from bluenote.server.deps import SessionDep, ListParamsDep
-from bluenote.schemas.contacts import ContactCreate, ContactPublic, ContactsPublic, Contact
-from bluenote.utils.logger import setup_logger
+from bluenote.schemas.contacts import ContactCreate, ContactPublic, ContactStats, ContactsPublic, Contact
+from bluenote.services.content_stats import read_stats
+from bluenote.utils.logger import SAMPLED, setup_logger
 
 router = APIRouter()
 logger = setup_logger(__name__)
@@ -20,11 +21,11 @@ logger = setup_logger(__name__)
 async def create_contact(
     session: SessionDep, contact_in: ContactCreate
 ):
-    logger.info(f"[CREATE_CONTACT] 收到创建联系表单请求: {contact_in}")
+    logger.debug("[CREATE_CONTACT] 收到创建联系表单请求: %s", contact_in)
     
     try:
         current = datetime.now(timezone.utc)
-        logger.info(f"[CREATE_CONTACT] 创建联系表单对象: name={contact_in.name}, email={contact_in.email}")
+        logger.info("[CREATE_CONTACT] 创建联系表单对象: name=%s, email=%s", contact_in.name, contact_in.email)
 
         contact = Contact(
             name=contact_in.name,
@@ -35,9 +36,9 @@ async def create_contact(
             updated_at=current,
         )
         contact = await Contact.create(session, contact)
-        logger.info(f"[CREATE_CONTACT] 联系表单创建成功: id={contact.id}")
+        logger.info("[CREATE_CONTACT] 联系表单创建成功: id=%s", contact.id)
     except Exception as e:
-        logger.error(f"[CREATE_CONTACT] 创建联系表单失败: {e}")
+        logger.error("[CREATE_CONTACT] 创建联系表单失败: %s", e)
         raise InternalServerErrorException(message=f"Failed to create contact: {e}")
 
     result = ContactPublic(
@@ -49,13 +50,13 @@ async def create_contact(
         created_at=contact.created_at,
         updated_at=contact.updated_at,
     )
-    logger.info(f"[CREATE_CONTACT] 返回联系表单数据: id={result.id}, name={result.name}")
+    logger.info("[CREATE_CONTACT] 返回联系表单数据: id=%s, name=%s", result.id, result.name)
     return result
 
 
 @router.get("", response_model=ContactsPublic)
 async def list_contacts(session: SessionDep, params: ListParamsDep, search: str = None):
-    logger.info(f"[LIST_CONTACTS] 收到列表联系表单请求: search={search}, page={params.page}, per_page={params.perPage}")
+    logger.info("[LIST_CONTACTS] 收到列表联系表单请求: search=%s, page=%s, per_page=%s", search, params.page, params.perPage, extra=SAMPLED)
     
     if search:
         # 在多个字段中搜索（姓名、邮箱、主题、内容）
@@ -65,7 +66,7 @@ async def list_contacts(session: SessionDep, params: ListParamsDep, search: str
             "theme": search,
             "context": search
         }
-        logger.info(f"[LIST_CONTACTS] 设置搜索条件: {fuzzy_fields}")
+        logger.info("[LIST_CONTACTS] 设置搜索条件: %s", fuzzy_fields, extra=SAMPLED)
         
         # 使用自定义查询实现多字段搜索
         result = await Contact.paginated_by_query(
@@ -82,17 +83,24 @@ async def list_contacts(session: SessionDep, params: ListParamsDep, search: str
             per_page=params.perPage
         )
     
-    logger.info(f"[LIST_CONTACTS] 返回联系表单列表: 总数={len(result.data) if hasattr(result, 'data') else 'unknown'}")
+    logger.info("[LIST_CONTACTS] 返回联系表单列表: 总数=%s", len(result.data) if hasattr(result, 'data') else 'unknown', extra=SAMPLED)
     return result
 
 
+@router.get("/stats", response_model=ContactStats)
+async def contact_stats(session: SessionDep):
+    """联系表单统计，读取由事件增量维护的统计表"""
+    logger.info("[CONTACT_STATS] 收到统计请求", extra=SAMPLED)
+    return await read_stats(session, "contact")
+
+
 @router.get("/{contact_id}", response_model=ContactPublic)
 async def get_contact(session: SessionDep, contact_id: int):
-    logger.info(f"[GET_CONTACT] 收到获取联系表单请求: contact_id={contact_id}")
+    logger.info("[GET_CONTACT] 收到获取联系表单请求: contact_id=%s", contact_id, extra=SAMPLED)
     
     contact = await Contact.one_by_id(session, contact_id)
     if not contact:
-        logger.warning(f"[GET_CONTACT] 联系表单不存在: contact_id={contact_id}")
+        logger.warning("[GET_CONTACT] 联系表单不存在: contact_id=%s", contact_id)
         raise NotFoundException(message=f"Contact with id {contact_id} not found")
     
     result = ContactPublic(
@@ -105,24 +113,24 @@ async def get_contact(session: SessionDep, contact_id: int):
         updated_at=contact.updated_at,
     )
     
-    logger.info(f"[GET_CONTACT] 返回联系表单数据: id={result.id}, name={result.name}")
+    logger.info("[GET_CONTACT] 返回联系表单数据: id=%s, name=%s", result.id, result.name, extra=SAMPLED)
     return result
 
 
 @router.delete("/{contact_id}")
 async def delete_contact(session: SessionDep, contact_id: int):
-    logger.info(f"[DELETE_CONTACT] 收到删除联系表单请求: contact_id={contact_id}")
+    logger.info("[DELETE_CONTACT] 收到删除联系表单请求: contact_id=%s", contact_id)
     
     contact = await Contact.one_by_id(session, contact_id)
     if not contact:
-        logger.warning(f"[DELETE_CONTACT] 联系表单不存在: contact_id={contact_id}")
+        logger.warning("[DELETE_CONTACT] 联系表单不存在: contact_id=%s", contact_id)
         raise NotFoundException(message=f"Contact with id {contact_id} not found")
     
     try:
         await contact.delete(session)
-        logger.info(f"[DELETE_CONTACT] 联系表单删除成功: contact_id={contact_id}")
+        logger.info("[DELETE_CONTACT] 联系表单删除成功: contact_id=%s", contact_id)
     except Exception as e:
-        logger.error(f"[DELETE_CONTACT] 删除联系表单失败: {e}")
+        logger.error("[DELETE_CONTACT] 删除联系表单失败: %s", e)
         raise InternalServerErrorException(message=f"Failed to delete contact: {e}")
     
     return {"message": f"Contact {contact_id} deleted successfully"}
\ No newline at end of file
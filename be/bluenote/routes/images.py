@@ -0,0 +1,44 @@
+import asyncio
+import os
+
+from fastapi import APIRouter, Request
+
+from bluenote.api.exceptions import NotFoundException
+from bluenote.api.static import (
+    HASHED_NAME_PATTERN,
+    PRECOMPRESSED_ENCODINGS,
+    StaticFileResponse,
+    select_representation,
+)
+from bluenote.services.uploads import image_upload_store
+
+router = APIRouter()
+
+_compressed_suffixes = tuple(suffix for _, suffix in PRECOMPRESSED_ENCODINGS)
+
+
+@router.api_route("/{name}", methods=["GET", "HEAD"], include_in_schema=False)
+async def serve_image(request: Request, name: str):
+    """上传目录中的图片和缩略图，支持 Range、ETag 和预压缩文件"""
+    # 不对外提供隐藏文件（未完成的上传在 .partial 中）和预压缩文件本身
+    if os.path.basename(name) != name or name.startswith(".") or name.endswith(_compressed_suffixes + (".tmp",)):
+        raise NotFoundException(message=f"Image {name} not found")
+
+    accept_encoding = request.headers.get("accept-encoding")
+    selected = await asyncio.to_thread(select_representation, image_upload_store.path_for(name), accept_encoding)
+    if selected is None and HASHED_NAME_PATTERN.match(name):
+        # 垃圾回收第一次运行前，旧文件还没移入分片目录
+        path = os.path.join(image_upload_store.directory, name)
+        selected = await asyncio.to_thread(select_representation, path, accept_encoding)
+    if selected is None:
+        raise NotFoundException(message=f"Image {name} not found")
+
+    file_path, stat_result, encoding = selected
+    return StaticFileResponse(
+        file_path,
+        name=name,
+        stat_result=stat_result,
+        request_headers=request.headers,
+        encoding=encoding,
+        method=request.method,
+    )
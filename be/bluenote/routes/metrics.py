@@ -0,0 +1,15 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from bluenote.server import worker_metrics
+from bluenote.utils.metrics import render_prometheus
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus 文本格式的指标，多 worker 时汇总所有 worker，按 worker 标签区分"""
+    shared = worker_metrics.worker_metrics
+    exports = await shared.read_all() if shared is not None else None
+    return PlainTextResponse(render_prometheus(exports), media_type="text/plain; version=0.0.4")
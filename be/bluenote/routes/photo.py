@@ -1,35 +1,87 @@
+import base64
 from datetime import datetime, timezone
-from fastapi import APIRouter, HTTPException
+from typing import Optional, Tuple
+
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+from sqlalchemy import and_, extract, func, or_
+from sqlmodel import select
 
 from bluenote.api.exceptions import (
     AlreadyExistsException,
+    BadRequestException,
+    ForbiddenException,
     InternalServerErrorException,
     NotFoundException,
 )
 
+from bluenote.routes.auth import CurrentUserDep
 from bluenote.server.deps import SessionDep, ListParamsDep
-from bluenote.schemas.photos import PhotoCreate, PhotoPublic, PhotosPublic, Photo, PhotoUpdate, PhotoUpdateResponse
+from bluenote.schemas.photos import (
+    PhotoCreate,
+    PhotoPublic,
+    PhotoStats,
+    PhotosPublic,
+    PhotoTimeline,
+    PhotoTimelineBucket,
+    Photo,
+    PhotoUpdate,
+    PhotoUpdateResponse,
+    PhotoUploadPublic,
+    PhotoUploadStatus,
+)
 from bluenote.schemas.common import PaginatedList
-from bluenote.utils.logger import setup_logger
+from bluenote.schemas.images import split_url_list
+from bluenote.services.content_stats import read_stats
+from bluenote.services.uploads import image_upload_store, multipart_file_chunks
+from bluenote.utils.logger import SAMPLED, setup_logger
 
 router = APIRouter()
 logger = setup_logger(__name__)
 
 
+def _photo_data(photo: Photo) -> dict:
+    """照片行转换为 PhotoPublic 的输入，tags 和 url_list 由 PhotoPublic 从逗号分隔的字符串解析"""
+    return {
+        "id": photo.id,
+        "title": photo.title,
+        "description": photo.description,
+        "url_list": photo.url_list,
+        "location_name": photo.location_name,
+        "status": photo.status,
+        "visibility": photo.visibility,
+        "tags": photo.tags,
+        "category": photo.category,
+        "like_count": photo.like_count,
+        "comment_count": photo.comment_count,
+        "share_count": photo.share_count,
+        "view_count": photo.view_count,
+        "taken_at": photo.taken_at,
+        "created_at": photo.created_at,
+        "updated_at": photo.updated_at,
+        "variants": photo.variants or {},
+        "width": photo.width,
+        "height": photo.height,
+        "orientation": photo.orientation,
+        "latitude": photo.latitude,
+        "longitude": photo.longitude,
+        "dominant_color": photo.dominant_color,
+    }
+
+
 @router.post("", response_model=PhotoPublic)
 async def create_photo(
     session: SessionDep, photo_in: PhotoCreate
 ):
-    logger.info(f"[CREATE_PHOTO] 收到创建照片请求: {photo_in}")
+    logger.debug("[CREATE_PHOTO] 收到创建照片请求: %s", photo_in)
     
     # 检查URL列表是否为空
     if not photo_in.url_list or len(photo_in.url_list) == 0:
-        logger.warning(f"[CREATE_PHOTO] 照片URL列表为空")
+        logger.warning("[CREATE_PHOTO] 照片URL列表为空")
         raise HTTPException(status_code=400, detail="Photo URL list cannot be empty")
 
     try:
         current = datetime.now(timezone.utc)
-        logger.info(f"[CREATE_PHOTO] 创建照片对象: title={photo_in.title}, url_list={photo_in.url_list}")
+        logger.info("[CREATE_PHOTO] 创建照片对象: title=%s, url_list=%s", photo_in.title, photo_in.url_list)
         
         # 处理 taken_at 时区问题
         taken_at_utc = None
@@ -61,48 +113,71 @@ async def create_photo(
             updated_at=current.replace(tzinfo=None),
         )
         photo = await Photo.create(session, photo)
-        logger.info(f"[CREATE_PHOTO] 照片创建成功: id={photo.id}")
+        logger.info("[CREATE_PHOTO] 照片创建成功: id=%s", photo.id)
     except Exception as e:
-        logger.error(f"[CREATE_PHOTO] 创建照片失败: {e}")
+        logger.error("[CREATE_PHOTO] 创建照片失败: %s", e)
         raise InternalServerErrorException(message=f"Failed to create photo: {e}")
 
-    photo_data = {
-        "id": photo.id,
-        "title": photo.title,
-        "description": photo.description,
-        "url_list": photo.url_list,
-        "location_name": photo.location_name,
-        "status": photo.status,
-        "visibility": photo.visibility,
-        "tags": photo.tags,
-        "category": photo.category,
-        "like_count": photo.like_count,
-        "comment_count": photo.comment_count,
-        "share_count": photo.share_count,
-        "view_count": photo.view_count,
-        "taken_at": photo.taken_at,
-        "created_at": photo.created_at,
-        "updated_at": photo.updated_at,
-    }
+    photo_data = _photo_data(photo)
     result = PhotoPublic.model_validate(photo_data)
-    logger.info(f"[CREATE_PHOTO] 返回照片数据: id={result.id}, title={result.title}")
+    logger.info("[CREATE_PHOTO] 返回照片数据: id=%s, title=%s", result.id, result.title)
     return result
 
 
+@router.post("/upload", response_model=PhotoUploadPublic)
+async def upload_photo(request: Request, current_user: CurrentUserDep):
+    """上传图片（仅管理员），multipart/form-data 的 file 字段边接收边写入磁盘
+
+    文件以内容的 SHA-256 命名，重复上传相同图片只保存一份；返回的 url 可直接放入 url_list。
+    """
+    if not current_user.is_admin:
+        raise ForbiddenException(message="Not enough permissions")
+    logger.info("[UPLOAD_PHOTO] 收到上传请求: user=%s, content_length=%s", current_user.username, request.headers.get("content-length"))
+    chunks = multipart_file_chunks(request.stream(), request.headers.get("content-type", ""))
+    return await image_upload_store.save(chunks)
+
+
+@router.put("/upload/{upload_id}", response_model=PhotoUploadStatus)
+async def upload_photo_range(
+    request: Request,
+    current_user: CurrentUserDep,
+    upload_id: str,
+    content_range: str = Header(),
+):
+    """断点续传上传大图（仅管理员）
+
+    upload_id 由客户端生成，请求体为原始字节，Content-Range: bytes start-end/total 指明这段的位置，
+    start 必须等于已收到的字节数（可通过 GET 查询）。最后一段到达后返回的 upload 即上传结果。
+    """
+    if not current_user.is_admin:
+        raise ForbiddenException(message="Not enough permissions")
+    logger.info("[UPLOAD_PHOTO] 收到分段上传: upload_id=%s, content_range=%s", upload_id, content_range)
+    return await image_upload_store.save_range(upload_id, content_range, request.stream())
+
+
+@router.get("/upload/{upload_id}", response_model=PhotoUploadStatus)
+async def get_upload_status(current_user: CurrentUserDep, upload_id: str):
+    """查询断点续传已收到的字节数（仅管理员）"""
+    if not current_user.is_admin:
+        raise ForbiddenException(message="Not enough permissions")
+    offset = await image_upload_store.offset(upload_id)
+    return PhotoUploadStatus(upload_id=upload_id, offset=offset)
+
+
 @router.get("", response_model=PhotosPublic)
 async def list_photos(session: SessionDep, params: ListParamsDep, search: str = None, category: str = None):
-    logger.info(f"[LIST_PHOTOS] 收到列表照片请求: search={search}, category={category}, page={params.page}, per_page={params.perPage}")
+    logger.info("[LIST_PHOTOS] 收到列表照片请求: search=%s, category=%s, page=%s, per_page=%s", search, category, params.page, params.perPage, extra=SAMPLED)
     
     fuzzy_fields = {}
     fields = {}
     
     if search:
         fuzzy_fields = {"title": search}
-        logger.info(f"[LIST_PHOTOS] 设置搜索条件: {fuzzy_fields}")
+        logger.info("[LIST_PHOTOS] 设置搜索条件: %s", fuzzy_fields, extra=SAMPLED)
     
     if category:
         fields = {"category": category}
-        logger.info(f"[LIST_PHOTOS] 设置分类过滤: {fields}")
+        logger.info("[LIST_PHOTOS] 设置分类过滤: %s", fields, extra=SAMPLED)
 
     result = await Photo.paginated_by_query(
         session=session, 
@@ -115,122 +190,174 @@ async def list_photos(session: SessionDep, params: ListParamsDep, search: str =
     # Convert each photo item to PhotoPublic to ensure proper tags and url_list parsing
     photo_items = []
     for photo in result.items:
-        photo_data = {
-            "id": photo.id,
-            "title": photo.title,
-            "description": photo.description,
-            "url_list": photo.url_list,
-            "location_name": photo.location_name,
-            "status": photo.status,
-            "visibility": photo.visibility,
-            "tags": photo.tags,
-            "category": photo.category,
-            "like_count": photo.like_count,
-            "comment_count": photo.comment_count,
-            "share_count": photo.share_count,
-            "view_count": photo.view_count,
-            "taken_at": photo.taken_at,
-            "created_at": photo.created_at,
-            "updated_at": photo.updated_at,
-        }
+        photo_data = _photo_data(photo)
         photo_items.append(PhotoPublic.model_validate(photo_data))
     
-    logger.info(f"[LIST_PHOTOS] 返回照片列表: 总数={len(photo_items)}")
+    logger.info("[LIST_PHOTOS] 返回照片列表: 总数=%s", len(photo_items), extra=SAMPLED)
     return PaginatedList[PhotoPublic](items=photo_items, pagination=result.pagination)
 
 
+def _encode_cursor(photo: Photo) -> str:
+    raw = f"{photo.taken_at.isoformat()}|{photo.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        taken_at, photo_id = raw.split("|")
+        return datetime.fromisoformat(taken_at), int(photo_id)
+    except (ValueError, UnicodeDecodeError):
+        raise BadRequestException(message="Invalid cursor")
+
+
+def _month_range(month: str) -> Tuple[datetime, datetime]:
+    year, month_number = int(month[:4]), int(month[5:7])
+    return datetime(year, month_number, 1), datetime(year + month_number // 12, month_number % 12 + 1, 1)
+
+
+@router.get("/stats", response_model=PhotoStats)
+async def photo_stats(session: SessionDep):
+    """照片统计，读取由事件增量维护的统计表"""
+    logger.info("[PHOTO_STATS] 收到统计请求", extra=SAMPLED)
+    return await read_stats(session, "photo")
+
+
+@router.get("/timeline", response_model=PhotoTimeline)
+async def photo_timeline(
+    session: SessionDep,
+    month: Optional[str] = Query(default=None, pattern=r"^\d{4}-(0[1-9]|1[0-2])$"),
+    cursor: Optional[str] = None,
+    limit: int = Query(default=50, ge=1, le=200),
+):
+    """按拍摄时间（UTC）分月的照片时间线
+
+    buckets 是每个月的照片数，由 ix_photos_active_taken_at 上的一条 GROUP BY 查询得出。items 是 month 这个月（默认最新的月份）
+    的照片，按拍摄时间从新到旧；next_cursor 不为空时带上它请求同一个月的下一页。
+    没有拍摄时间的照片不在时间线中，只计入 undated。
+    """
+    logger.info("[PHOTO_TIMELINE] 收到时间线请求: month=%s, cursor=%s, limit=%s", month, cursor, limit, extra=SAMPLED)
+
+    year_column = extract("year", Photo.taken_at)
+    month_column = extract("month", Photo.taken_at)
+    # 聚合查询不受软删除过滤的影响，需要显式排除已删除的照片；taken_at 非空的条件让查询走部分索引
+    rows = (await session.exec(
+        select(year_column, month_column, func.count())
+        .where(Photo.deleted_at.is_(None), Photo.taken_at.is_not(None))
+        .group_by(year_column, month_column)
+        .order_by(year_column.desc(), month_column.desc())
+    )).all()
+    buckets = [
+        PhotoTimelineBucket(month=f"{int(year_value):04d}-{int(month_value):02d}", count=count)
+        for year_value, month_value, count in rows
+    ]
+    undated = (await session.exec(
+        select(func.count()).where(Photo.deleted_at.is_(None), Photo.taken_at.is_(None))
+    )).one()
+
+    after = _decode_cursor(cursor) if cursor else None
+    if month is None:
+        if after is not None:
+            month = after[0].strftime("%Y-%m")
+        elif buckets:
+            month = buckets[0].month
+    if month is None:
+        return PhotoTimeline(buckets=buckets, undated=undated)
+
+    # 月份条件是 taken_at 上的范围，翻页用 (taken_at, id) 的键集游标，都能走 ix_photos_active_taken_at
+    start, end = _month_range(month)
+    statement = select(Photo).where(Photo.taken_at >= start, Photo.taken_at < end)
+    if after is not None:
+        taken_at, photo_id = after
+        statement = statement.where(
+            or_(Photo.taken_at < taken_at, and_(Photo.taken_at == taken_at, Photo.id < photo_id))
+        )
+    statement = statement.order_by(Photo.taken_at.desc(), Photo.id.desc()).limit(limit + 1)
+    photos = (await session.exec(statement)).all()
+
+    next_cursor = None
+    if len(photos) > limit:
+        photos = photos[:limit]
+        next_cursor = _encode_cursor(photos[-1])
+
+    items = [PhotoPublic.model_validate(_photo_data(photo)) for photo in photos]
+    logger.info("[PHOTO_TIMELINE] 返回时间线: month=%s, items=%s, buckets=%s", month, len(items), len(buckets), extra=SAMPLED)
+    return PhotoTimeline(buckets=buckets, undated=undated, month=month, items=items, next_cursor=next_cursor)
+
+
 @router.get("/{photo_id}", response_model=PhotoPublic)
 async def get_photo(session: SessionDep, photo_id: int):
-    logger.info(f"[GET_PHOTO] 收到获取照片请求: photo_id={photo_id}")
+    logger.info("[GET_PHOTO] 收到获取照片请求: photo_id=%s", photo_id, extra=SAMPLED)
     
     photo = await Photo.one_by_id(session, photo_id)
     if not photo:
-        logger.warning(f"[GET_PHOTO] 照片不存在: photo_id={photo_id}")
+        logger.warning("[GET_PHOTO] 照片不存在: photo_id=%s", photo_id)
         raise NotFoundException(message=f"Photo with id {photo_id} not found")
     
     # 增加浏览数
     try:
         photo.view_count += 1
         await photo.save(session)
-        logger.info(f"[GET_PHOTO] 照片浏览数已更新: photo_id={photo_id}, view_count={photo.view_count}")
+        logger.info("[GET_PHOTO] 照片浏览数已更新: photo_id=%s, view_count=%s", photo_id, photo.view_count, extra=SAMPLED)
     except Exception as e:
-        logger.warning(f"[GET_PHOTO] 更新浏览数失败: {e}")
+        logger.warning("[GET_PHOTO] 更新浏览数失败: %s", e)
     
-    photo_data = {
-        "id": photo.id,
-        "title": photo.title,
-        "description": photo.description,
-        "url_list": photo.url_list,
-        "location_name": photo.location_name,
-        "status": photo.status,
-        "visibility": photo.visibility,
-        "tags": photo.tags,
-        "category": photo.category,
-        "like_count": photo.like_count,
-        "comment_count": photo.comment_count,
-        "share_count": photo.share_count,
-        "view_count": photo.view_count,
-        "taken_at": photo.taken_at,
-        "created_at": photo.created_at,
-        "updated_at": photo.updated_at,
-    }
+    photo_data = _photo_data(photo)
     result = PhotoPublic.model_validate(photo_data)
     
-    logger.info(f"[GET_PHOTO] 返回照片数据: id={result.id}, title={result.title}")
+    logger.info("[GET_PHOTO] 返回照片数据: id=%s, title=%s", result.id, result.title, extra=SAMPLED)
     return result
 
 
 @router.put("/{photo_id}", response_model=PhotoUpdateResponse)
 async def update_photo(session: SessionDep, photo_id: int, photo_update: PhotoUpdate):
-    logger.info(f"[UPDATE_PHOTO] 收到更新照片请求: photo_id={photo_id}, update_data={photo_update}")
+    logger.info("[UPDATE_PHOTO] 收到更新照片请求: photo_id=%s", photo_id)
+    logger.debug("[UPDATE_PHOTO] 更新内容: %s", photo_update)
     
     photo = await Photo.one_by_id(session, photo_id)
     if not photo:
-        logger.warning(f"[UPDATE_PHOTO] 照片不存在: photo_id={photo_id}")
+        logger.warning("[UPDATE_PHOTO] 照片不存在: photo_id=%s", photo_id)
         raise NotFoundException(message=f"Photo with id {photo_id} not found")
     
     try:
-        # 更新字段
+        # 更新字段，update 会发布 UPDATED 事件，缩略图任务据此处理新加入的原图
         update_data = photo_update.dict(exclude_unset=True)
-        for field, value in update_data.items():
-            setattr(photo, field, value)
-        
-        await photo.save(session)
-        logger.info(f"[UPDATE_PHOTO] 照片更新成功: photo_id={photo_id}")
+        await photo.update(session, update_data)
+        logger.info("[UPDATE_PHOTO] 照片更新成功: photo_id=%s", photo_id)
     except Exception as e:
-        logger.error(f"[UPDATE_PHOTO] 更新照片失败: {e}")
+        logger.error("[UPDATE_PHOTO] 更新照片失败: %s", e)
         raise InternalServerErrorException(message=f"Failed to update photo: {e}")
     
     result = PhotoUpdateResponse(
         id=photo.id,
         title=photo.title,
         description=photo.description,
-        url_list=photo.url_list or [],  # 返回更新后的URL列表，如果为None则使用空列表
+        url_list=split_url_list(photo.url_list),  # 返回更新后的URL列表，数据库中读出的是逗号分隔的字符串
         location_name=photo.location_name,
         status=photo.status,  # 返回更新后的状态
         visibility=photo.visibility,
-        tags=photo.tags,
+        tags=split_url_list(photo.tags) or None,
         category=photo.category,
     )
     
-    logger.info(f"[UPDATE_PHOTO] 返回更新后的照片数据: id={result.id}, title={result.title}")
+    logger.info("[UPDATE_PHOTO] 返回更新后的照片数据: id=%s, title=%s", result.id, result.title)
     return result
 
 
 @router.delete("/{photo_id}")
 async def delete_photo(session: SessionDep, photo_id: int):
-    logger.info(f"[DELETE_PHOTO] 收到删除照片请求: photo_id={photo_id}")
+    logger.info("[DELETE_PHOTO] 收到删除照片请求: photo_id=%s", photo_id)
     
     photo = await Photo.one_by_id(session, photo_id)
     if not photo:
-        logger.warning(f"[DELETE_PHOTO] 照片不存在: photo_id={photo_id}")
+        logger.warning("[DELETE_PHOTO] 照片不存在: photo_id=%s", photo_id)
         raise NotFoundException(message=f"Photo with id {photo_id} not found")
     
     try:
         await photo.delete(session)
-        logger.info(f"[DELETE_PHOTO] 照片删除成功: photo_id={photo_id}")
+        logger.info("[DELETE_PHOTO] 照片删除成功: photo_id=%s", photo_id)
     except Exception as e:
-        logger.error(f"[DELETE_PHOTO] 删除照片失败: {e}")
+        logger.error("[DELETE_PHOTO] 删除照片失败: %s", e)
         raise InternalServerErrorException(message=f"Failed to delete photo: {e}")
     
     return {"message": f"Photo {photo_id} deleted successfully"}
\ No newline at end of file
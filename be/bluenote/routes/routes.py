@@ -4,7 +4,8 @@ from bluenote.routes import (
     blog,
     photo,
     contact,
-    auth
+    auth,
+    ai
 )
 
 from bluenote.api.exceptions import error_responses, bluenote_api_error_responses
@@ -15,5 +16,6 @@ author_router.include_router(blog.router, prefix="/blogs", tags=["blogs"])
 author_router.include_router(photo.router, prefix="/photos", tags=["photos"])
 author_router.include_router(contact.router, prefix="/contacts", tags=["contacts"])
 author_router.include_router(auth.router, tags=["auth"])  # auth路由已包含/auth前缀
+author_router.include_router(ai.router, prefix="/ai", tags=["ai"])
 
 api_router.include_router(author_router, prefix="/v1")
\ No newline at end of file
@@ -1,6 +1,9 @@
 # 导入所有模型以确保 Alembic 能够检测到它们
 from .blogs import Blog, BlogBase, BlogCreate, BlogUpdate, BlogPublic, BlogStats, BlogsPublic, ContentStatus, Visibility
 from .photos import Photo, PhotoBase, PhotoCreate, PhotoUpdate, PhotoPublic, PhotoStats, PhotosPublic
+from .images import ImageBlob
+from .stats import StatsCounter
+from .ratelimits import RateLimitCounter
 from .contacts import Contact, ContactBase, ContactCreate, ContactUpdate, ContactPublic, ContactStats, ContactsPublic
 from .users import User, UserBase, UserCreate, UserUpdate, UserPublic, UsersPublic, UpdatePassword
 from .common import PaginatedList, UTCDateTime
@@ -12,6 +15,12 @@ __all__ = [
     'Photo', 'PhotoBase', 'PhotoCreate', 'PhotoUpdate', 'PhotoPublic', 'PhotoStats', 'PhotosPublic',
     # Contacts
     'Contact', 'ContactBase', 'ContactCreate', 'ContactUpdate', 'ContactPublic', 'ContactStats', 'ContactsPublic',
+    # Images
+    'ImageBlob',
+    # Stats
+    'StatsCounter',
+    # Rate limits
+    'RateLimitCounter',
     # Users
     'User', 'UserBase', 'UserCreate', 'UserUpdate', 'UserPublic', 'UsersPublic', 'UpdatePassword',
     # Common
@@ -5,6 +5,7 @@ import json
 from sqlalchemy import Column, UniqueConstraint, String, Text, Boolean, ForeignKey, Integer
 # 移除 PostgreSQL 特定的 JSON 导入
 # from sqlalchemy.dialects.postgresql import JSON
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlmodel import Field, SQLModel, Relationship
 from pydantic import model_validator
 
@@ -25,7 +26,7 @@ class Visibility(str, Enum):
     FRIENDS = "friends"  # 仅好友可见
     PRIVATE = "private"  # 仅自己可见
 
-from bluenote.mixins import BaseModelMixin
+from bluenote.mixins import BaseModelMixin, active_rows_index
 from bluenote.schemas.common import PaginatedList, UTCDateTime, BlogCategory
 
 class BlogBase(SQLModel):
@@ -69,7 +70,14 @@ class BlogBase(SQLModel):
 
 class Blog(BlogBase, BaseModelMixin, table=True):
     __tablename__ = 'blogs'
+    __table_args__ = (
+        active_rows_index('ix_blogs_active_created_at', 'created_at'),
+        # 未删除的博客标题唯一，由 create_unique 在插入时检查
+        active_rows_index('ix_blogs_active_title', 'title', unique=True),
+    )
     id: Optional[int] = Field(default=None, primary_key=True)
+    # 自动生成摘要时对应的标题和内容哈希，为空表示摘要由作者填写（或尚未生成）
+    summary_source_hash: Optional[str] = Field(default=None, max_length=64)
     model_config = ConfigDict(protected_namespaces=())
     
     async def save(self, session):
@@ -83,8 +91,8 @@ class Blog(BlogBase, BaseModelMixin, table=True):
             try:
                 # 调用父类的save方法
                 await super().save(session)
-                # 恢复为列表格式
-                self.tags = original_tags
+                # 恢复为列表格式，不标记为脏数据，避免下次flush写入列表
+                set_committed_value(self, 'tags', original_tags)
             except Exception as e:
                 # 如果保存失败，恢复原始值
                 self.tags = original_tags
@@ -4,7 +4,7 @@ from datetime import datetime
 from sqlalchemy import Column, String, Text
 from sqlmodel import Field, SQLModel
 
-from bluenote.mixins import BaseModelMixin
+from bluenote.mixins import BaseModelMixin, active_rows_index
 from bluenote.schemas.common import PaginatedList
 
 
@@ -19,6 +19,7 @@ class ContactBase(SQLModel):
 class Contact(ContactBase, BaseModelMixin, table=True):
     """联系表单数据库模型"""
     __tablename__ = 'contacts'
+    __table_args__ = (active_rows_index('ix_contacts_active_created_at', 'created_at'),)
     
     id: Optional[int] = Field(default=None, primary_key=True)
 
@@ -0,0 +1,72 @@
+import re
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional, Set
+
+from sqlalchemy import Column, update
+from sqlmodel import Field, SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from bluenote.config.config import settings
+from bluenote.mixins import ActiveRecordMixin
+from bluenote.schemas.common import UTCDateTime
+
+# 内容寻址的原图文件名：<sha256>.<扩展名>
+BLOB_NAME_PATTERN = re.compile(r"^([0-9a-f]{64})\.[a-z0-9]+$")
+
+
+def utc_now() -> datetime:
+    # timestamp is stored without timezone in db
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def split_url_list(url_list) -> List[str]:
+    """数据库中的 url_list 是逗号分隔的字符串，对象上也可能是列表"""
+    if isinstance(url_list, list):
+        return url_list
+    return [url.strip() for url in (url_list or "").split(",") if url.strip()]
+
+
+def blob_names_in(url_list) -> Set[str]:
+    """url_list 中指向上传目录原图的文件名，外部 URL 和缩略图不计入"""
+    prefix = f"{settings.UPLOAD_URL_PREFIX.rstrip('/')}/"
+    names = set()
+    for url in split_url_list(url_list):
+        if url.startswith(prefix) and BLOB_NAME_PATTERN.match(url[len(prefix):]):
+            names.add(url[len(prefix):])
+    return names
+
+
+class ImageBlob(ActiveRecordMixin, SQLModel, table=True):
+    """上传目录中一个原图文件的记录
+
+    ref_count 是 url_list 引用它的照片数（软删除但未清理的照片也算），同一张照片引用多次只算一次。
+    引用数为 0 且 updated_at 超过宽限期的文件由垃圾回收删除；重复上传相同内容会刷新 updated_at。
+    """
+    __tablename__ = 'image_blobs'
+
+    name: str = Field(primary_key=True, max_length=80)  # 文件名 <sha256>.<扩展名>
+    size: int = Field(default=0)
+    content_type: Optional[str] = Field(default=None, max_length=50)
+    ref_count: int = Field(default=0)
+    created_at: datetime = Field(default_factory=utc_now, sa_column=Column(UTCDateTime, nullable=False))
+    updated_at: datetime = Field(default_factory=utc_now, sa_column=Column(UTCDateTime, nullable=False))
+
+    @classmethod
+    async def adjust_refs(cls, session: AsyncSession, removed: Iterable[str], added: Iterable[str]) -> Set[str]:
+        """在调用方的事务中增减引用数，不提交
+
+        返回 added 中没有记录的文件名：文件已被垃圾回收删除（或从未登记），引用它的照片会指向不存在的文件。
+        """
+        now = utc_now()
+        missing = set()
+        for names, delta in ((set(removed), -1), (set(added), 1)):
+            if names:
+                result = await session.exec(
+                    update(cls)
+                    .where(cls.name.in_(names))
+                    .values(ref_count=cls.ref_count + delta, updated_at=now)
+                )
+                if delta > 0 and result.rowcount < len(names):
+                    existing = await session.exec(select(cls.name).where(cls.name.in_(names)))
+                    missing = names - set(existing)
+        return missing
@@ -1,16 +1,20 @@
-from typing import Optional, List
+from typing import Dict, Optional, List
 from datetime import datetime
 
-from sqlalchemy import Column, String, Text, Integer, Float
+from sqlalchemy import JSON, Column, String, Text, Integer, Float
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlmodel import Field, SQLModel
 from pydantic import model_validator
 
+from bluenote.api.exceptions import ConflictException
 from bluenote.schemas.blogs import ContentStatus, Visibility
 
 
 
-from bluenote.mixins import BaseModelMixin
+from bluenote.mixins import BaseModelMixin, active_rows_index
 from bluenote.schemas.common import PaginatedList, PhotoCategory
+from bluenote.schemas.images import ImageBlob, blob_names_in
 
 
 class PhotoBase(SQLModel):
@@ -65,14 +69,39 @@ class PhotoBase(SQLModel):
 class Photo(PhotoBase, BaseModelMixin, table=True):
     """照片数据库模型"""
     __tablename__ = 'photos'
+    __table_args__ = (
+        active_rows_index('ix_photos_active_created_at', 'created_at'),
+        # 时间线按拍摄时间分组和翻页
+        active_rows_index('ix_photos_active_taken_at', 'taken_at', 'id'),
+    )
     
     id: Optional[int] = Field(default=None, primary_key=True)
+    # 后台生成的缩略图：原图 URL -> 各宽度和格式的缩略图列表
+    variants: Optional[Dict[str, List[Dict]]] = Field(default=None, sa_column=Column(JSON))
+    # 后台从封面（url_list 中第一张上传的原图）读取的信息
+    width: Optional[int] = Field(default=None)  # 按 EXIF 方向旋转后的宽高
+    height: Optional[int] = Field(default=None)
+    orientation: Optional[int] = Field(default=None)  # EXIF 方向 1-8
+    latitude: Optional[float] = Field(default=None)  # EXIF GPS 坐标
+    longitude: Optional[float] = Field(default=None)
+    dominant_color: Optional[str] = Field(default=None, max_length=7)  # 主色 #rrggbb
     
     async def save(self, session):
-        """重写save方法，在保存前处理tags和url_list字段"""
+        """重写save方法，在保存前处理tags和url_list字段，并在同一事务中更新原图的引用数"""
         # 保存原始值
         original_tags = self.tags
         original_url_list = self.url_list
+
+        state = sa_inspect(self)
+        history = state.attrs.url_list.history
+        removed, added = set(), set()
+        if state.key is None:
+            # 新建的照片
+            added = blob_names_in(self.url_list)
+        elif history.has_changes():
+            old_names = blob_names_in(history.deleted[0]) if history.deleted else set()
+            new_names = blob_names_in(self.url_list)
+            removed, added = old_names - new_names, new_names - old_names
         
         try:
             # 如果tags是列表，转换为逗号分隔的字符串（包括空列表）
@@ -84,11 +113,21 @@ class Photo(PhotoBase, BaseModelMixin, table=True):
                 self.url_list = ','.join(self.url_list) if self.url_list else ''
             
             # 调用父类的save方法
-            await super().save(session)
+            if removed or added:
+                async with self.unit_of_work(session):
+                    missing = await ImageBlob.adjust_refs(session, removed, added)
+                    if missing:
+                        # 文件在垃圾回收中刚被删除，不保存指向它的照片
+                        raise ConflictException(
+                            message=f"Uploaded image no longer exists, please upload it again: {', '.join(sorted(missing))}"
+                        )
+                    await super().save(session)
+            else:
+                await super().save(session)
             
-            # 恢复为列表格式
-            self.tags = original_tags
-            self.url_list = original_url_list
+            # 恢复为列表格式，不标记为脏数据，避免下次flush写入列表
+            set_committed_value(self, 'tags', original_tags)
+            set_committed_value(self, 'url_list', original_url_list)
             
         except Exception as e:
             # 如果保存失败，恢复原始值
@@ -114,12 +153,44 @@ class PhotoUpdate(SQLModel):
     location_name: Optional[str] = None
 
 
+class PhotoVariant(SQLModel):
+    """照片缩略图"""
+    url: str
+    width: int
+    height: int
+    format: str  # webp 或 avif
+
+
 class PhotoPublic(PhotoBase):
     """公开照片响应模型"""
     id: int
     created_at: datetime
     updated_at: datetime
     url_list: List[str] = Field(default_factory=list)  # 确保返回空列表而不是None
+    # 原图 URL -> 缩略图列表，可用于 srcset；尚未生成的原图不在其中
+    variants: Dict[str, List[PhotoVariant]] = Field(default_factory=dict)
+    # 封面的宽高、EXIF 方向、GPS 坐标和主色，后台读取完成前为空；图库可据此先排版占位
+    width: Optional[int] = None
+    height: Optional[int] = None
+    orientation: Optional[int] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    dominant_color: Optional[str] = None
+
+
+class PhotoTimelineBucket(SQLModel):
+    """时间线中的一个月"""
+    month: str  # YYYY-MM（UTC）
+    count: int
+
+
+class PhotoTimeline(SQLModel):
+    """按拍摄时间分月的照片时间线"""
+    buckets: List[PhotoTimelineBucket]  # 所有有照片的月份，从新到旧
+    undated: int = 0  # 没有拍摄时间、不在时间线中的照片数
+    month: Optional[str] = None  # items 所在的月份
+    items: List[PhotoPublic] = Field(default_factory=list)  # 按拍摄时间从新到旧
+    next_cursor: Optional[str] = None  # 本月还有更多照片时，用它请求下一页
 
 
 class PhotoUpdateResponse(SQLModel):
@@ -137,6 +208,23 @@ class PhotoUpdateResponse(SQLModel):
 
 
 
+class PhotoUploadPublic(SQLModel):
+    """图片上传结果，url 可直接放入 url_list"""
+    url: str
+    sha256: str  # 文件内容的 SHA-256，同时也是文件名
+    size: int
+    content_type: str
+    deduplicated: bool = False  # 相同内容已经上传过，没有重复保存
+
+
+class PhotoUploadStatus(SQLModel):
+    """断点续传进度，全部数据到达后 upload 为上传结果"""
+    upload_id: str
+    offset: int  # 已收到的字节数，下一段从这里开始
+    total: Optional[int] = None
+    upload: Optional[PhotoUploadPublic] = None
+
+
 class PhotoStats(SQLModel):
     """照片统计信息"""
     total_photos: int
@@ -0,0 +1,20 @@
+from typing import Optional
+
+from sqlmodel import Field, SQLModel
+
+from bluenote.mixins import ActiveRecordMixin
+
+
+class RateLimitCounter(ActiveRecordMixin, SQLModel, table=True):
+    """登录限流的滑动窗口计数和锁定时间，多 worker 时所有进程共用
+
+    时间都是 Unix 时间戳（秒）。window_start 是当前固定窗口的开始时间，
+    previous 和 current 分别是上一个窗口和当前窗口的计数。
+    """
+    __tablename__ = 'rate_limits'
+
+    key: str = Field(primary_key=True, max_length=300)
+    window_start: float = Field(default=0.0, index=True)
+    previous: int = Field(default=0)
+    current: int = Field(default=0)
+    locked_until: Optional[float] = Field(default=None)
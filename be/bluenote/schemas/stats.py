@@ -0,0 +1,22 @@
+from datetime import datetime
+
+from sqlalchemy import Column
+from sqlmodel import Field, SQLModel
+
+from bluenote.mixins import ActiveRecordMixin
+from bluenote.schemas.common import UTCDateTime
+from bluenote.schemas.images import utc_now
+
+
+class StatsCounter(ActiveRecordMixin, SQLModel, table=True):
+    """预先计算的统计值，每个计数器一行
+
+    scope 是统计的对象（blog、photo、contact），name 是 BlogStats 等统计模型的字段名。
+    计数器由事件增量更新，定期对账任务按数据表重新计算，修正增量更新产生的偏差。
+    """
+    __tablename__ = 'stats_counters'
+
+    scope: str = Field(primary_key=True, max_length=20)
+    name: str = Field(primary_key=True, max_length=50)
+    value: int = Field(default=0)
+    updated_at: datetime = Field(default_factory=utc_now, sa_column=Column(UTCDateTime, nullable=False))
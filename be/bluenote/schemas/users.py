@@ -5,7 +5,7 @@ from pydantic import field_validator
 from sqlmodel import Field, SQLModel
 
 from .common import PaginatedList
-from ..mixins import BaseModelMixin
+from ..mixins import BaseModelMixin, active_rows_index
 
 
 class UserBase(SQLModel):
@@ -54,6 +54,7 @@ class UpdatePassword(SQLModel):
 
 class User(UserBase, BaseModelMixin, table=True):
     __tablename__ = 'users'
+    __table_args__ = (active_rows_index('ix_users_active_username', 'username'),)
     id: Optional[int] = Field(default=None, primary_key=True)
     hashed_password: str
 
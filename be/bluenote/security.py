@@ -1,10 +1,18 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
 import secrets
 import string
+import time
 from datetime import datetime, timedelta, timezone
-from typing import Optional, Union
+from typing import Any, Callable, Optional, Union
 import jwt
 from argon2 import PasswordHasher
 
+from bluenote.api.exceptions import ServiceUnavailableException
+from bluenote.config.config import settings
+from bluenote.utils.cache import TTLCache
+
 ph = PasswordHasher()
 
 JWT_TOKEN_EXPIRE_MINUTES = 120
@@ -21,6 +29,95 @@ def get_secret_hash(plain: Union[str, bytes]):
     return ph.hash(plain)
 
 
+class PasswordHashingPool:
+    """
+    Run argon2 hashing and verification in a bounded thread pool, off the event loop.
+
+    argon2-cffi releases the GIL while hashing, so the workers hash in parallel.
+    At most `max_workers` calls run at once, the rest wait in line; once
+    `max_pending` calls are running or waiting new ones are rejected with 503.
+    With `max_workers=0` calls run inline on the event loop.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._semaphore = asyncio.Semaphore(max(max_workers, 1))
+
+        self.pending = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.queue_wait_seconds_total = 0.0
+        self.queue_wait_seconds_max = 0.0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="argon2"
+            )
+        return self._executor
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        if self.max_workers <= 0:
+            return func(*args)
+
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise ServiceUnavailableException(message="Too many pending password operations")
+
+        self.pending += 1
+        queued_at = time.perf_counter()
+        try:
+            async with self._semaphore:
+                waited = time.perf_counter() - queued_at
+                self.queue_wait_seconds_total += waited
+                self.queue_wait_seconds_max = max(self.queue_wait_seconds_max, waited)
+                self.in_flight += 1
+                try:
+                    loop = asyncio.get_running_loop()
+                    return await loop.run_in_executor(self._get_executor(), func, *args)
+                finally:
+                    self.in_flight -= 1
+                    self.completed += 1
+        finally:
+            self.pending -= 1
+
+    def stats(self) -> dict:
+        return {
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "in_flight": self.in_flight,
+            "queued": self.pending - self.in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "queue_wait_seconds_total": self.queue_wait_seconds_total,
+            "queue_wait_seconds_max": self.queue_wait_seconds_max,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+hashing_config = settings.get_password_hashing_config()
+password_hashing_pool = PasswordHashingPool(
+    max_workers=hashing_config["workers"],
+    max_pending=hashing_config["max_pending"],
+)
+
+
+async def verify_hashed_secret_async(hashed: Union[str, bytes], plain: Union[str, bytes]) -> bool:
+    return await password_hashing_pool.run(verify_hashed_secret, hashed, plain)
+
+
+async def get_secret_hash_async(plain: Union[str, bytes]) -> str:
+    return await password_hashing_pool.run(get_secret_hash, plain)
+
+
 def generate_secure_password(length=12):
     if length < 8:
         raise ValueError("Password length should be at least 8 characters")
@@ -44,19 +141,48 @@ class JWTManager:
         secret_key: str,
         algorithm: str = "HS256",
         expires_delta: Optional[timedelta] = None,
+        token_cache_size: int = 0,
     ):
         if expires_delta is None:
             expires_delta = timedelta(minutes=JWT_TOKEN_EXPIRE_MINUTES)
         self.secret_key = secret_key
         self.algorithm = algorithm
         self.expires_delta = expires_delta
+        # 已验证 token 的解码结果，键为 token 的 sha256，条目在 exp 时过期
+        self.token_cache = TTLCache(maxsize=token_cache_size) if token_cache_size > 0 else None
 
     def create_jwt_token(self, username: str):
-        to_encode = {"sub": username}
+        to_encode = {"sub": username, "jti": secrets.token_urlsafe(16)}
         expire = datetime.now(timezone.utc) + self.expires_delta
         to_encode.update({"exp": expire})
         encoded_jwt = jwt.encode(to_encode, self.secret_key, algorithm=self.algorithm)
         return encoded_jwt
 
     def decode_jwt_token(self, token: str):
-        return jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
+        if self.token_cache is None:
+            return jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
+
+        key = hashlib.sha256(token.encode()).digest()
+        payload = self.token_cache.get(key)
+        if payload is not None:
+            return dict(payload)
+
+        payload = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
+        ttl = None
+        if "exp" in payload:
+            ttl = payload["exp"] - time.time()
+            if ttl <= 0:
+                return payload
+        self.token_cache.set(key, payload, ttl=ttl)
+        return dict(payload)
+
+    def invalidate_subject(self, subject: str) -> int:
+        """丢弃指定用户的已验证 token，返回丢弃的条目数"""
+        if self.token_cache is None:
+            return 0
+        return self.token_cache.invalidate(lambda _, payload: payload.get("sub") == subject)
+
+    def cache_stats(self) -> dict:
+        if self.token_cache is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.token_cache.stats()}
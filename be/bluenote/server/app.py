@@ -1,16 +1,24 @@
+import asyncio
 from contextlib import asynccontextmanager
-import aiohttp
 import os
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi_cdn_host import monkey_patch_for_docs_ui
 
 from bluenote.api import exceptions, middlewares
+from bluenote.routes import images, metrics
 from bluenote.routes.routes import api_router
-from bluenote.server.db import init_db, get_session
+from bluenote.server.db import close_db, init_db, get_session
+from bluenote.server.jobs import run_leader_jobs_forever, run_purge_soft_deleted_forever
+from bluenote.server.worker_metrics import start_worker_metrics, stop_worker_metrics
 from bluenote.config.config import settings
 from bluenote.schemas.users import User, UserCreate
-from bluenote.security import get_secret_hash
+from bluenote.security import get_secret_hash_async, password_hashing_pool
+from bluenote.services.content_stats import start_content_stats_aggregator, stop_content_stats_aggregator
+from bluenote.services.blog_summary import start_blog_summary_pipeline, stop_blog_summary_pipeline
+from bluenote.services.openai import close_openai_service
+from bluenote.services.photo_variants import start_photo_variant_pipeline, stop_photo_variant_pipeline
+from bluenote.utils.locks import FileLock
 from sqlmodel import select
 
 async def init_admin_user():
@@ -18,8 +26,7 @@ async def init_admin_user():
     async for session in get_session():
         # 检查是否已存在管理员账号
         statement = select(User).where(
-            User.username == settings.INIT_ADMIN_USERNAME,
-            User.deleted_at.is_(None)
+            User.username == settings.INIT_ADMIN_USERNAME
         )
         result = await session.exec(statement)
         existing_admin = result.first()
@@ -33,7 +40,7 @@ async def init_admin_user():
                 full_name="系统管理员"
             )
             
-            hashed_password = get_secret_hash(admin_data.password)
+            hashed_password = await get_secret_hash_async(admin_data.password)
             admin_user = User(
                 username=admin_data.username,
                 is_admin=admin_data.is_admin,
@@ -51,16 +58,43 @@ async def init_admin_user():
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # 使用配置文件中的数据库URL
-    database_url = settings.get_database_url()
-    await init_db(database_url)
+    lock_dir = settings.get_server_config()["lock_dir"]
+    # 多个 worker 同时启动时依次建表和创建管理员账号，避免重复建表、重复插入
+    async with FileLock(os.path.join(lock_dir, "startup.lock")):
+        # 使用配置文件中的数据库URL
+        database_url = settings.get_database_url()
+        await init_db(database_url, create_all=settings.DB_CREATE_ALL)
+        
+        # 初始化管理员账号
+        await init_admin_user()
+    
+    # 事件驱动的任务在每个 worker 中处理本进程的写入
+    # 博客创建或更新后在后台生成摘要
+    start_blog_summary_pipeline()
+    # 照片创建或更新后在后台生成缩略图
+    start_photo_variant_pipeline()
+    # 博客、照片和联系表单的统计随事件增量更新
+    stats_aggregator = start_content_stats_aggregator()
+    # 多 worker 时定期写出本进程的指标，供 /metrics 汇总
+    start_worker_metrics()
     
-    # 初始化管理员账号
-    await init_admin_user()
+    # 定期任务只在一个 worker 中运行：清理过期的软删除记录和未完成的上传、回收图片、统计对账
+    leader_jobs = [run_purge_soft_deleted_forever]
+    if stats_aggregator is not None:
+        leader_jobs.append(stats_aggregator.reconcile_forever)
+    leader_task = asyncio.create_task(run_leader_jobs_forever(os.path.join(lock_dir, "leader.lock"), leader_jobs))
     
-    app.state.http_client = aiohttp.ClientSession()
     yield
-    await app.state.http_client.close()
+    leader_task.cancel()
+    await asyncio.gather(leader_task, return_exceptions=True)
+    await stop_blog_summary_pipeline()
+    await stop_photo_variant_pipeline()
+    await stop_content_stats_aggregator()
+    await stop_worker_metrics()
+    password_hashing_pool.shutdown()
+    await close_openai_service()
+    # 后台任务都已停止，最后关闭数据库连接池
+    await close_db()
 
 def create_app() -> FastAPI:
     """创建 FastAPI 应用实例"""
@@ -83,12 +117,22 @@ def create_app() -> FastAPI:
         allow_headers=["*"],
     )
     
-    app.add_middleware(middlewares.RequestTimeMiddleware)
+    app.add_middleware(middlewares.MetricsMiddleware)
     
     app.include_router(api_router)
+    # 上传的图片由后端直接提供，不再经过前端转发
+    app.include_router(images.router, prefix=settings.UPLOAD_URL_PREFIX.rstrip("/"))
+    if settings.METRICS_ENABLED:
+        app.include_router(metrics.router)
     exceptions.register_handlers(app)
     
     return app
 
-# 为了向后兼容，保留这个实例
-app = create_app()
\ No newline at end of file
+def __getattr__(name: str):
+    # 为了向后兼容，保留 `bluenote.server.app:app` 这个实例，但只在被访问时创建；
+    # 通过 create_app 工厂启动时不会在导入模块时多创建一次应用
+    if name == "app":
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
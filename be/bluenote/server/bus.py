@@ -1,6 +1,6 @@
 import asyncio
 from dataclasses import dataclass
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 from enum import Enum
 import copy
 
@@ -11,18 +11,30 @@ class EventType(Enum):
     DELETED = 3
     UNKNOWN = 4
     HEARTBEAT = 5
+    SHUTDOWN = 6
 
 
 @dataclass
 class Event:
     type: EventType
     data: Any
+    # UPDATED events from `ActiveRecordMixin.update`: the values the changed columns had
+    # before the update, None when some of them were not loaded
+    previous: Optional[Dict[str, Any]] = None
 
     def __post_init__(self):
         if isinstance(self.type, int):
             self.type = EventType(self.type)
 
 
+def copy_event(event: Event) -> Event:
+    """Deep copy an event for a subscriber, ORM rows are copied through `detached_copy`."""
+    detached_copy = getattr(event.data, "detached_copy", None)
+    if callable(detached_copy):
+        return Event(type=event.type, data=detached_copy(), previous=copy.deepcopy(event.previous))
+    return copy.deepcopy(event)
+
+
 def event_decoder(obj):
     if "type" in obj:
         obj["type"] = EventType[obj["type"]]
@@ -41,6 +53,14 @@ class Subscriber:
 
 
 class EventBus:
+    """In-process publish/subscribe of model events.
+
+    Each worker process has its own bus: subscribers only see the writes made
+    in their process. The background pipelines rely on that (every write is
+    handled once, by the worker that made it); a watch stream served by one
+    worker does not see writes made in the others.
+    """
+
     def __init__(self):
         self.subscribers: Dict[str, List[Subscriber]] = {}
 
@@ -57,10 +77,19 @@ class EventBus:
             if not self.subscribers[topic]:
                 del self.subscribers[topic]
 
+    def has_subscribers(self, topic: str) -> bool:
+        return bool(self.subscribers.get(topic))
+
     async def publish(self, topic: str, event: Event):
         if topic in self.subscribers:
             for subscriber in self.subscribers[topic]:
-                await subscriber.enqueue(copy.deepcopy(event))
+                await subscriber.enqueue(copy_event(event))
+
+    def drain(self):
+        """Send SHUTDOWN to every subscriber so long-lived streams end before the server stops."""
+        for subscribers in self.subscribers.values():
+            for subscriber in subscribers:
+                subscriber.queue.put_nowait(Event(type=EventType.SHUTDOWN, data=None))
 
 
 event_bus = EventBus()
@@ -9,8 +9,12 @@ from sqlalchemy import DDL, event
 
 from bluenote.schemas.blogs import Blog
 from bluenote.schemas.contacts import Contact
+from bluenote.schemas.images import ImageBlob
 from bluenote.schemas.photos import Photo
+from bluenote.schemas.ratelimits import RateLimitCounter
+from bluenote.schemas.stats import StatsCounter
 from bluenote.schemas.users import User
+from bluenote.server.instrumentation import listen_events
 
 
 
@@ -26,7 +30,7 @@ async def get_session():
         yield session
 
 
-async def init_db(db_url: str):
+async def init_db(db_url: str, create_all: bool = True):
     global _engine
     if _engine is None:
         connect_args = {}
@@ -40,9 +44,17 @@ async def init_db(db_url: str):
             raise Exception(f"Unsupported database URL: {db_url}")
 
         _engine = create_async_engine(db_url, echo=False, connect_args=connect_args)
-        # 如果需要事件监听，可以在这里添加
-        # listen_events(_engine)
-    await create_db_and_tables(_engine)
+        # 语句计时、按请求统计查询数和慢查询
+        listen_events(_engine)
+    if create_all:
+        await create_db_and_tables(_engine)
+
+
+async def close_db():
+    global _engine
+    if _engine is not None:
+        await _engine.dispose()
+        _engine = None
 
 
 async def create_db_and_tables(engine: AsyncEngine):
@@ -52,13 +64,11 @@ async def create_db_and_tables(engine: AsyncEngine):
             tables=[
                 Blog.__table__,
                 Contact.__table__,
+                ImageBlob.__table__,
                 Photo.__table__,
+                RateLimitCounter.__table__,
+                StatsCounter.__table__,
                 User.__table__,
             ],
         )
 
-
-# 如果需要事件监听功能，可以添加这个函数
-# def listen_events(engine: AsyncEngine):
-#     # 在这里添加数据库事件监听逻辑
-#     pass
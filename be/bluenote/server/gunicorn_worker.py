@@ -0,0 +1,26 @@
+import sys
+
+from gunicorn.arbiter import Arbiter
+from uvicorn.workers import UvicornWorker
+
+from bluenote.server.launcher import DrainingServer
+
+
+class DrainingUvicornWorker(UvicornWorker):
+    """Gunicorn worker running `DrainingServer`, so SSE streams are drained on shutdown.
+
+    Only importable when gunicorn is installed; `run_production` refers to it by name.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Finish draining before gunicorn gives up on the worker and kills it
+        self.config.timeout_graceful_shutdown = self.cfg.graceful_timeout
+
+    async def _serve(self) -> None:
+        self.config.app = self.wsgi
+        server = DrainingServer(config=self.config)
+        self._install_sigquit_handler()
+        await server.serve(sockets=self.sockets)
+        if not server.started:
+            sys.exit(Arbiter.WORKER_BOOT_ERROR)
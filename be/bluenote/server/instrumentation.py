@@ -0,0 +1,121 @@
+import time
+from collections import Counter as StatementCounter
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import Mapper
+
+from bluenote.config.config import settings
+from bluenote.utils import metrics
+from bluenote.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+db_query_duration_seconds = metrics.histogram(
+    "db_query_duration_seconds", "Time spent executing single SQL statements", labelnames=("operation",)
+)
+db_queries_per_request = metrics.histogram(
+    "db_queries_per_request", "SQL statements executed per HTTP request",
+    buckets=COUNT_BUCKETS, labelnames=("route",),
+)
+db_time_per_request_seconds = metrics.histogram(
+    "db_time_per_request_seconds", "Time spent in SQL statements per HTTP request", labelnames=("route",)
+)
+db_rows_per_request = metrics.histogram(
+    "db_rows_per_request", "Rows loaded into ORM objects or changed by DML per HTTP request",
+    buckets=COUNT_BUCKETS, labelnames=("route",),
+)
+db_slow_queries_total = metrics.counter(
+    "db_slow_queries_total", "SQL statements slower than DB_SLOW_QUERY_MS", labelnames=("operation",)
+)
+db_n_plus_one_total = metrics.counter(
+    "db_n_plus_one_total", "HTTP requests that repeated one statement DB_N_PLUS_ONE_THRESHOLD times or more",
+    labelnames=("route",),
+)
+
+
+class QueryStats:
+    """当前请求内执行的 SQL 语句统计"""
+
+    __slots__ = ("path", "count", "duration", "rows", "statements")
+
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+        self.duration = 0.0
+        self.rows = 0
+        self.statements = StatementCounter()
+
+
+current_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("current_query_stats", default=None)
+
+
+def _operation(statement: str) -> str:
+    return statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "UNKNOWN"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # 开始时间记在本条语句的执行上下文上：语句出错时没有 after_cursor_execute，
+    # 记在连接上会留在连接池里的连接中，之后的语句和错误的开始时间配对
+    if context is not None:
+        context._query_start_time = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, "_query_start_time", None)
+    if start is None:
+        return
+    duration = time.perf_counter() - start
+    operation = _operation(statement)
+    db_query_duration_seconds.labels(operation).observe(duration)
+
+    stats = current_query_stats.get()
+    if stats is not None:
+        stats.count += 1
+        stats.duration += duration
+        stats.statements[statement] += 1
+        if operation in ("INSERT", "UPDATE", "DELETE") and cursor.rowcount > 0:
+            stats.rows += cursor.rowcount
+
+    if duration * 1000 >= settings.DB_SLOW_QUERY_MS:
+        db_slow_queries_total.labels(operation).inc()
+        path = stats.path if stats is not None else "-"
+        logger.warning(
+            "[SLOW_QUERY] %.1fms path=%s sql=%s", duration * 1000, path, statement[:500],
+            extra={"duration_ms": round(duration * 1000, 1), "path": path, "operation": operation},
+        )
+
+
+def _count_loaded_row(target, context):
+    stats = current_query_stats.get()
+    if stats is not None:
+        stats.rows += 1
+
+
+def listen_events(engine: AsyncEngine):
+    """在引擎上注册语句计时钩子"""
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+    if not event.contains(Mapper, "load", _count_loaded_row):
+        event.listen(Mapper, "load", _count_loaded_row)
+
+
+def record_request(stats: QueryStats, route: str):
+    """请求结束时按路由汇总，并检查 N+1 查询"""
+    db_queries_per_request.labels(route).observe(stats.count)
+    db_time_per_request_seconds.labels(route).observe(stats.duration)
+    db_rows_per_request.labels(route).observe(stats.rows)
+
+    if not stats.statements:
+        return
+    statement, repeats = stats.statements.most_common(1)[0]
+    if repeats >= settings.DB_N_PLUS_ONE_THRESHOLD:
+        db_n_plus_one_total.labels(route).inc()
+        logger.warning(
+            "[N_PLUS_ONE] route=%s 同一语句执行了 %s 次（共 %s 条）: %s", route, repeats, stats.count, statement[:500],
+            extra={"route": route, "repeats": repeats, "statements": stats.count},
+        )
@@ -0,0 +1,77 @@
+import asyncio
+import os
+from datetime import timedelta
+from typing import Awaitable, Callable, Sequence
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from bluenote.config.config import settings
+from bluenote.schemas.blogs import Blog
+from bluenote.schemas.contacts import Contact
+from bluenote.schemas.photos import Photo
+from bluenote.schemas.users import User
+from bluenote.server.db import get_engine
+from bluenote.services.uploads import image_upload_store
+from bluenote.utils.locks import FileLock
+from bluenote.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+SOFT_DELETED_MODELS = [Blog, Contact, Photo, User]
+
+# How often a worker that is not the leader checks whether the leader is gone
+LEADER_POLL_SECONDS = 5.0
+
+
+async def purge_soft_deleted():
+    """Hard-delete tombstones older than the retention period from every soft-deleted table."""
+    config = settings.get_soft_delete_config()
+    older_than = timedelta(days=config["retention_days"])
+    async with AsyncSession(get_engine()) as session:
+        for model in SOFT_DELETED_MODELS:
+            purged = await model.purge_soft_deleted(
+                session, older_than, batch_size=config["purge_batch_size"]
+            )
+            if purged:
+                logger.info("[PURGE] %s: 已清理 %s 条软删除记录", model.__tablename__, purged)
+
+
+async def run_purge_soft_deleted_forever():
+    """Run `purge_soft_deleted` every purge interval until cancelled."""
+    interval = settings.get_soft_delete_config()["purge_interval_seconds"]
+    while True:
+        try:
+            await purge_soft_deleted()
+        except Exception as e:
+            logger.error("[PURGE] 清理软删除记录失败: %s", e)
+        try:
+            purged = await image_upload_store.purge_stale_partials()
+            if purged:
+                logger.info("[PURGE] 已清理 %s 个未完成的上传", purged)
+        except Exception as e:
+            logger.error("[PURGE] 清理未完成的上传失败: %s", e)
+        try:
+            # 软删除的照片清理后，它们引用的图片才可能变成无引用
+            removed, freed = await image_upload_store.collect_garbage()
+            if removed:
+                logger.info("[PURGE] 已回收 %s 个无引用的图片, 释放 %s 字节", removed, freed)
+        except Exception as e:
+            logger.error("[PURGE] 回收无引用的图片失败: %s", e)
+        await asyncio.sleep(interval)
+
+
+async def run_leader_jobs_forever(lock_path: str, jobs: Sequence[Callable[[], Awaitable]]):
+    """Run the periodic `jobs` in one worker process only, until cancelled.
+
+    Every worker calls this; the one holding the lock file is the leader and
+    runs the jobs, the others wait and take over when it exits (e.g. when it
+    is restarted after max requests). Event-driven pipelines are not jobs:
+    each worker handles the events of the writes it made itself.
+    """
+    lock = FileLock(lock_path, poll_interval=LEADER_POLL_SECONDS)
+    await lock.acquire()
+    try:
+        logger.info("[JOBS] 当前进程负责运行定期任务: pid=%s", os.getpid())
+        await asyncio.gather(*(job() for job in jobs))
+    finally:
+        lock.release()
@@ -0,0 +1,246 @@
+import importlib.util
+import logging
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from multiprocessing.process import BaseProcess
+from typing import Callable, List, Optional
+
+import uvicorn
+
+from bluenote.api.sse import begin_drain
+from bluenote.config.config import WORKER_ID_ENV
+
+APP = "bluenote.server.app:create_app"
+GUNICORN_WORKER = "bluenote.server.gunicorn_worker.DrainingUvicornWorker"
+
+# Exit code of a worker that failed to start, same as gunicorn's
+WORKER_BOOT_ERROR = 3
+# Restart delay after a worker crashes, doubled on every crash in a row
+RESTART_BACKOFF_SECONDS = 0.5
+RESTART_BACKOFF_MAX_SECONDS = 30.0
+# A worker that stays up this long is healthy again, its crash count is reset
+CRASH_RESET_SECONDS = 60.0
+
+logger = logging.getLogger("uvicorn.error")
+
+
+class DrainingServer(uvicorn.Server):
+    """uvicorn server that lets in-flight SSE streams end cleanly before it stops.
+
+    Every way out of the serve loop (SIGTERM/SIGINT, or reaching
+    `limit_max_requests`) goes through `shutdown`, which starts draining the
+    streams before uvicorn waits `timeout_graceful_shutdown` for them.
+    """
+
+    def __init__(self, config: uvicorn.Config, max_requests_jitter: int = 0):
+        super().__init__(config)
+        self.max_requests_jitter = max_requests_jitter
+
+    def run(self, sockets: Optional[List[socket.socket]] = None) -> None:
+        # Runs in the worker process: each worker gets its own jitter so they don't restart together
+        if self.config.limit_max_requests and self.max_requests_jitter:
+            self.config.limit_max_requests += random.randint(0, self.max_requests_jitter)
+        super().run(sockets=sockets)
+        if not self.started:
+            sys.exit(WORKER_BOOT_ERROR)
+
+    async def shutdown(self, sockets: Optional[List[socket.socket]] = None) -> None:
+        begin_drain(self.config.timeout_graceful_shutdown or 0)
+        await super().shutdown(sockets=sockets)
+
+
+def _run_worker(config: uvicorn.Config, target: Callable, sockets: List[socket.socket]):
+    # Entry point of a spawned worker process
+    config.configure_logging()
+    target(sockets=sockets)
+
+
+@dataclass
+class _WorkerSlot:
+    process: Optional[BaseProcess] = None
+    started_at: float = 0.0
+    restart_at: float = 0.0
+    crashes: int = 0
+
+
+class WorkerSupervisor:
+    """Keep `config.workers` worker processes running on shared sockets.
+
+    uvicorn 0.24's own supervisor does not restart workers, so workers
+    exiting after `limit_max_requests` would shrink the pool. A worker that
+    exits cleanly is replaced right away. One that crashes, or fails to
+    start, is restarted after an exponential backoff. After `max_crashes`
+    crashes in a row, without staying up for CRASH_RESET_SECONDS, the
+    supervisor gives up and stops the server.
+    """
+
+    def __init__(self, config: uvicorn.Config, target: Callable, sockets: List[socket.socket], max_crashes: int):
+        self.config = config
+        self.target = target
+        self.sockets = sockets
+        self.max_crashes = max_crashes
+        self.should_exit = threading.Event()
+        self._context = multiprocessing.get_context("spawn")
+
+    def _spawn(self, worker_id: int) -> BaseProcess:
+        process = self._context.Process(
+            target=_run_worker,
+            kwargs={"config": self.config, "target": self.target, "sockets": self.sockets},
+        )
+        # The spawned interpreter copies the environment when it starts; a
+        # restarted worker reuses its slot's id, so it keeps the same log file
+        os.environ[WORKER_ID_ENV] = str(worker_id)
+        try:
+            process.start()
+        finally:
+            del os.environ[WORKER_ID_ENV]
+        return process
+
+    def _handle_exit(self, sig, frame):
+        self.should_exit.set()
+
+    def run(self) -> int:
+        """Supervise until SIGINT/SIGTERM or a crash loop; return the exit code."""
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, self._handle_exit)
+        logger.info("Started parent process [%s]", os.getpid())
+
+        exit_code = 0
+        slots = [_WorkerSlot() for _ in range(self.config.workers)]
+        while True:
+            now = time.monotonic()
+            for worker_id, slot in enumerate(slots):
+                process = slot.process
+                if process is not None:
+                    if process.is_alive():
+                        if slot.crashes and now - slot.started_at > CRASH_RESET_SECONDS:
+                            slot.crashes = 0
+                        continue
+                    process.join()
+                    slot.process = None
+                    if process.exitcode == 0:
+                        logger.info("Worker process [%s] exited, restarting", process.pid)
+                        slot.restart_at = now
+                    else:
+                        slot.crashes += 1
+                        if slot.crashes > self.max_crashes:
+                            logger.error(
+                                "Worker process [%s] exited with code %s, %s crashes in a row, stopping",
+                                process.pid, process.exitcode, slot.crashes,
+                            )
+                            exit_code = 1
+                            self.should_exit.set()
+                            break
+                        delay = min(RESTART_BACKOFF_SECONDS * 2 ** (slot.crashes - 1), RESTART_BACKOFF_MAX_SECONDS)
+                        logger.warning(
+                            "Worker process [%s] exited with code %s, restarting in %.1fs",
+                            process.pid, process.exitcode, delay,
+                        )
+                        slot.restart_at = now + delay
+                if now >= slot.restart_at:
+                    slot.process = self._spawn(worker_id)
+                    slot.started_at = now
+            if self.should_exit.wait(0.5):
+                break
+
+        # Workers drain concurrently: signal them all before waiting for any
+        processes = [slot.process for slot in slots if slot.process is not None]
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+        logger.info("Stopping parent process [%s]", os.getpid())
+        return exit_code
+
+
+def _available(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def run_production(server_config: dict):
+    """Run the app with multiple worker processes.
+
+    Uses gunicorn with uvicorn workers when gunicorn is installed, so the app can
+    be preloaded in the master before forking. Otherwise falls back to
+    `WorkerSupervisor`, which spawns the workers, so every worker imports the
+    app itself. uvloop and httptools are used when installed.
+
+    Workers coordinate through lock files in SERVER_LOCK_DIR: they create the
+    tables and admin user one at a time, and only one of them runs the periodic
+    jobs. Each worker gets its slot number in WORKER_ID_ENV, which names its
+    log file. See `Settings.get_worker_count` for the other settings adjusted
+    to several workers.
+    """
+    loop = "uvloop" if _available("uvloop") else "asyncio"
+    http = "httptools" if _available("httptools") else "h11"
+    workers = max(1, server_config["workers"])
+    max_requests = server_config["max_requests"]
+    jitter = server_config["max_requests_jitter"] if max_requests else 0
+
+    if _available("gunicorn"):
+        logger.info(
+            "Starting gunicorn: workers=%s, loop=%s, http=%s, max_requests=%s, preload=%s",
+            workers, loop, http, max_requests, server_config["preload"],
+        )
+        _run_gunicorn(server_config, workers, jitter)
+        return
+
+    config = uvicorn.Config(
+        APP,
+        factory=True,
+        host=server_config["host"],
+        port=server_config["port"],
+        workers=workers,
+        loop=loop,
+        http=http,
+        log_level=server_config["log_level"],
+        limit_max_requests=max_requests or None,
+        timeout_graceful_shutdown=server_config["graceful_timeout"],
+    )
+    # Logged after creating the config, which sets up uvicorn's logging
+    logger.info(
+        "Starting uvicorn workers (gunicorn not installed, app is not preloaded): "
+        "workers=%s, loop=%s, http=%s, max_requests=%s",
+        workers, loop, http, max_requests,
+    )
+    # Always supervised, even with one worker, so it is restarted after max_requests
+    sock = config.bind_socket()
+    server = DrainingServer(config, max_requests_jitter=jitter)
+    supervisor = WorkerSupervisor(config, server.run, [sock], max_crashes=server_config["max_worker_crashes"])
+    sys.exit(supervisor.run())
+
+
+def _run_gunicorn(server_config: dict, workers: int, jitter: int):
+    from gunicorn.app.base import BaseApplication
+
+    from bluenote.server.app import create_app
+
+    options = {
+        "bind": f"{server_config['host']}:{server_config['port']}",
+        "workers": workers,
+        "worker_class": GUNICORN_WORKER,
+        "preload_app": server_config["preload"],
+        "max_requests": server_config["max_requests"],
+        "max_requests_jitter": jitter,
+        # Gunicorn kills workers that are still running after graceful_timeout;
+        # the workers' own drain deadline is the same value, so streams end first
+        "graceful_timeout": server_config["graceful_timeout"],
+        "loglevel": server_config["log_level"],
+    }
+
+    class Application(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return create_app()
+
+    Application().run()
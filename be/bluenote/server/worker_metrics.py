@@ -0,0 +1,116 @@
+import asyncio
+import json
+import os
+import time
+from typing import Dict, Optional
+
+from bluenote.config.config import settings
+from bluenote.utils import metrics
+from bluenote.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class WorkerMetrics:
+    """多 worker 时汇总各 worker 的指标
+
+    指标保存在各 worker 的内存中，/metrics 只会被其中一个 worker 处理。每个 worker
+    每隔 interval_seconds 把自己的指标写到 directory/<worker_id>.json，处理 /metrics 的
+    worker 读取所有 worker 的文件，按 worker 标签一起输出。超过 3 个间隔没有更新的文件
+    视为已经退出的 worker，不再输出。
+    """
+
+    def __init__(self, directory: str, worker_id: str, interval_seconds: float):
+        self.directory = directory
+        self.worker_id = worker_id
+        self.interval_seconds = interval_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    def _path(self, worker_id: str) -> str:
+        return os.path.join(self.directory, f"{worker_id}.json")
+
+    def _write(self, data: str):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(self.worker_id)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        # 替换是原子的，读取的 worker 不会读到写了一半的文件
+        os.replace(tmp_path, path)
+
+    async def write(self):
+        # 指标在事件循环中读取，写文件放到线程中
+        await asyncio.to_thread(self._write, json.dumps(metrics.export()))
+
+    def _read_others(self) -> Dict[str, Dict[str, dict]]:
+        exports = {}
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return exports
+        stale_before = time.time() - 3 * self.interval_seconds
+        for name in names:
+            worker_id, ext = os.path.splitext(name)
+            if ext != ".json" or worker_id == self.worker_id:
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                if os.stat(path).st_mtime < stale_before:
+                    continue
+                with open(path, encoding="utf-8") as f:
+                    exports[worker_id] = json.load(f)
+            except (FileNotFoundError, ValueError):
+                continue
+        return exports
+
+    async def read_all(self) -> Dict[str, Dict[str, dict]]:
+        """所有 worker 的指标，本进程的取当前值"""
+        exports = await asyncio.to_thread(self._read_others)
+        exports[self.worker_id] = metrics.export()
+        return exports
+
+    async def _write_forever(self):
+        while True:
+            try:
+                await self.write()
+            except Exception as e:
+                logger.error("[METRICS] 写入 worker 指标失败: worker=%s, error=%s", self.worker_id, e)
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self):
+        self._task = asyncio.create_task(self._write_forever())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        try:
+            os.remove(self._path(self.worker_id))
+        except FileNotFoundError:
+            pass
+
+
+worker_metrics: Optional[WorkerMetrics] = None
+
+
+def start_worker_metrics() -> Optional[WorkerMetrics]:
+    """多 worker 时开始共享本进程的指标"""
+    global worker_metrics
+    config = settings.get_metrics_config()
+    if not config["enabled"] or not config["share_dir"]:
+        return None
+    worker_metrics = WorkerMetrics(
+        directory=config["share_dir"],
+        worker_id=settings.get_worker_id() or str(os.getpid()),
+        interval_seconds=config["share_interval_seconds"],
+    )
+    worker_metrics.start()
+    return worker_metrics
+
+
+async def stop_worker_metrics():
+    global worker_metrics
+    if worker_metrics is not None:
+        await worker_metrics.stop()
+        worker_metrics = None
@@ -0,0 +1,155 @@
+import asyncio
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import Deque, Dict, Optional
+
+from bluenote.api.exceptions import ServiceUnavailableException
+from bluenote.utils import metrics
+from bluenote.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class Priority(IntEnum):
+    """Scheduling class of an AI call, lower values are served first."""
+    ADMIN = 0
+    PUBLIC = 1
+
+
+class _Waiter:
+    __slots__ = ("future", "user", "priority")
+
+    def __init__(self, future: asyncio.Future, user: str, priority: Priority):
+        self.future = future
+        self.user = user
+        self.priority = priority
+
+
+class AIScheduler:
+    """Admit AI calls under a concurrency limit with priorities and per-user fairness.
+
+    Waiting calls are queued per priority class. Within a class every user
+    has their own FIFO and users are served round-robin, so one user
+    firing many requests cannot starve the others. A freed slot is handed
+    directly to the next waiter. Calls whose deadline passes while queued
+    are dropped with 503, and a full queue rejects new calls immediately.
+    """
+
+    def __init__(self, max_concurrency: int, max_queued: int):
+        self.max_concurrency = max_concurrency
+        self.max_queued = max_queued
+        self.active = 0
+        self.queued = 0
+        self._queues: Dict[Priority, "OrderedDict[str, Deque[_Waiter]]"] = {
+            priority: OrderedDict() for priority in Priority
+        }
+        self.queue_wait = {
+            priority: metrics.histogram(
+                f"ai_queue_wait_seconds_{priority.name.lower()}",
+                f"Time {priority.name.lower()} AI calls wait for a scheduler slot",
+            )
+            for priority in Priority
+        }
+        self.upstream_latency = metrics.histogram(
+            "ai_upstream_latency_seconds",
+            "Time AI calls hold a scheduler slot, the whole stream for streaming calls",
+        )
+        self.expired = metrics.counter(
+            "ai_requests_expired_total", "AI calls whose deadline passed while queued"
+        )
+        self.rejected = metrics.counter(
+            "ai_requests_rejected_total", "AI calls rejected because the queue was full"
+        )
+
+    @asynccontextmanager
+    async def slot(self, user: str, priority: Priority, deadline: Optional[float] = None):
+        """Hold a slot for the duration of the block.
+
+        `deadline` is an event loop time (`loop.time()`) after which the call
+        is no longer worth starting.
+        """
+        loop = asyncio.get_running_loop()
+        enqueued_at = loop.time()
+        if self.active < self.max_concurrency and self.queued == 0:
+            self.active += 1
+        else:
+            await self._wait(_Waiter(loop.create_future(), user, priority), deadline)
+
+        started_at = loop.time()
+        self.queue_wait[priority].observe(started_at - enqueued_at)
+        try:
+            yield
+        finally:
+            self.upstream_latency.observe(loop.time() - started_at)
+            self._release()
+
+    async def _wait(self, waiter: _Waiter, deadline: Optional[float]):
+        if self.queued >= self.max_queued:
+            self.rejected.inc()
+            logger.warning("AI调度队列已满: active=%s, queued=%s", self.active, self.queued)
+            raise ServiceUnavailableException("AI service is busy, please retry later")
+
+        self._queues[waiter.priority].setdefault(waiter.user, deque()).append(waiter)
+        self.queued += 1
+        try:
+            async with asyncio.timeout_at(deadline):
+                await waiter.future
+        except BaseException as e:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # The slot was handed over just as the wait was abandoned
+                self._release()
+            else:
+                self._remove(waiter)
+            if isinstance(e, TimeoutError):
+                self.expired.inc()
+                raise ServiceUnavailableException("AI service is busy, please retry later")
+            raise
+
+    def _remove(self, waiter: _Waiter):
+        queue = self._queues[waiter.priority]
+        waiters = queue.get(waiter.user)
+        if waiters is None or waiter not in waiters:
+            return
+        waiters.remove(waiter)
+        if not waiters:
+            del queue[waiter.user]
+        self.queued -= 1
+
+    def _next_waiter(self) -> Optional[_Waiter]:
+        for priority in Priority:
+            queue = self._queues[priority]
+            while queue:
+                user, waiters = next(iter(queue.items()))
+                waiter = waiters.popleft()
+                self.queued -= 1
+                if waiters:
+                    queue.move_to_end(user)
+                else:
+                    del queue[user]
+                if not waiter.future.done():
+                    return waiter
+        return None
+
+    def _release(self):
+        waiter = self._next_waiter()
+        if waiter is None:
+            self.active -= 1
+        else:
+            waiter.future.set_result(None)
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "queued": self.queued,
+            "max_concurrency": self.max_concurrency,
+            "queued_users": {
+                priority.name.lower(): len(self._queues[priority]) for priority in Priority
+            },
+            "queue_wait_seconds": {
+                priority.name.lower(): self.queue_wait[priority].snapshot() for priority in Priority
+            },
+            "upstream_latency_seconds": self.upstream_latency.snapshot(),
+            "expired": self.expired.value,
+            "rejected": self.rejected.value,
+        }
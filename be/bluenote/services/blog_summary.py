@@ -0,0 +1,192 @@
+import asyncio
+import hashlib
+from typing import Dict, Optional
+
+from sqlalchemy import or_, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from bluenote.config.config import settings
+from bluenote.schemas.blogs import Blog
+from bluenote.server.bus import EventType, Subscriber, event_bus
+from bluenote.server.db import get_engine
+from bluenote.services.ai_scheduler import Priority
+from bluenote.services.openai import get_openai_service
+from bluenote.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+SUMMARY_MAX_LENGTH = 500
+
+SUMMARY_PROMPT = (
+    "请用不超过150字为下面的博客写一段摘要，只输出摘要正文，不要添加标题或前缀。\n\n"
+    "标题：{title}\n\n{content}"
+)
+
+
+def summary_source_hash(title: str, content: str) -> str:
+    """摘要依据的标题和内容的哈希"""
+    return hashlib.sha256(f"{title}\n{content}".encode()).hexdigest()
+
+
+class BlogSummaryPipeline:
+    """订阅博客的创建和更新事件，在请求之外生成摘要
+
+    同一篇博客的事件在 debounce_seconds 内合并为一次生成。标题和内容的哈希
+    与上次生成时相同则跳过；作者自己填写的摘要（summary_source_hash 为空）不会被覆盖。
+    """
+
+    def __init__(self, debounce_seconds: float, max_content_chars: int):
+        self.debounce_seconds = debounce_seconds
+        self.max_content_chars = max_content_chars
+        self.generated = 0
+        self.skipped = 0
+        self.failed = 0
+        self._subscriber: Optional[Subscriber] = None
+        self._consumer: Optional[asyncio.Task] = None
+        self._pending: Dict[int, asyncio.Task] = {}
+        self._running: Dict[int, asyncio.Task] = {}
+
+    def start(self):
+        self._subscriber = event_bus.subscribe("blog")
+        self._consumer = asyncio.create_task(self._consume())
+        logger.info("博客摘要任务已启动: debounce=%ss", self.debounce_seconds)
+
+    async def stop(self):
+        tasks = [self._consumer, *self._pending.values(), *self._running.values()]
+        for task in tasks:
+            if task is not None:
+                task.cancel()
+        await asyncio.gather(*(task for task in tasks if task is not None), return_exceptions=True)
+        if self._subscriber is not None:
+            event_bus.unsubscribe("blog", self._subscriber)
+            self._subscriber = None
+
+    async def _consume(self):
+        while True:
+            event = await self._subscriber.receive()
+            blog_id = getattr(event.data, "id", None)
+            if blog_id is None:
+                continue
+            if event.type in (EventType.CREATED, EventType.UPDATED):
+                self._schedule(blog_id)
+            elif event.type == EventType.DELETED:
+                task = self._pending.pop(blog_id, None)
+                if task is not None:
+                    task.cancel()
+
+    def _schedule(self, blog_id: int):
+        """（重新）开始该博客的防抖计时"""
+        task = self._pending.pop(blog_id, None)
+        if task is not None:
+            task.cancel()
+        self._pending[blog_id] = asyncio.create_task(self._debounced(blog_id))
+
+    async def _debounced(self, blog_id: int):
+        await asyncio.sleep(self.debounce_seconds)
+        self._pending.pop(blog_id, None)
+
+        # 同一篇博客的生成串行执行，后一次基于最新内容重新判断
+        running = self._running.get(blog_id)
+        if running is not None:
+            await asyncio.gather(asyncio.shield(running), return_exceptions=True)
+
+        task = asyncio.create_task(self.summarize(blog_id))
+        self._running[blog_id] = task
+        try:
+            await task
+        except Exception as e:
+            self.failed += 1
+            logger.error("[BLOG_SUMMARY] 生成摘要失败: blog_id=%s, error=%s", blog_id, e)
+        finally:
+            if self._running.get(blog_id) is task:
+                del self._running[blog_id]
+
+    async def summarize(self, blog_id: int) -> bool:
+        """为博客生成并保存摘要，返回是否写入了新摘要"""
+        async with AsyncSession(get_engine()) as session:
+            blog = await session.get(Blog, blog_id)
+            if blog is None or blog.deleted_at is not None:
+                return False
+            title, content = blog.title, blog.content or ""
+            source_hash = summary_source_hash(title, content)
+            if blog.summary and blog.summary_source_hash is None:
+                self.skipped += 1
+                return False
+            if blog.summary_source_hash == source_hash:
+                self.skipped += 1
+                return False
+
+        prompt = SUMMARY_PROMPT.format(title=title, content=content[: self.max_content_chars])
+        summary = await get_openai_service().chat(
+            prompt, user="blog-summary", priority=Priority.ADMIN
+        )
+        summary = (summary or "").strip()[:SUMMARY_MAX_LENGTH]
+        if not summary:
+            return False
+
+        # 仅当标题和内容未在生成期间改变、且摘要仍可由本任务维护时写入；
+        # 直接执行 UPDATE，不发布事件，也不改动 updated_at
+        async with AsyncSession(get_engine()) as session:
+            result = await session.exec(
+                update(Blog)
+                .where(
+                    Blog.id == blog_id,
+                    Blog.deleted_at.is_(None),
+                    Blog.title == title,
+                    Blog.content == content,
+                    or_(
+                        Blog.summary.is_(None),
+                        Blog.summary == "",
+                        Blog.summary_source_hash.is_not(None),
+                    ),
+                )
+                .values(
+                    summary=summary,
+                    summary_source_hash=source_hash,
+                    updated_at=Blog.updated_at,
+                )
+            )
+            await session.commit()
+
+        if result.rowcount:
+            self.generated += 1
+            logger.info("[BLOG_SUMMARY] 摘要已生成: blog_id=%s, length=%s", blog_id, len(summary))
+            return True
+        self.skipped += 1
+        return False
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "running": len(self._running),
+            "generated": self.generated,
+            "skipped": self.skipped,
+            "failed": self.failed,
+        }
+
+
+blog_summary_pipeline: Optional[BlogSummaryPipeline] = None
+
+
+def start_blog_summary_pipeline() -> Optional[BlogSummaryPipeline]:
+    """按配置启动摘要任务，未启用或未配置 OpenAI 密钥时不启动"""
+    global blog_summary_pipeline
+    config = settings.get_blog_summary_config()
+    if not config["enabled"]:
+        return None
+    if not settings.get_openai_config()["api_key"]:
+        logger.info("未配置 OPENAI_API_KEY，博客摘要任务未启动")
+        return None
+    blog_summary_pipeline = BlogSummaryPipeline(
+        debounce_seconds=config["debounce_seconds"],
+        max_content_chars=config["max_content_chars"],
+    )
+    blog_summary_pipeline.start()
+    return blog_summary_pipeline
+
+
+async def stop_blog_summary_pipeline():
+    global blog_summary_pipeline
+    if blog_summary_pipeline is not None:
+        await blog_summary_pipeline.stop()
+        blog_summary_pipeline = None
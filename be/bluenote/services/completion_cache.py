@@ -0,0 +1,223 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from bluenote.utils.cache import TTLCache
+from bluenote.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+def completion_key(
+    model: str,
+    messages: List[Dict[str, str]],
+    temperature: float,
+    max_tokens: int,
+) -> str:
+    """Content address of a completion request."""
+    payload = json.dumps(
+        {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class DiskCompletionStore:
+    """One JSON file per completion under `directory`, least recently used files go first past `max_bytes`.
+
+    The index of files and their sizes is built from the directory on first
+    use, so entries survive restarts. File I/O runs in worker threads.
+
+    Once past `max_bytes`, files are evicted down to `low_water` times
+    `max_bytes`, so the directory rescan that precedes eviction happens once
+    per that much written rather than on every write.
+
+    Several worker processes may share the directory. Each keeps its own
+    index, so entries written by the others are picked up on a miss, and the
+    index is rebuilt from the directory before evicting and on the first
+    write after `rescan_seconds`, so the directory exceeds `max_bytes` by at
+    most what the other processes wrote since then. Reads touch the file's
+    mtime, which is the recency the rebuilt index is ordered by.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, rescan_seconds: float = 60.0, low_water: float = 0.9):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.rescan_seconds = rescan_seconds
+        self.low_water = low_water
+        self.total_bytes = 0
+        self._index: "Optional[OrderedDict[str, int]]" = None
+        self._scanned_at = 0.0
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _load_index(self):
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(root, name))
+                except FileNotFoundError:
+                    # Evicted by another process during the scan
+                    continue
+                entries.append((stat.st_mtime, name[:-5], stat.st_size))
+        entries.sort()
+        self._index = OrderedDict((key, size) for _, key, size in entries)
+        self.total_bytes = sum(self._index.values())
+        self._scanned_at = time.monotonic()
+
+    def _read(self, key: str) -> Optional[str]:
+        with self._lock:
+            return self._read_locked(key)
+
+    def _read_locked(self, key: str) -> Optional[str]:
+        if self._index is None:
+            self._load_index()
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                size = os.fstat(f.fileno()).st_size
+                entry = json.load(f)
+        except FileNotFoundError:
+            # Evicted, possibly by another process
+            self.total_bytes -= self._index.pop(key, 0)
+            return None
+        except (OSError, ValueError):
+            self._remove(key)
+            return None
+        if entry["expires_at"] is not None and entry["expires_at"] <= time.time():
+            self._remove(key)
+            return None
+        # Written by another process, or rewritten since it was indexed
+        self.total_bytes += size - self._index.pop(key, 0)
+        self._index[key] = size
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry["content"]
+
+    def _write(self, key: str, content: str, ttl: Optional[float]):
+        with self._lock:
+            self._write_locked(key, content, ttl)
+
+    def _write_locked(self, key: str, content: str, ttl: Optional[float]):
+        if self._index is None or time.monotonic() - self._scanned_at > self.rescan_seconds:
+            self._load_index()
+        data = json.dumps(
+            {"expires_at": time.time() + ttl if ttl is not None else None, "content": content},
+            ensure_ascii=False,
+        ).encode()
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        self.total_bytes += len(data) - self._index.pop(key, 0)
+        self._index[key] = len(data)
+        if self.total_bytes <= self.max_bytes:
+            return
+        # Count what the other processes have written before deciding what to evict
+        self._load_index()
+        self._index.move_to_end(key)
+        if self.total_bytes <= self.max_bytes:
+            return
+        target = self.max_bytes * self.low_water
+        while self.total_bytes > target and len(self._index) > 1:
+            self._remove(next(iter(self._index)))
+
+    def _remove(self, key: str):
+        self.total_bytes -= self._index.pop(key, 0)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    async def get(self, key: str) -> Optional[str]:
+        return await asyncio.to_thread(self._read, key)
+
+    async def set(self, key: str, content: str, ttl: Optional[float] = None):
+        await asyncio.to_thread(self._write, key, content, ttl)
+
+
+class CompletionCache:
+    """Two-tier cache of completion results with single-flight deduplication.
+
+    Lookups try memory, then disk (promoting disk hits to memory). On a miss
+    the first caller runs the completion and concurrent callers with the same
+    key await that same call. Failed completions are not cached.
+    """
+
+    def __init__(
+        self,
+        memory_maxsize: int = 512,
+        ttl: Optional[float] = None,
+        disk: Optional[DiskCompletionStore] = None,
+    ):
+        self.ttl = ttl
+        self.memory = TTLCache(maxsize=memory_maxsize, ttl=ttl)
+        self.disk = disk
+        self.disk_hits = 0
+        self.deduplicated = 0
+        self._inflight: Dict[str, "asyncio.Future[Any]"] = {}
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[str]]) -> str:
+        content = self.memory.get(key)
+        if content is not None:
+            return content
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.deduplicated += 1
+            # Shielded so a cancelled waiter does not cancel the shared upstream call
+            return await asyncio.shield(inflight)
+
+        task = asyncio.ensure_future(self._fill(key, compute))
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _fill(self, key: str, compute: Callable[[], Awaitable[str]]) -> str:
+        if self.disk is not None:
+            content = await self.disk.get(key)
+            if content is not None:
+                self.disk_hits += 1
+                self.memory.set(key, content)
+                return content
+
+        content = await compute()
+        if content is not None:
+            self.memory.set(key, content)
+            if self.disk is not None:
+                try:
+                    await self.disk.set(key, content, self.ttl)
+                except OSError as e:
+                    logger.warning("写入补全缓存失败: %s", e)
+        return content
+
+    def stats(self) -> dict:
+        return {
+            **self.memory.stats(),
+            "disk_hits": self.disk_hits,
+            "disk_bytes": self.disk.total_bytes if self.disk is not None else 0,
+            "deduplicated": self.deduplicated,
+            "inflight": len(self._inflight),
+        }
@@ -0,0 +1,294 @@
+import asyncio
+from typing import Any, Callable, Dict, NamedTuple, Optional, Set, Tuple, Type
+
+from sqlalchemy import case, delete, func, insert, or_, update
+from sqlmodel import SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from bluenote.config.config import settings
+from bluenote.schemas.blogs import Blog, BlogStats, ContentStatus, Visibility
+from bluenote.schemas.contacts import Contact, ContactStats
+from bluenote.schemas.images import utc_now
+from bluenote.schemas.photos import Photo, PhotoStats
+from bluenote.schemas.stats import StatsCounter
+from bluenote.server.bus import EventType, Subscriber, event_bus
+from bluenote.server.db import get_engine
+from bluenote.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class Counter(NamedTuple):
+    """一个计数器：一行对它的贡献，以及在全表上计算同一个值的聚合表达式"""
+    name: str
+    of_row: Callable[[Any], int]
+    aggregate: Any
+
+
+class StatsScope(NamedTuple):
+    model: Type[SQLModel]
+    schema: Type[SQLModel]
+    counters: Tuple[Counter, ...]
+
+
+def _count_where(condition):
+    return func.sum(case((condition, 1), else_=0))
+
+
+def _content_counters(model, noun: str) -> Tuple[Counter, ...]:
+    """博客和照片的计数器：状态为私密或仅自己可见的都算作私密"""
+    published = model.status == ContentStatus.PUBLISHED
+    draft = model.status == ContentStatus.DRAFT
+    private = or_(model.status == ContentStatus.PRIVATE, model.visibility == Visibility.PRIVATE)
+    return (
+        Counter(f"total_{noun}", lambda row: 1, func.count()),
+        Counter(f"published_{noun}", lambda row: int(row.status == ContentStatus.PUBLISHED), _count_where(published)),
+        Counter(f"draft_{noun}", lambda row: int(row.status == ContentStatus.DRAFT), _count_where(draft)),
+        Counter(
+            f"private_{noun}",
+            lambda row: int(row.status == ContentStatus.PRIVATE or row.visibility == Visibility.PRIVATE),
+            _count_where(private),
+        ),
+        Counter("total_likes", lambda row: row.like_count or 0, func.sum(model.like_count)),
+        Counter("total_views", lambda row: row.view_count or 0, func.sum(model.view_count)),
+        Counter("total_comments", lambda row: row.comment_count or 0, func.sum(model.comment_count)),
+    )
+
+
+# 键与事件主题相同；软删除的行不计入任何计数器
+STATS_SCOPES: Dict[str, StatsScope] = {
+    "blog": StatsScope(Blog, BlogStats, _content_counters(Blog, "blogs")),
+    "photo": StatsScope(Photo, PhotoStats, _content_counters(Photo, "photos")),
+    # 联系表单还没有已读状态，全部计为未读，read_contacts 为 0
+    "contact": StatsScope(
+        Contact,
+        ContactStats,
+        (
+            Counter("total_contacts", lambda row: 1, func.count()),
+            Counter("unread_contacts", lambda row: 1, func.count()),
+        ),
+    ),
+}
+
+
+async def aggregate_stats(session: AsyncSession, scope: str) -> Dict[str, int]:
+    """在数据表上用一条聚合查询计算全部计数器"""
+    spec = STATS_SCOPES[scope]
+    # 聚合查询不受软删除过滤的影响，需要显式排除已删除的行
+    statement = (
+        select(*(counter.aggregate for counter in spec.counters))
+        .select_from(spec.model)
+        .where(spec.model.deleted_at.is_(None))
+    )
+    row = (await session.exec(statement)).one()
+    return {counter.name: int(value or 0) for counter, value in zip(spec.counters, row)}
+
+
+async def read_stats(session: AsyncSession, scope: str) -> SQLModel:
+    """读取统计，统计表还没有数据（或没有启用增量维护）时直接在数据表上计算"""
+    spec = STATS_SCOPES[scope]
+    values = {}
+    if content_stats_aggregator is not None:
+        rows = (await session.exec(select(StatsCounter).where(StatsCounter.scope == scope))).all()
+        values = {row.name: row.value for row in rows}
+    if not values:
+        values = await aggregate_stats(session, scope)
+    return spec.schema(**{name: values.get(name, 0) for name in spec.schema.model_fields})
+
+
+class _RowBefore:
+    """UPDATED 事件中的行在修改前的样子：修改过的列取 previous 中的旧值，其余列没有变化"""
+
+    def __init__(self, row: Any, previous: Dict[str, Any]):
+        self._row = row
+        self._previous = previous
+
+    def __getattr__(self, name: str) -> Any:
+        if name in self._previous:
+            return self._previous[name]
+        return getattr(self._row, name)
+
+
+class ContentStatsAggregator:
+    """订阅博客、照片和联系表单的事件，增量更新 stats_counters 表
+
+    每个事件按行在事件前后对各计数器的贡献之差修改计数器：创建前的贡献为 0，
+    删除后的贡献为 0，更新前的贡献由事件带的旧值（Event.previous）算出。
+    差值只依赖事件本身，不记住任何行，所以其他 worker 进程的修改不会让它算错。
+    旧值未知的更新无法计算差值，对应的统计在 dirty_delay_seconds 后重新对账；
+    此外每隔 reconcile_interval_seconds 全量对账一次，补上浏览数等不发布事件的修改。
+    """
+
+    def __init__(self, reconcile_interval_seconds: float, dirty_delay_seconds: float):
+        self.reconcile_interval_seconds = reconcile_interval_seconds
+        self.dirty_delay_seconds = dirty_delay_seconds
+        self.applied = 0
+        self.reconciled = 0
+        self.failed = 0
+        self._locks = {scope: asyncio.Lock() for scope in STATS_SCOPES}
+        self._dirty: Set[str] = set()
+        self._subscribers: Dict[str, Subscriber] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._dirty_task: Optional[asyncio.Task] = None
+
+    def start(self):
+        for scope in STATS_SCOPES:
+            subscriber = event_bus.subscribe(scope)
+            self._subscribers[scope] = subscriber
+            self._tasks[scope] = asyncio.create_task(self._consume(scope, subscriber))
+        logger.info("统计任务已启动: reconcile_interval=%ss", self.reconcile_interval_seconds)
+
+    async def stop(self):
+        tasks = [*self._tasks.values(), self._dirty_task]
+        for task in tasks:
+            if task is not None:
+                task.cancel()
+        await asyncio.gather(*(task for task in tasks if task is not None), return_exceptions=True)
+        for scope, subscriber in self._subscribers.items():
+            event_bus.unsubscribe(scope, subscriber)
+        self._subscribers.clear()
+        self._tasks.clear()
+
+    async def _consume(self, scope: str, subscriber: Subscriber):
+        while True:
+            events = [await subscriber.receive()]
+            # 已经排队的事件合并成一次写入
+            while not subscriber.queue.empty():
+                events.append(subscriber.queue.get_nowait())
+            try:
+                async with self._locks[scope]:
+                    delta = self._delta(scope, events)
+                    if any(delta):
+                        await self._write(scope, delta)
+                        self.applied += len(events)
+            except Exception as e:
+                self.failed += 1
+                logger.error("[STATS] 更新统计失败: scope=%s, error=%s", scope, e)
+                self._mark_dirty(scope)
+
+    def _delta(self, scope: str, events) -> list:
+        """事件带来的计数器变化量，旧值未知的更新标记整个统计待对账"""
+        counters = STATS_SCOPES[scope].counters
+        zero = (0,) * len(counters)
+
+        def contribution(row: Any) -> Tuple[int, ...]:
+            if row.deleted_at is not None:
+                return zero
+            return tuple(counter.of_row(row) for counter in counters)
+
+        delta = [0] * len(counters)
+        for event in events:
+            row: Any = event.data
+            if getattr(row, "id", None) is None:
+                continue
+            if event.type == EventType.CREATED:
+                old, new = zero, contribution(row)
+            elif event.type == EventType.UPDATED:
+                if event.previous is None:
+                    self._mark_dirty(scope)
+                    continue
+                old, new = contribution(_RowBefore(row, event.previous)), contribution(row)
+            elif event.type == EventType.DELETED:
+                # 软删除的行此时已带有 deleted_at，其余列仍是删除前的值
+                old, new = tuple(counter.of_row(row) for counter in counters), zero
+            else:
+                continue
+            for i, (before, after) in enumerate(zip(old, new)):
+                delta[i] += after - before
+        return delta
+
+    async def _write(self, scope: str, delta: list):
+        counters = STATS_SCOPES[scope].counters
+        now = utc_now()
+        async with AsyncSession(get_engine()) as session:
+            for counter, change in zip(counters, delta):
+                if not change:
+                    continue
+                result = await session.exec(
+                    update(StatsCounter)
+                    .where(StatsCounter.scope == scope, StatsCounter.name == counter.name)
+                    .values(value=StatsCounter.value + change, updated_at=now)
+                )
+                if not result.rowcount:
+                    # 还没有对账过，计数器行不存在
+                    self._mark_dirty(scope)
+            await session.commit()
+
+    def _mark_dirty(self, scope: str):
+        self._dirty.add(scope)
+        if self._dirty_task is None or self._dirty_task.done():
+            self._dirty_task = asyncio.create_task(self._reconcile_dirty())
+
+    async def _reconcile_dirty(self):
+        await asyncio.sleep(self.dirty_delay_seconds)
+        while self._dirty:
+            await self.reconcile(self._dirty.pop())
+
+    async def reconcile_forever(self):
+        """定期全量对账；多 worker 时只在一个进程中运行（见 run_leader_jobs_forever）"""
+        while True:
+            for scope in STATS_SCOPES:
+                await self.reconcile(scope)
+            await asyncio.sleep(self.reconcile_interval_seconds)
+
+    async def reconcile(self, scope: str) -> Optional[Dict[str, int]]:
+        """按数据表重新计算一类内容的全部计数器，返回修正前后不一致的计数器"""
+        try:
+            async with self._locks[scope]:
+                async with AsyncSession(get_engine()) as session:
+                    values = await aggregate_stats(session, scope)
+                    rows = (await session.exec(select(StatsCounter).where(StatsCounter.scope == scope))).all()
+                    previous = {row.name: row.value for row in rows}
+                    now = utc_now()
+                    await session.exec(delete(StatsCounter).where(StatsCounter.scope == scope))
+                    await session.exec(
+                        insert(StatsCounter),
+                        params=[
+                            {"scope": scope, "name": name, "value": value, "updated_at": now}
+                            for name, value in values.items()
+                        ],
+                    )
+                    await session.commit()
+                self._dirty.discard(scope)
+        except Exception as e:
+            self.failed += 1
+            logger.error("[STATS] 统计对账失败: scope=%s, error=%s", scope, e)
+            return None
+
+        self.reconciled += 1
+        drift = {name: (previous.get(name), value) for name, value in values.items() if previous.get(name) != value}
+        if drift and previous:
+            logger.info("[STATS] 统计对账修正: scope=%s, drift=%s", scope, drift)
+        return drift
+
+    def stats(self) -> dict:
+        return {
+            "dirty": sorted(self._dirty),
+            "applied": self.applied,
+            "reconciled": self.reconciled,
+            "failed": self.failed,
+        }
+
+
+content_stats_aggregator: Optional[ContentStatsAggregator] = None
+
+
+def start_content_stats_aggregator() -> Optional[ContentStatsAggregator]:
+    """按配置启动统计任务"""
+    global content_stats_aggregator
+    config = settings.get_stats_config()
+    if not config["enabled"]:
+        return None
+    content_stats_aggregator = ContentStatsAggregator(
+        reconcile_interval_seconds=config["reconcile_interval_seconds"],
+        dirty_delay_seconds=config["dirty_delay_seconds"],
+    )
+    content_stats_aggregator.start()
+    return content_stats_aggregator
+
+
+async def stop_content_stats_aggregator():
+    global content_stats_aggregator
+    if content_stats_aggregator is not None:
+        await content_stats_aggregator.stop()
+        content_stats_aggregator = None
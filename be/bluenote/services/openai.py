@@ -1,12 +1,37 @@
-from openai import OpenAI
-from typing import Iterator, List, Dict
+import asyncio
+from typing import AsyncIterator, List, Dict, Optional
+
+import httpx
+
+from bluenote.api.exceptions import GatewayTimeoutException, HTTPException
+from bluenote.services.ai_scheduler import AIScheduler, Priority
 from bluenote.config.config import settings
+from bluenote.services.completion_cache import CompletionCache, DiskCompletionStore, completion_key
 from bluenote.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
+def create_completion_cache() -> Optional[CompletionCache]:
+    """按配置创建补全结果缓存，未启用时返回 None"""
+    cache_config = settings.get_completion_cache_config()
+    if not cache_config["enabled"]:
+        return None
+    disk = None
+    if cache_config["dir"]:
+        disk = DiskCompletionStore(cache_config["dir"], cache_config["disk_max_bytes"])
+    return CompletionCache(
+        memory_maxsize=cache_config["memory_max_entries"],
+        ttl=cache_config["ttl_seconds"],
+        disk=disk,
+    )
+
+
 class OpenAIService:
-    def __init__(self):
+    def __init__(
+        self,
+        http_client: Optional[httpx.AsyncClient] = None,
+        cache: Optional[CompletionCache] = None,
+    ):
         # 使用配置文件中的设置
         openai_config = settings.get_openai_config()
         self.api_key = openai_config["api_key"]
@@ -15,126 +40,231 @@ class OpenAIService:
         self.default_model = openai_config["default_model"]
         self.max_tokens = openai_config["max_tokens"]
         self.temperature = openai_config["temperature"]
-        
-        # 修复客户端初始化，移除可能导致问题的参数
-        self.client = OpenAI(
+        self.request_deadline = openai_config["request_deadline"]
+
+        # 所有请求共享一个连接池，可传入自定义客户端（例如测试用的本地假服务）
+        if http_client is None:
+            http_client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=openai_config["max_connections"],
+                    max_keepalive_connections=openai_config["max_keepalive_connections"],
+                ),
+            )
+        self.http_client = http_client
+        # openai 包导入较慢（数百毫秒），只在第一次用到 AI 功能时导入，不拖慢服务启动
+        from openai import AsyncOpenAI
+
+        self.client = AsyncOpenAI(
             api_key=self.api_key,
             base_url=self.base_url,
-            timeout=self.timeout
+            timeout=self.timeout,
+            http_client=http_client,
+        )
+        # 调度器限制同时进行的补全请求数，流式请求在整个流期间占用名额
+        self.scheduler = AIScheduler(
+            max_concurrency=openai_config["max_concurrent_requests"],
+            max_queued=openai_config["max_queued_requests"],
         )
-        logger.info(f"OpenAI服务初始化完成: model={self.default_model}, base_url={self.base_url}")
-    
-    def chat(self, message: str, model: str = None) -> str:
+        # 相同请求（模型、消息、温度、最大 token 数）直接复用结果
+        self.cache = cache
+        logger.info("OpenAI服务初始化完成: model=%s, base_url=%s", self.default_model, self.base_url)
+
+    def _deadline(self) -> float:
+        return asyncio.get_running_loop().time() + self.request_deadline
+
+    async def _complete(
+        self, messages: List[Dict[str, str]], model: str, user: str, priority: Priority
+    ) -> str:
+        deadline = self._deadline()
+        if self.cache is None:
+            return await self._complete_upstream(messages, model, user, priority, deadline)
+        key = completion_key(model, messages, self.temperature, self.max_tokens)
+        return await self.cache.get_or_compute(
+            key, lambda: self._complete_upstream(messages, model, user, priority, deadline)
+        )
+
+    async def _complete_upstream(
+        self, messages: List[Dict[str, str]], model: str, user: str, priority: Priority, deadline: float
+    ) -> str:
+        async with self.scheduler.slot(user, priority, deadline):
+            try:
+                # 超过截止时间时取消上游调用
+                async with asyncio.timeout_at(deadline):
+                    response = await self.client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        max_tokens=self.max_tokens,
+                        temperature=self.temperature,
+                    )
+            except TimeoutError:
+                raise GatewayTimeoutException("AI request deadline exceeded")
+        return response.choices[0].message.content
+
+    async def _stream(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        user: str,
+        priority: Priority,
+        usage: Optional[dict] = None,
+    ) -> AsyncIterator[str]:
+        # 截止时间只限制排队，流开始后由调用方决定何时停止
+        async with self.scheduler.slot(user, priority, self._deadline()):
+            extra = {"stream_options": {"include_usage": True}} if usage is not None else {}
+            response = await self.client.chat.completions.create(
+                model=model,
+                messages=messages,
+                max_tokens=self.max_tokens,
+                temperature=self.temperature,
+                stream=True,
+                **extra,
+            )
+            try:
+                async for chunk in response:
+                    # 最后一个 chunk 携带 token 用量，choices 为空
+                    if usage is not None and chunk.usage is not None:
+                        usage.update(chunk.usage.model_dump(exclude_none=True))
+                    # 添加安全检查，避免索引越界
+                    if chunk.choices and len(chunk.choices) > 0 and chunk.choices[0].delta.content is not None:
+                        yield chunk.choices[0].delta.content
+            finally:
+                # 调用方提前停止迭代（如客户端断开）时关闭上游连接
+                await response.close()
+
+    async def chat(
+        self, message: str, model: str = None, *, user: str = "anonymous", priority: Priority = Priority.PUBLIC
+    ) -> str:
         """单次聊天（非流式）"""
         if model is None:
             model = self.default_model
-            
+
         # 安全检查
         if not message or not message.strip():
             raise ValueError("消息内容不能为空")
-        
-        logger.info(f"开始单次聊天: model={model}, message_length={len(message)}")
-        
+
+        logger.info("开始单次聊天: model=%s, message_length=%s", model, len(message))
+
         try:
-            response = self.client.chat.completions.create(
-                model=model,
-                messages=[
-                    {"role": "user", "content": message}
-                ],
-                max_tokens=self.max_tokens,
-                temperature=self.temperature,
-            )
-            result = response.choices[0].message.content
-            logger.info(f"单次聊天完成: response_length={len(result) if result else 0}")
+            result = await self._complete([{"role": "user", "content": message}], model, user, priority)
+            logger.info("单次聊天完成: response_length=%s", len(result) if result else 0)
             return result
+        except HTTPException:
+            raise
         except Exception as e:
-            logger.error(f"OpenAI API Error: {str(e)}")
+            logger.error("OpenAI API Error: %s", e)
             raise Exception(f"OpenAI API 调用失败: {str(e)}")
-    
-    def chat_stream(self, message: str, model: str = None) -> Iterator[str]:
-        """单次聊天（流式）"""
+
+    async def chat_stream(
+        self,
+        message: str,
+        model: str = None,
+        *,
+        user: str = "anonymous",
+        priority: Priority = Priority.PUBLIC,
+        usage: Optional[dict] = None,
+    ) -> AsyncIterator[str]:
+        """单次聊天（流式），传入 usage 字典时在流结束后填入 token 用量"""
         if model is None:
             model = self.default_model
-            
+
         # 安全检查
         if not message or not message.strip():
             raise ValueError("消息内容不能为空")
-        
-        logger.info(f"开始流式聊天: model={model}, message_length={len(message)}")
-        
+
+        logger.info("开始流式聊天: model=%s, message_length=%s", model, len(message))
+
         try:
-            response = self.client.chat.completions.create(
-                model=model,
-                messages=[
-                    {"role": "user", "content": message}
-                ],
-                max_tokens=self.max_tokens,
-                temperature=self.temperature,
-                stream=True
-            )
-            
-            for chunk in response:
-                # 添加安全检查，避免索引越界
-                if chunk.choices and len(chunk.choices) > 0 and chunk.choices[0].delta.content is not None:
-                    yield chunk.choices[0].delta.content
+            async for content in self._stream([{"role": "user", "content": message}], model, user, priority, usage):
+                yield content
             logger.info("流式聊天完成")
+        except HTTPException:
+            raise
         except Exception as e:
-            logger.error(f"OpenAI API Error: {str(e)}")
+            logger.error("OpenAI API Error: %s", e)
             raise Exception(f"OpenAI API 流式调用失败: {str(e)}")
-    
-    def chat_with_history(self, messages: List[Dict[str, str]], model: str = None) -> str:
+
+    async def chat_with_history(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = None,
+        *,
+        user: str = "anonymous",
+        priority: Priority = Priority.PUBLIC,
+    ) -> str:
         """带历史记录的聊天（非流式）"""
         if model is None:
             model = self.default_model
-            
+
         # 安全检查
         if not messages or len(messages) == 0:
             raise ValueError("消息历史不能为空")
-        
-        logger.info(f"开始历史聊天: model={model}, messages_count={len(messages)}")
-        
+
+        logger.info("开始历史聊天: model=%s, messages_count=%s", model, len(messages))
+
         try:
-            response = self.client.chat.completions.create(
-                model=model,
-                messages=messages,
-                max_tokens=self.max_tokens,
-                temperature=self.temperature,
-            )
-            result = response.choices[0].message.content
-            logger.info(f"历史聊天完成: response_length={len(result) if result else 0}")
+            result = await self._complete(messages, model, user, priority)
+            logger.info("历史聊天完成: response_length=%s", len(result) if result else 0)
             return result
+        except HTTPException:
+            raise
         except Exception as e:
-            logger.error(f"OpenAI API Error: {str(e)}")
+            logger.error("OpenAI API Error: %s", e)
             raise Exception(f"OpenAI API 历史聊天调用失败: {str(e)}")
-    
-    def chat_with_history_stream(self, messages: List[Dict[str, str]], model: str = None) -> Iterator[str]:
-        """带历史记录的聊天（流式）"""
+
+    async def chat_with_history_stream(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = None,
+        *,
+        user: str = "anonymous",
+        priority: Priority = Priority.PUBLIC,
+        usage: Optional[dict] = None,
+    ) -> AsyncIterator[str]:
+        """带历史记录的聊天（流式），传入 usage 字典时在流结束后填入 token 用量"""
         if model is None:
             model = self.default_model
-            
+
         # 安全检查
         if not messages or len(messages) == 0:
             raise ValueError("消息历史不能为空")
-        
-        logger.info(f"开始历史流式聊天: model={model}, messages_count={len(messages)}")
-        
+
+        logger.info("开始历史流式聊天: model=%s, messages_count=%s", model, len(messages))
+
         try:
-            response = self.client.chat.completions.create(
-                model=model,
-                messages=messages,
-                max_tokens=self.max_tokens,
-                temperature=self.temperature,
-                stream=True
-            )
-            
-            for chunk in response:
-                # 添加安全检查，避免索引越界
-                if chunk.choices and len(chunk.choices) > 0 and chunk.choices[0].delta.content is not None:
-                    yield chunk.choices[0].delta.content
+            async for content in self._stream(messages, model, user, priority, usage):
+                yield content
             logger.info("历史流式聊天完成")
+        except HTTPException:
+            raise
         except Exception as e:
-            logger.error(f"OpenAI API Error: {str(e)}")
+            logger.error("OpenAI API Error: %s", e)
             raise Exception(f"OpenAI API 历史聊天流式调用失败: {str(e)}")
 
-# 创建全局服务实例
-openai_service = OpenAIService()
\ No newline at end of file
+    def stats(self) -> dict:
+        return {
+            "scheduler": self.scheduler.stats(),
+            "cache": self.cache.stats() if self.cache is not None else None,
+        }
+
+    async def aclose(self):
+        """关闭共享连接池"""
+        await self.client.close()
+
+
+# 全局服务实例，首次使用时创建
+_openai_service: Optional[OpenAIService] = None
+
+
+def get_openai_service() -> OpenAIService:
+    global _openai_service
+    if _openai_service is None:
+        _openai_service = OpenAIService(cache=create_completion_cache())
+    return _openai_service
+
+
+async def close_openai_service():
+    global _openai_service
+    if _openai_service is not None:
+        await _openai_service.aclose()
+        _openai_service = None
@@ -0,0 +1,249 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import update
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from bluenote.config.config import settings
+from bluenote.schemas.images import split_url_list
+from bluenote.schemas.photos import Photo
+from bluenote.server.bus import EventType, Subscriber, event_bus
+from bluenote.server.db import get_engine
+from bluenote.services.uploads import blob_path
+from bluenote.utils.images import read_metadata, render_variants
+from bluenote.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# 从封面读取、随封面变化而更新的字段
+METADATA_FIELDS = ("width", "height", "orientation", "latitude", "longitude", "dominant_color")
+
+
+class PhotoVariantPipeline:
+    """订阅照片的创建和更新事件，在进程池中为上传的原图生成缩略图，并从封面读取 EXIF 等元数据
+
+    只处理 url_list 中指向上传目录的原图，缩略图与原图放在同一目录。已经有缩略图的原图
+    不会重复生成；url_list 在生成期间被修改时放弃写入，由随后的更新事件重新处理。
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        url_prefix: str,
+        widths: Sequence[int],
+        formats: Sequence[str],
+        quality: int,
+        workers: int,
+    ):
+        self.directory = directory
+        self.url_prefix = url_prefix.rstrip("/")
+        self.widths = tuple(widths)
+        self.formats = tuple(formats)
+        self.quality = quality
+        self.workers = workers
+        self.generated = 0
+        self.failed = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._subscriber: Optional[Subscriber] = None
+        self._consumer: Optional[asyncio.Task] = None
+        self._queued: Dict[int, asyncio.Task] = {}
+        self._running: Dict[int, asyncio.Task] = {}
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        # 用 spawn 启动子进程：主进程里有日志、密码哈希等线程，fork 可能带着锁进入子进程
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def start(self):
+        self._executor = self._create_executor()
+        self._subscriber = event_bus.subscribe("photo")
+        self._consumer = asyncio.create_task(self._consume())
+        logger.info("照片缩略图任务已启动: widths=%s, formats=%s", self.widths, self.formats)
+
+    async def stop(self):
+        tasks = [self._consumer, *self._queued.values(), *self._running.values()]
+        for task in tasks:
+            if task is not None:
+                task.cancel()
+        await asyncio.gather(*(task for task in tasks if task is not None), return_exceptions=True)
+        if self._subscriber is not None:
+            event_bus.unsubscribe("photo", self._subscriber)
+            self._subscriber = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _consume(self):
+        while True:
+            event = await self._subscriber.receive()
+            photo_id = getattr(event.data, "id", None)
+            if photo_id is not None and event.type in (EventType.CREATED, EventType.UPDATED):
+                self._schedule(photo_id)
+
+    def _schedule(self, photo_id: int):
+        # 已在排队的照片不重复排队，开始处理时读取的是最新的 url_list
+        if photo_id not in self._queued:
+            self._queued[photo_id] = asyncio.create_task(self._run(photo_id))
+
+    async def _run(self, photo_id: int):
+        # 同一张照片串行处理
+        running = self._running.get(photo_id)
+        if running is not None:
+            await asyncio.gather(asyncio.shield(running), return_exceptions=True)
+        self._queued.pop(photo_id, None)
+
+        task = asyncio.create_task(self.generate(photo_id))
+        self._running[photo_id] = task
+        try:
+            await task
+        except Exception as e:
+            self.failed += 1
+            logger.error("[PHOTO_VARIANTS] 生成缩略图失败: photo_id=%s, error=%s", photo_id, e)
+        finally:
+            if self._running.get(photo_id) is task:
+                del self._running[photo_id]
+
+    def _local_path(self, url: str) -> Optional[str]:
+        """上传目录中原图的路径，外部 URL 返回 None"""
+        prefix = f"{self.url_prefix}/"
+        if not url.startswith(prefix):
+            return None
+        name = url[len(prefix):]
+        if not name or "/" in name or name.startswith("."):
+            return None
+        return blob_path(self.directory, name)
+
+    async def _in_pool(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._executor, fn, *args)
+        except BrokenProcessPool:
+            # 子进程异常退出（如内存不足被杀）后进程池不能再用，换一个新的
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._create_executor()
+            raise
+
+    async def _render(self, path: str) -> List[dict]:
+        variants = await self._in_pool(render_variants, path, self.widths, self.formats, self.quality)
+        return [
+            {
+                "url": f"{self.url_prefix}/{variant['name']}",
+                "width": variant["width"],
+                "height": variant["height"],
+                "format": variant["format"],
+            }
+            for variant in variants
+        ]
+
+    async def generate(self, photo_id: int) -> int:
+        """为照片中还没有缩略图的原图生成缩略图，封面变化时重新读取封面的元数据，返回新处理的原图数
+
+        封面是 url_list 中第一张有缩略图的上传原图。拍摄时间只在照片没有填写时补上。
+        """
+        async with AsyncSession(get_engine()) as session:
+            photo = await session.get(Photo, photo_id)
+            if photo is None or photo.deleted_at is not None:
+                return 0
+            url_list = photo.url_list
+            existing = photo.variants or {}
+            current = {field: getattr(photo, field) for field in METADATA_FIELDS + ("taken_at",)}
+
+        # 按 url_list 的顺序重建，不在 url_list 中的原图的缩略图被丢弃
+        variants = {}
+        rendered = 0
+        for url in split_url_list(url_list):
+            if url in existing:
+                variants[url] = existing[url]
+                continue
+            path = self._local_path(url)
+            if path is None or url in variants:
+                continue
+            if not await asyncio.to_thread(os.path.exists, path):
+                logger.warning("[PHOTO_VARIANTS] 原图不存在: photo_id=%s, url=%s", photo_id, url)
+                continue
+            try:
+                variants[url] = await self._render(path)
+                rendered += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error("[PHOTO_VARIANTS] 生成缩略图失败: photo_id=%s, url=%s, error=%s", photo_id, url, e)
+
+        values = {}
+        # 顺序也要一致：第一项是封面
+        if list(variants.items()) != list(existing.items()):
+            values["variants"] = variants
+
+        cover = next(iter(variants), None)
+        if cover is not None and (current["width"] is None or cover != next(iter(existing), None)):
+            try:
+                metadata = await self._in_pool(read_metadata, self._local_path(cover))
+            except Exception as e:
+                self.failed += 1
+                logger.error("[PHOTO_VARIANTS] 读取照片元数据失败: photo_id=%s, url=%s, error=%s", photo_id, cover, e)
+            else:
+                values.update(
+                    {field: metadata[field] for field in METADATA_FIELDS if metadata[field] != current[field]}
+                )
+                if current["taken_at"] is None and metadata["taken_at"] is not None:
+                    values["taken_at"] = metadata["taken_at"]
+
+        if not values:
+            return 0
+
+        # url_list 未改变时才写入；直接执行 UPDATE，不发布事件，也不改动 updated_at
+        async with AsyncSession(get_engine()) as session:
+            result = await session.exec(
+                update(Photo)
+                .where(Photo.id == photo_id, Photo.deleted_at.is_(None), Photo.url_list == url_list)
+                .values(**values, updated_at=Photo.updated_at)
+            )
+            await session.commit()
+
+        if result.rowcount:
+            self.generated += rendered
+            logger.info(
+                "[PHOTO_VARIANTS] 照片已处理: photo_id=%s, originals=%s, fields=%s",
+                photo_id, rendered, sorted(values),
+            )
+            return rendered
+        return 0
+
+    def stats(self) -> dict:
+        return {
+            "queued": len(self._queued),
+            "running": len(self._running),
+            "generated": self.generated,
+            "failed": self.failed,
+        }
+
+
+photo_variant_pipeline: Optional[PhotoVariantPipeline] = None
+
+
+def start_photo_variant_pipeline() -> Optional[PhotoVariantPipeline]:
+    """按配置启动缩略图任务"""
+    global photo_variant_pipeline
+    config = settings.get_photo_variants_config()
+    if not config["enabled"]:
+        return None
+    upload_config = settings.get_upload_config()
+    photo_variant_pipeline = PhotoVariantPipeline(
+        directory=upload_config["directory"],
+        url_prefix=upload_config["url_prefix"],
+        widths=config["widths"],
+        formats=config["formats"],
+        quality=config["quality"],
+        workers=config["workers"],
+    )
+    photo_variant_pipeline.start()
+    return photo_variant_pipeline
+
+
+async def stop_photo_variant_pipeline():
+    global photo_variant_pipeline
+    if photo_variant_pipeline is not None:
+        await photo_variant_pipeline.stop()
+        photo_variant_pipeline = None
@@ -0,0 +1,536 @@
+import asyncio
+import hashlib
+import os
+import re
+import time
+import uuid
+from collections import Counter
+from datetime import timedelta
+from mimetypes import guess_type
+from typing import AsyncIterator, Dict, Iterable, Optional, Tuple
+
+from multipart.multipart import parse_options_header
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from bluenote.api.exceptions import BadRequestException, ConflictException, PayloadTooLargeException
+from bluenote.api.static import HASHED_NAME_PATTERN
+from bluenote.config.config import settings
+from bluenote.schemas.images import BLOB_NAME_PATTERN, ImageBlob, blob_names_in, utc_now
+from bluenote.schemas.photos import Photo, PhotoUploadPublic, PhotoUploadStatus
+from bluenote.server.db import get_engine
+from bluenote.utils.locks import FileLock, try_lock_file, unlock_file
+from bluenote.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+UPLOAD_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+CONTENT_RANGE_PATTERN = re.compile(r"^bytes (\d+)-(\d+)/(\d+)$")
+# 识别图片类型需要的文件头长度
+SNIFF_BYTES = 32
+MAX_PART_HEADER_BYTES = 16 * 1024
+SHARD_PATTERN = re.compile(r"^[0-9a-f]{2}$")
+
+
+def blob_path(directory: str, name: str) -> str:
+    """Where a file in the upload store lives on disk.
+
+    Content-addressed names, originals and their variants alike, go two
+    directory levels deep by the first four hex digits of the hash
+    (`ab/cd/abcd....jpg`), so no directory grows past a few hundred
+    entries. Other names stay at the top level.
+    """
+    if HASHED_NAME_PATTERN.match(name):
+        return os.path.join(directory, name[:2], name[2:4], name)
+    return os.path.join(directory, name)
+
+
+def sniff_image_type(head: bytes) -> Optional[Tuple[str, str]]:
+    """Return (content type, extension) from the magic bytes, or None if not a supported image."""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg", ".jpg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png", ".png"
+    if head.startswith((b"GIF87a", b"GIF89a")):
+        return "image/gif", ".gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp", ".webp"
+    if head[4:8] == b"ftyp":
+        brand = head[8:12]
+        if brand in (b"avif", b"avis"):
+            return "image/avif", ".avif"
+        if brand in (b"heic", b"heix", b"heim", b"heis", b"mif1", b"msf1"):
+            return "image/heic", ".heic"
+    return None
+
+
+def parse_content_range(value: str) -> Tuple[int, int, int]:
+    """Parse `bytes start-end/total` into (start, end, total)."""
+    match = CONTENT_RANGE_PATTERN.match(value.strip())
+    if not match:
+        raise BadRequestException(message="Content-Range must look like 'bytes start-end/total'")
+    start, end, total = (int(group) for group in match.groups())
+    if start > end or end >= total:
+        raise BadRequestException(message="Content-Range is out of bounds")
+    return start, end, total
+
+
+async def multipart_file_chunks(
+    stream: AsyncIterator[bytes], content_type: str, field: str = "file"
+) -> AsyncIterator[bytes]:
+    """Yield the body of one file field of a multipart request as it arrives.
+
+    Only the bytes of `field` are yielded, other parts are skipped. Nothing is
+    spooled to memory or a temporary file beyond the current network chunk.
+    Boundaries are located with `bytes.find` instead of python-multipart's
+    byte-by-byte state machine, which parses about 30 MB/s on the event loop.
+    """
+    mime_type, params = parse_options_header(content_type)
+    boundary = params.get(b"boundary")
+    if mime_type != b"multipart/form-data" or not boundary:
+        raise BadRequestException(message="Expected a multipart/form-data body")
+
+    delimiter = b"\r\n--" + boundary
+    # 只保留可能是半个分隔符的尾部，其余数据立即交出
+    keep = len(delimiter) - 1
+    # 请求体以 --boundary 开头，前面补上换行后所有分隔符形式一致
+    buffer = b"\r\n"
+    state = "preamble"
+    in_field = found = False
+
+    async for chunk in stream:
+        buffer += chunk
+        while True:
+            if state in ("preamble", "body"):
+                index = buffer.find(delimiter)
+                if index == -1:
+                    if in_field and len(buffer) > keep:
+                        yield buffer[:-keep]
+                    buffer = buffer[-keep:]
+                    break
+                if in_field and index:
+                    yield buffer[:index]
+                buffer = buffer[index + len(delimiter):]
+                in_field = False
+                state = "boundary"
+            elif state == "boundary":
+                if len(buffer) < 2:
+                    break
+                if buffer.startswith(b"--"):
+                    state = "epilogue"
+                    break
+                if not buffer.startswith(b"\r\n"):
+                    raise BadRequestException(message="Malformed multipart body")
+                buffer = buffer[2:]
+                state = "headers"
+            elif state == "headers":
+                index = buffer.find(b"\r\n\r\n")
+                if index == -1:
+                    if len(buffer) > MAX_PART_HEADER_BYTES:
+                        raise BadRequestException(message="Multipart part headers too large")
+                    break
+                options = {}
+                for line in buffer[:index].split(b"\r\n"):
+                    name, _, value = line.partition(b":")
+                    if name.strip().lower() == b"content-disposition":
+                        _, options = parse_options_header(value.strip())
+                in_field = options.get(b"name") == field.encode() and b"filename" in options
+                found = found or in_field
+                buffer = buffer[index + 4:]
+                state = "body"
+            else:
+                buffer = b""
+                break
+
+    if state != "epilogue":
+        raise BadRequestException(message="Incomplete multipart body")
+    if not found:
+        raise BadRequestException(message=f"Missing file field '{field}'")
+
+
+class _HashingWriter:
+    """Writes to a file and optionally feeds the same bytes to a SHA-256; methods run in worker threads."""
+
+    def __init__(self, path: str, mode: str, hash_content: bool = True):
+        self.path = path
+        self.file = open(path, mode)
+        self.sha256 = hashlib.sha256() if hash_content else None
+
+    def write(self, data: bytes):
+        self.file.write(data)
+        if self.sha256 is not None:
+            self.sha256.update(data)
+
+    def close(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+
+
+class ImageUploadStore:
+    """Streams uploaded images to `directory`, naming each file by the SHA-256 of its content.
+
+    Uploading the same bytes twice stores one file, sharded by hash as in
+    `blob_path`, and every stored file has an `ImageBlob` row whose
+    `ref_count` follows the photos that list it. `collect_garbage` removes
+    files nothing has referenced for `gc_grace_seconds`. Incoming bytes are
+    gathered into `chunk_size` blocks and written and hashed in worker
+    threads, so the event loop never blocks on disk and memory per upload
+    stays at one block.
+
+    Resumable uploads append `Content-Range` pieces to a partial file under
+    `<directory>/.partial`. A client that lost its connection asks for the
+    current offset and continues from there. The last piece hashes the
+    assembled file and moves it into place.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        url_prefix: str,
+        chunk_size: int,
+        max_bytes: int,
+        partial_ttl_seconds: float,
+        gc_grace_seconds: float,
+    ):
+        self.directory = directory
+        self.partial_directory = os.path.join(directory, ".partial")
+        self.url_prefix = url_prefix.rstrip("/")
+        self.chunk_size = chunk_size
+        self.max_bytes = max_bytes
+        self.partial_ttl_seconds = partial_ttl_seconds
+        self.gc_grace_seconds = gc_grace_seconds
+        self._active_uploads = set()
+        # 上传落盘登记和垃圾回收删除文件互斥，避免刚去重命中的文件被回收；
+        # 锁文件放在上传目录中，同一目录的所有 worker 进程共用
+        self._commit_lock = FileLock(os.path.join(directory, ".commit.lock"))
+
+    def url_for(self, name: str) -> str:
+        return f"{self.url_prefix}/{name}"
+
+    def _partial_path(self, upload_id: str) -> str:
+        if not UPLOAD_ID_PATTERN.match(upload_id):
+            raise BadRequestException(message="Upload id must be 8-64 characters of [A-Za-z0-9_-]")
+        return os.path.join(self.partial_directory, f"{upload_id}.part")
+
+    async def _write_stream(
+        self,
+        writer: _HashingWriter,
+        chunks: AsyncIterator[bytes],
+        limit: int,
+        limit_error: Exception,
+        head: bytes = b"",
+    ) -> Tuple[int, bytes]:
+        """Write `chunks` through `writer` in blocks; return (bytes written, first SNIFF_BYTES of the file)."""
+        written = 0
+        pending = []
+        pending_size = 0
+        try:
+            async for chunk in chunks:
+                if written + pending_size + len(chunk) > limit:
+                    raise limit_error
+                if len(head) < SNIFF_BYTES:
+                    head += chunk[:SNIFF_BYTES - len(head)]
+                pending.append(chunk)
+                pending_size += len(chunk)
+                if pending_size >= self.chunk_size:
+                    await asyncio.to_thread(writer.write, b"".join(pending))
+                    written += pending_size
+                    pending.clear()
+                    pending_size = 0
+        finally:
+            # 连接中断时也把已收到的数据写入，断点续传从这里继续
+            if pending:
+                await asyncio.to_thread(writer.write, b"".join(pending))
+                written += pending_size
+            await asyncio.to_thread(writer.close)
+        return written, head
+
+    def path_for(self, name: str) -> str:
+        return blob_path(self.directory, name)
+
+    def _move_into_place(self, source: str, name: str) -> bool:
+        """Move a finished upload to its content-addressed path; return whether it already existed."""
+        target = self.path_for(name)
+        if os.path.exists(target):
+            os.remove(source)
+            return True
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(source, target)
+        return False
+
+    async def _commit(self, source: str, digest: str, extension: str, size: int, content_type: str) -> Tuple[str, bool]:
+        """Store a finished upload and record it in `image_blobs`; return (name, already existed)."""
+        name = f"{digest}{extension}"
+        async with self._commit_lock:
+            existed = await asyncio.to_thread(self._move_into_place, source, name)
+            async with AsyncSession(get_engine()) as session:
+                blob = await session.get(ImageBlob, name)
+                if blob is None:
+                    session.add(ImageBlob(name=name, size=size, content_type=content_type))
+                else:
+                    # 重新计算宽限期，刚上传还没放进照片的文件不会被回收
+                    blob.updated_at = utc_now()
+                try:
+                    await session.commit()
+                except IntegrityError:
+                    # 另一个进程同时登记了同一文件
+                    await session.rollback()
+        return name, existed
+
+    def _result(self, name: str, digest: str, size: int, content_type: str, deduplicated: bool) -> PhotoUploadPublic:
+        logger.info("[UPLOAD_PHOTO] 上传完成: name=%s, size=%s, deduplicated=%s", name, size, deduplicated)
+        return PhotoUploadPublic(
+            url=self.url_for(name),
+            sha256=digest,
+            size=size,
+            content_type=content_type,
+            deduplicated=deduplicated,
+        )
+
+    async def save(self, chunks: AsyncIterator[bytes]) -> PhotoUploadPublic:
+        """Store a complete upload streamed in `chunks`."""
+        await asyncio.to_thread(os.makedirs, self.partial_directory, exist_ok=True)
+        temp_path = os.path.join(self.partial_directory, f"{uuid.uuid4().hex}.tmp")
+        writer = await asyncio.to_thread(_HashingWriter, temp_path, "wb")
+        try:
+            size, head = await self._write_stream(
+                writer, chunks, self.max_bytes,
+                PayloadTooLargeException(message=f"Upload exceeds {self.max_bytes} bytes"),
+            )
+            image_type = sniff_image_type(head)
+            if size == 0 or image_type is None:
+                raise BadRequestException(message="Unsupported image format")
+            content_type, extension = image_type
+            digest = writer.sha256.hexdigest()
+            name, deduplicated = await self._commit(temp_path, digest, extension, size, content_type)
+        except BaseException:
+            await asyncio.to_thread(_remove_if_exists, temp_path)
+            raise
+        return self._result(name, digest, size, content_type, deduplicated)
+
+    async def offset(self, upload_id: str) -> int:
+        """Bytes of a resumable upload received so far."""
+        path = self._partial_path(upload_id)
+        return await asyncio.to_thread(_size_if_exists, path)
+
+    async def save_range(
+        self, upload_id: str, content_range: str, chunks: AsyncIterator[bytes]
+    ) -> PhotoUploadStatus:
+        """Append one `Content-Range` piece of a resumable upload.
+
+        The piece must start where the stored bytes end. When the last byte
+        arrives the upload is finished and `upload` carries the stored file.
+        """
+        start, end, total = parse_content_range(content_range)
+        if total > self.max_bytes:
+            raise PayloadTooLargeException(message=f"Upload exceeds {self.max_bytes} bytes")
+        path = self._partial_path(upload_id)
+        if upload_id in self._active_uploads:
+            raise ConflictException(message="Another request is writing this upload")
+
+        self._active_uploads.add(upload_id)
+        lock_fd = None
+        try:
+            # 其他 worker 进程正在写同一个上传时拒绝，文件锁随进程退出释放
+            lock_fd = await asyncio.to_thread(try_lock_file, path)
+            if lock_fd is None:
+                raise ConflictException(message="Another request is writing this upload")
+            offset = await asyncio.to_thread(_size_if_exists, path)
+            if start != offset:
+                raise ConflictException(message=f"Upload {upload_id} is at offset {offset}, not {start}")
+
+            head = b""
+            if start > 0:
+                head = await asyncio.to_thread(_read_head, path)
+            writer = await asyncio.to_thread(_HashingWriter, path, "ab", False)
+            written, head = await self._write_stream(
+                writer, chunks, end - start + 1,
+                BadRequestException(message="Body is longer than its Content-Range"), head,
+            )
+            if sniff_image_type(head) is None and (start + written >= SNIFF_BYTES or start + written == total):
+                await asyncio.to_thread(_remove_if_exists, path)
+                raise BadRequestException(message="Unsupported image format")
+
+            offset = start + written
+            if offset < total:
+                return PhotoUploadStatus(upload_id=upload_id, offset=offset, total=total)
+
+            content_type, extension = sniff_image_type(head)
+            digest = await asyncio.to_thread(_sha256_file, path, self.chunk_size)
+            name, deduplicated = await self._commit(path, digest, extension, total, content_type)
+            upload = self._result(name, digest, total, content_type, deduplicated)
+            return PhotoUploadStatus(upload_id=upload_id, offset=offset, total=total, upload=upload)
+        finally:
+            if lock_fd is not None:
+                unlock_file(lock_fd)
+            self._active_uploads.discard(upload_id)
+
+    def _purge_stale_partials(self) -> int:
+        if not os.path.isdir(self.partial_directory):
+            return 0
+        cutoff = time.time() - self.partial_ttl_seconds
+        purged = 0
+        for name in os.listdir(self.partial_directory):
+            path = os.path.join(self.partial_directory, name)
+            try:
+                if os.stat(path).st_mtime < cutoff:
+                    os.remove(path)
+                    purged += 1
+            except OSError:
+                continue
+        return purged
+
+    async def purge_stale_partials(self) -> int:
+        """Delete abandoned partial uploads untouched for `partial_ttl_seconds`."""
+        return await asyncio.to_thread(self._purge_stale_partials)
+
+    def _scan_blobs(self) -> Dict[str, int]:
+        """Move content-addressed files left at the top level into their shard; return {original name: size}."""
+        if not os.path.isdir(self.directory):
+            return {}
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and HASHED_NAME_PATTERN.match(entry.name):
+                target = self.path_for(entry.name)
+                if os.path.exists(target):
+                    os.remove(entry.path)
+                else:
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    os.replace(entry.path, target)
+
+        found = {}
+        for first in os.scandir(self.directory):
+            if not (first.is_dir() and SHARD_PATTERN.match(first.name)):
+                continue
+            for second in os.scandir(first.path):
+                if not (second.is_dir() and SHARD_PATTERN.match(second.name)):
+                    continue
+                for entry in os.scandir(second.path):
+                    if entry.is_file() and BLOB_NAME_PATTERN.match(entry.name):
+                        found[entry.name] = entry.stat().st_size
+        return found
+
+    def _remove_blobs(self, names: Iterable[str]) -> Tuple[int, int]:
+        """Delete originals with their variants and precompressed copies; return (files, bytes)."""
+        files = freed = 0
+        for name in names:
+            shard = os.path.dirname(self.path_for(name))
+            prefix = f"{BLOB_NAME_PATTERN.match(name).group(1)}."
+            try:
+                entries = list(os.scandir(shard))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                if entry.name.startswith(prefix):
+                    try:
+                        size = entry.stat().st_size
+                        os.remove(entry.path)
+                    except FileNotFoundError:
+                        continue
+                    files += 1
+                    freed += size
+            for directory in (shard, os.path.dirname(shard)):
+                try:
+                    os.rmdir(directory)
+                except OSError:
+                    break
+        return files, freed
+
+    async def reconcile_refs(self) -> int:
+        """Recount references from `photos.url_list` and register stored files missing from `image_blobs`.
+
+        Purging soft-deleted photos deletes rows in bulk without going through
+        `Photo.save`, so the counts drift until this runs. Return the number
+        of rows changed or added.
+        """
+        async with self._commit_lock:
+            return await self._reconcile_refs()
+
+    async def _reconcile_refs(self) -> int:
+        # 调用方持有 _commit_lock，扫描和登记期间不会有上传落盘
+        found = await asyncio.to_thread(self._scan_blobs)
+        async with AsyncSession(get_engine()) as session:
+            counts = Counter()
+            url_lists = await session.exec(select(Photo.url_list).execution_options(include_deleted=True))
+            for url_list in url_lists:
+                counts.update(blob_names_in(url_list))
+
+            now = utc_now()
+            changed = 0
+            blobs = {blob.name: blob for blob in await session.exec(select(ImageBlob))}
+            for blob in blobs.values():
+                if blob.ref_count != counts[blob.name]:
+                    blob.ref_count = counts[blob.name]
+                    # 引用数变化后重新计算宽限期，对账期间并发修改的照片不会因过期的计数被回收
+                    blob.updated_at = now
+                    changed += 1
+            for name, size in found.items():
+                if name not in blobs:
+                    session.add(ImageBlob(name=name, size=size, content_type=guess_type(name)[0], ref_count=counts[name]))
+                    changed += 1
+            await session.commit()
+        return changed
+
+    async def collect_garbage(self) -> Tuple[int, int]:
+        """Reconcile reference counts, then delete files unreferenced for `gc_grace_seconds`.
+
+        Candidates are checked against `photos.url_list` again in the
+        transaction that deletes their rows, so a photo saved since the
+        reconcile keeps its file. A photo saved after the delete finds the
+        row gone and is rejected (see `ImageBlob.adjust_refs`). Return
+        (originals removed, bytes freed).
+        """
+        cutoff = utc_now() - timedelta(seconds=self.gc_grace_seconds)
+        async with self._commit_lock:
+            await self._reconcile_refs()
+            async with AsyncSession(get_engine()) as session:
+                unreferenced = (ImageBlob.ref_count <= 0, ImageBlob.updated_at < cutoff)
+                candidates = set(await session.exec(select(ImageBlob.name).where(*unreferenced)))
+                if candidates:
+                    url_lists = await session.exec(select(Photo.url_list).execution_options(include_deleted=True))
+                    for url_list in url_lists:
+                        candidates -= blob_names_in(url_list)
+                names = []
+                if candidates:
+                    result = await session.exec(
+                        delete(ImageBlob)
+                        .where(ImageBlob.name.in_(candidates), *unreferenced)
+                        .returning(ImageBlob.name)
+                    )
+                    names = list(result.scalars())
+                await session.commit()
+            if not names:
+                return 0, 0
+            _, freed = await asyncio.to_thread(self._remove_blobs, names)
+        return len(names), freed
+
+def _remove_if_exists(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _size_if_exists(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except FileNotFoundError:
+        return 0
+
+
+def _read_head(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read(SNIFF_BYTES)
+
+
+def _sha256_file(path: str, chunk_size: int) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+image_upload_store = ImageUploadStore(**settings.get_upload_config())
@@ -0,0 +1,133 @@
+import os
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Sequence, Tuple
+
+
+def variant_name(stem: str, width: int, fmt: str) -> str:
+    return f"{stem}.w{width}.{fmt}"
+
+
+def render_variants(source: str, widths: Sequence[int], formats: Sequence[str], quality: int) -> List[dict]:
+    """Write resized copies of `source` next to it, one per width and format.
+
+    Runs in a worker process, so it only imports Pillow. Widths wider than
+    the image collapse to the original width. Files that already exist are
+    kept, which makes re-running after a crash or for a duplicate upload
+    cheap. Returns one dict per variant with its file name and size.
+    """
+    from PIL import Image, ImageOps, features
+
+    directory = os.path.dirname(source)
+    stem = os.path.splitext(os.path.basename(source))[0]
+    formats = [fmt for fmt in formats if features.check(fmt)]
+    variants = []
+
+    with Image.open(source) as image:
+        if image.format == "JPEG":
+            # let the JPEG decoder scale by 1/2, 1/4 or 1/8 instead of decoding every pixel
+            image.draft("RGB", (max(widths), max(widths)))
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            has_alpha = "A" in image.getbands() or "transparency" in image.info
+            image = image.convert("RGBA" if has_alpha else "RGB")
+
+        for width in sorted({min(width, image.width) for width in widths}):
+            height = max(1, round(image.height * width / image.width))
+            resized = image
+            if width != image.width:
+                resized = image.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=2.0)
+            for fmt in formats:
+                name = variant_name(stem, width, fmt)
+                target = os.path.join(directory, name)
+                if not os.path.exists(target):
+                    # two photos sharing an original may render it at the same time
+                    temp_path = f"{target}.{os.getpid()}.tmp"
+                    resized.save(temp_path, format=fmt.upper(), quality=quality)
+                    os.replace(temp_path, target)
+                variants.append({"name": name, "width": width, "height": height, "format": fmt})
+    return variants
+
+
+def _exif_datetime(value, offset) -> Optional[datetime]:
+    """EXIF "YYYY:MM:DD HH:MM:SS" as naive UTC; without an offset tag the camera clock is taken as UTC."""
+    if not isinstance(value, str):
+        return None
+    try:
+        taken_at = datetime.strptime(value.strip("\x00 ")[:19], "%Y:%m:%d %H:%M:%S")
+    except ValueError:
+        return None
+    if isinstance(offset, str) and len(offset) >= 6 and offset[0] in "+-":
+        try:
+            delta = timedelta(hours=int(offset[1:3]), minutes=int(offset[4:6]))
+        except ValueError:
+            return taken_at
+        taken_at -= delta if offset[0] == "+" else -delta
+    return taken_at
+
+
+def _gps_coordinate(value, ref) -> Optional[float]:
+    try:
+        degrees, minutes, seconds = (float(part) for part in value)
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+    coordinate = degrees + minutes / 60 + seconds / 3600
+    if coordinate != coordinate:  # NaN from a zero denominator
+        return None
+    return -coordinate if ref in ("S", "W") else coordinate
+
+
+def _gps_location(gps) -> Tuple[Optional[float], Optional[float]]:
+    from PIL import ExifTags
+
+    latitude = _gps_coordinate(gps.get(ExifTags.GPS.GPSLatitude), gps.get(ExifTags.GPS.GPSLatitudeRef))
+    longitude = _gps_coordinate(gps.get(ExifTags.GPS.GPSLongitude), gps.get(ExifTags.GPS.GPSLongitudeRef))
+    if latitude is None or longitude is None or abs(latitude) > 90 or abs(longitude) > 180:
+        return None, None
+    # 0,0 is what some cameras write when they have no fix
+    if latitude == 0 and longitude == 0:
+        return None, None
+    return round(latitude, 6), round(longitude, 6)
+
+
+def read_metadata(source: str) -> dict:
+    """Read what the gallery needs to lay out a placeholder before the image loads.
+
+    Returns display width and height (after the EXIF orientation is
+    applied), the EXIF orientation, the capture time as naive UTC, GPS
+    latitude/longitude and the dominant color as `#rrggbb`. Missing
+    values are None. Only the header is parsed for EXIF; the color is
+    taken from a JPEG draft decode at 1/8 scale where possible.
+    """
+    from PIL import ExifTags, Image
+
+    with Image.open(source) as image:
+        exif = image.getexif()
+        orientation = exif.get(ExifTags.Base.Orientation)
+        width, height = image.size
+        if orientation in (5, 6, 7, 8):
+            width, height = height, width
+
+        exif_ifd = exif.get_ifd(ExifTags.IFD.Exif)
+        taken_at = _exif_datetime(
+            exif_ifd.get(ExifTags.Base.DateTimeOriginal) or exif.get(ExifTags.Base.DateTime),
+            exif_ifd.get(ExifTags.Base.OffsetTimeOriginal),
+        )
+        latitude, longitude = _gps_location(exif.get_ifd(ExifTags.IFD.GPSInfo))
+
+        if image.format == "JPEG":
+            image.draft("RGB", (64, 64))
+        small = image.convert("RGB")
+        small.thumbnail((64, 64))
+        quantized = small.quantize(colors=5, method=Image.Quantize.MEDIANCUT)
+        _, index = max(quantized.getcolors())
+        red, green, blue = quantized.getpalette()[index * 3:index * 3 + 3]
+
+    return {
+        "width": width,
+        "height": height,
+        "orientation": orientation if isinstance(orientation, int) and 1 <= orientation <= 8 else None,
+        "taken_at": taken_at,
+        "latitude": latitude,
+        "longitude": longitude,
+        "dominant_color": f"#{red:02x}{green:02x}{blue:02x}",
+    }
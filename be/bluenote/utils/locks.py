@@ -0,0 +1,107 @@
+import asyncio
+import os
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: a single process only, in-process locks are enough
+    fcntl = None
+
+
+def try_lock_file(path: str) -> Optional[int]:
+    """Take an exclusive `flock` on `path` (created if missing) without waiting.
+
+    Return the open descriptor holding the lock, or None if another process
+    holds it. Closing the descriptor (`unlock_file`) releases the lock.
+    Without `fcntl` there is nothing to lock and -1 is returned.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if fcntl is None:
+        return -1
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return None
+    except BaseException:
+        os.close(fd)
+        raise
+    return fd
+
+
+def unlock_file(fd: int):
+    if fd >= 0:
+        os.close(fd)
+
+
+class FileLock:
+    """Async lock shared by every process that uses the same lock file.
+
+    Holds an asyncio lock within the process and an exclusive `flock` on
+    `path` across processes. Waiting polls with a non-blocking `flock`
+    instead of blocking a thread, so cancelling a waiter leaves nothing
+    behind. The lock is released when the holder releases it or exits.
+    """
+
+    def __init__(self, path: str, poll_interval: float = 0.05):
+        self.path = path
+        self.poll_interval = poll_interval
+        self._local = asyncio.Lock()
+        self._fd: Optional[int] = None
+
+    async def acquire(self):
+        await self._local.acquire()
+        try:
+            while (fd := try_lock_file(self.path)) is None:
+                await asyncio.sleep(self.poll_interval)
+        except BaseException:
+            self._local.release()
+            raise
+        self._fd = fd
+
+    def release(self):
+        if self._fd is not None:
+            unlock_file(self._fd)
+            self._fd = None
+        self._local.release()
+
+    def locked(self) -> bool:
+        return self._local.locked()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+
+class FileEpoch:
+    """Change counter shared by every process that uses the same file.
+
+    `bump` appends one byte to `path` and `current` returns its size, so the
+    value only ever grows and reading it is a single `stat`. Appends are
+    atomic, concurrent bumps from several processes are all counted.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Create the file up front: a missing file would read as 0 again after bumps
+        with open(path, "ab"):
+            pass
+
+    def current(self) -> int:
+        return os.stat(self.path).st_size
+
+    def bump(self):
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, b".")
+        finally:
+            os.close(fd)
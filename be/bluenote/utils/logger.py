@@ -1,49 +1,186 @@
+import atexit
+import json
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Optional
+
 from bluenote.config.config import settings
+from bluenote.utils import metrics
+
+log_records_dropped_total = metrics.counter(
+    "log_records_dropped_total", "Log records dropped because the logging queue was full"
+)
+
+# 热点路径上的 INFO 日志传入 extra=SAMPLED，按 LOG_SAMPLE_RATE 采样记录
+SAMPLED = {"sampled": True}
+
+
+class SamplingFilter(logging.Filter):
+    """按比例丢弃标记为 sampled 的 INFO 及以下日志，WARNING 及以上始终保留"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate >= 1 or record.levelno > logging.INFO or not getattr(record, "sampled", False):
+            return True
+        return random.random() < self.rate
+
+
+# LogRecord 自带的属性；其余属性来自调用方传入的 extra
+_RECORD_ATTRS = frozenset(logging.makeLogRecord({}).__dict__) | {"message", "asctime", "sampled"}
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志输出为一行 JSON，调用方通过 extra 传入的字段作为同级的键输出"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and key not in data:
+                data[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exc_info"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+_exception_formatter = logging.Formatter()
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """队列满时丢弃日志而不是阻塞事件循环"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 消息和异常堆栈在调用方线程合并成字符串，后台线程不会对参数（可能是 ORM 对象）调用 repr；
+        # 记录只经过这一个 handler，不需要像基类那样复制一份
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            log_records_dropped_total.inc()
+
+
+class LogQueueListener(QueueListener):
+    """停止时等待队列腾出位置再放入结束标记，队列满时也能正常退出"""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+_queue_handler: Optional[NonBlockingQueueHandler] = None
+_listener: Optional[LogQueueListener] = None
+
+
+def _log_file_path(log_config: dict, worker_id: Optional[str]) -> Optional[str]:
+    """多 worker 时 worker 写 logs/bluenote.<编号>.log，主进程仍写 LOG_FILE"""
+    path = log_config["log_file"]
+    if path and log_config["log_file_per_worker"] and worker_id:
+        root, ext = os.path.splitext(path)
+        path = f"{root}.{worker_id}{ext}"
+    return path
+
+
+def _create_output_handlers(worker_id: Optional[str]) -> list:
+    """创建实际写日志的 handler，由 QueueListener 在后台线程中调用"""
+    log_config = settings.get_log_config()
+    handlers = [logging.StreamHandler()]
+    log_file = _log_file_path(log_config, worker_id)
+    if log_file:
+        log_dir = os.path.dirname(log_file)
+        if log_dir and not os.path.exists(log_dir):
+            os.makedirs(log_dir)
+
+        handlers.append(RotatingFileHandler(
+            log_file,
+            maxBytes=log_config["log_max_bytes"],
+            backupCount=log_config["log_backup_count"],
+            encoding='utf-8'
+        ))
+
+    if log_config["log_json"]:
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(log_config["log_format"])
+    for handler in handlers:
+        handler.setLevel(logging.INFO)
+        handler.setFormatter(formatter)
+    return handlers
+
+
+def _start_listener(worker_id: Optional[str] = None):
+    global _listener
+    log_config = settings.get_log_config()
+    _queue_handler.queue = queue.Queue(log_config["log_queue_size"])
+    handlers = _create_output_handlers(worker_id or settings.get_worker_id())
+    _listener = LogQueueListener(_queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def _restart_listener_after_fork():
+    # gunicorn 从主进程 fork 出的 worker 没有编号，用进程号区分日志文件
+    _start_listener(settings.get_worker_id() or str(os.getpid()))
+
+
+def _get_queue_handler() -> NonBlockingQueueHandler:
+    global _queue_handler
+    if _queue_handler is None:
+        _queue_handler = NonBlockingQueueHandler(None)
+        _queue_handler.addFilter(SamplingFilter(settings.get_log_config()["log_sample_rate"]))
+        _start_listener()
+        atexit.register(shutdown_logging)
+        # fork 出的子进程没有监听线程，需要重新创建队列和监听器
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=_restart_listener_after_fork)
+    return _queue_handler
+
+
+def shutdown_logging():
+    """停止后台写日志线程，写完队列中剩余的日志"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
 
 def setup_logger(name: str) -> logging.Logger:
-    """设置并返回logger实例"""
+    """设置并返回logger实例
+
+    所有 logger 共用一个 QueueHandler：调用方只把日志记录放入队列，
+    文件写入、日志轮转和控制台输出都在 QueueListener 的后台线程中完成。
+    """
     logger = logging.getLogger(name)
-    
+
     # 避免重复添加handler
     if logger.handlers:
         return logger
-    
+
     logger.setLevel(logging.INFO)
     # 阻止日志传播到父logger，避免重复记录
     logger.propagate = False
-    
-    # 创建日志目录
-    log_config = settings.get_log_config()
-    log_dir = os.path.dirname(log_config["log_file"])
-    if not os.path.exists(log_dir):
-        os.makedirs(log_dir)
-    
-    # 创建文件handler
-    file_handler = RotatingFileHandler(
-        log_config["log_file"],
-        maxBytes=log_config["log_max_bytes"],
-        backupCount=log_config["log_backup_count"],
-        encoding='utf-8'
-    )
-    file_handler.setLevel(logging.INFO)
-    
-    # 创建控制台handler
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.INFO)
-    
-    # 创建formatter
-    formatter = logging.Formatter(log_config["log_format"])
-    file_handler.setFormatter(formatter)
-    console_handler.setFormatter(formatter)
-    
-    # 添加handler到logger
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
-    
+    logger.addHandler(_get_queue_handler())
+
     return logger
 
 # 创建默认logger
-default_logger = setup_logger('bluenote')
\ No newline at end of file
+default_logger = setup_logger('bluenote')
@@ -0,0 +1,232 @@
+import bisect
+import math
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Sample = Tuple[str, Dict[str, str], float]
+
+
+class Counter:
+    """Monotonic counter."""
+
+    type = "counter"
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def samples(self) -> Iterable[Sample]:
+        yield "", {}, self.value
+
+    def snapshot(self) -> dict:
+        return {"value": self.value}
+
+
+class Gauge:
+    """Value that can go up and down."""
+
+    type = "gauge"
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+    def samples(self) -> Iterable[Sample]:
+        yield "", {}, self.value
+
+    def snapshot(self) -> dict:
+        return {"value": self.value}
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style.
+
+    Not thread-safe, observations are expected from the event loop.
+    """
+
+    type = "histogram"
+
+    def __init__(self, name: str, description: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate the q-quantile by linear interpolation inside its bucket."""
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for i, bucket_count in enumerate(self.bucket_counts):
+            if cumulative + bucket_count >= rank and bucket_count > 0:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                if i == len(self.buckets):
+                    return lower
+                upper = self.buckets[i]
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.buckets[-1]
+
+    def samples(self) -> Iterable[Sample]:
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, self.bucket_counts):
+            cumulative += bucket_count
+            yield "_bucket", {"le": _format_value(bound)}, cumulative
+        yield "_bucket", {"le": "+Inf"}, self.count
+        yield "_sum", {}, self.sum
+        yield "_count", {}, self.count
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+        }
+
+
+class MetricFamily:
+    """Metrics sharing a name, one child per combination of label values."""
+
+    def __init__(self, metric_class, name: str, description: str, labelnames: Sequence[str], **kwargs):
+        self.metric_class = metric_class
+        self.type = metric_class.type
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self.kwargs = kwargs
+        self.children: Dict[tuple, object] = {}
+
+    def labels(self, *values: str):
+        child = self.children.get(values)
+        if child is None:
+            child = self.children[values] = self.metric_class(self.name, self.description, **self.kwargs)
+        return child
+
+    def samples(self) -> Iterable[Sample]:
+        for values, child in self.children.items():
+            labels = dict(zip(self.labelnames, values))
+            for suffix, extra, value in child.samples():
+                yield suffix, {**labels, **extra}, value
+
+    def snapshot(self) -> dict:
+        return {",".join(values): child.snapshot() for values, child in self.children.items()}
+
+
+_registry: Dict[str, object] = {}
+
+
+def _get_or_create(metric_class, name: str, description: str, labelnames: Sequence[str], **kwargs):
+    metric = _registry.get(name)
+    if metric is None:
+        if labelnames:
+            metric = MetricFamily(metric_class, name, description, labelnames, **kwargs)
+        else:
+            metric = metric_class(name, description, **kwargs)
+        _registry[name] = metric
+    return metric
+
+
+def counter(name: str, description: str, labelnames: Sequence[str] = ()) -> Counter:
+    """Return the counter registered under `name`, creating it on first use."""
+    return _get_or_create(Counter, name, description, labelnames)
+
+
+def gauge(name: str, description: str, labelnames: Sequence[str] = ()) -> Gauge:
+    """Return the gauge registered under `name`, creating it on first use."""
+    return _get_or_create(Gauge, name, description, labelnames)
+
+
+def histogram(
+    name: str,
+    description: str,
+    buckets: Sequence[float] = DEFAULT_BUCKETS,
+    labelnames: Sequence[str] = (),
+) -> Histogram:
+    """Return the histogram registered under `name`, creating it on first use."""
+    return _get_or_create(Histogram, name, description, labelnames, buckets=buckets)
+
+
+def snapshot() -> dict:
+    return {name: metric.snapshot() for name, metric in _registry.items()}
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, int):
+        return str(value)
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+def _escape_label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(f'{key}="{_escape_label_value(value)}"' for key, value in labels.items())
+    return "{" + pairs + "}"
+
+
+def export() -> Dict[str, dict]:
+    """Every registered metric with its current samples, as JSON-serialisable data."""
+    return {
+        name: {
+            "type": metric.type,
+            "description": metric.description,
+            "samples": [[suffix, labels, value] for suffix, labels, value in metric.samples()],
+        }
+        for name, metric in _registry.items()
+    }
+
+
+def render_prometheus(exports: Optional[Dict[str, Dict[str, dict]]] = None) -> str:
+    """Render metrics in the Prometheus text exposition format.
+
+    Without `exports` the metrics registered in this process are rendered.
+    Otherwise `exports` maps a worker id to that worker's `export()`; the
+    samples of all workers are rendered together, each with a `worker` label.
+    """
+    if exports is None:
+        exports = {None: export()}
+    families: Dict[str, dict] = {}
+    for worker, exported in exports.items():
+        for name, metric in exported.items():
+            family = families.setdefault(name, {**metric, "samples": []})
+            for suffix, labels, value in metric["samples"]:
+                if worker is not None:
+                    labels = {"worker": worker, **labels}
+                family["samples"].append((suffix, labels, value))
+
+    lines = []
+    for name, family in families.items():
+        lines.append(f"# HELP {name} {family['description']}")
+        lines.append(f"# TYPE {name} {family['type']}")
+        for suffix, labels, value in family["samples"]:
+            lines.append(f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
@@ -7,6 +7,12 @@ def main():
     # 使用配置文件中的设置
     server_config = settings.get_server_config()
     
+    if server_config["mode"] == "production":
+        # 多 worker 进程，收到 SIGTERM 时先结束进行中的流式响应
+        from bluenote.server.launcher import run_production
+        run_production(server_config)
+        return
+
     uvicorn.run(
         "bluenote.server.app:create_app",  # 使用导入字符串
         factory=True,  # 表示create_app是一个工厂函数
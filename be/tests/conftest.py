@@ -0,0 +1,25 @@
+import pytest
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+# 先导入所有模型：直接导入 bluenote.mixins 会循环导入
+import bluenote.schemas  # noqa: F401
+from bluenote.server.db import close_db, get_engine, init_db
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def engine(tmp_path):
+    """每个测试使用一个新的 SQLite 数据库"""
+    await init_db(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    yield get_engine()
+    await close_db()
+
+
+@pytest.fixture
+async def session(engine):
+    async with AsyncSession(engine) as session:
+        yield session
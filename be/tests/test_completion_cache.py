@@ -0,0 +1,75 @@
+import json
+import os
+
+import pytest
+
+from bluenote.services.completion_cache import DiskCompletionStore
+
+pytestmark = pytest.mark.anyio
+
+CONTENT = "x" * 100
+ENTRY_BYTES = len(json.dumps({"expires_at": None, "content": CONTENT}).encode())
+
+
+def stored_keys(directory) -> set:
+    return {name[:-5] for _, _, files in os.walk(directory) for name in files if name.endswith(".json")}
+
+
+async def test_evicts_least_recently_used_down_to_low_water(tmp_path):
+    store = DiskCompletionStore(str(tmp_path), max_bytes=10 * ENTRY_BYTES, low_water=0.5)
+    for i in range(10):
+        await store.set(f"k{i}", CONTENT)
+    assert stored_keys(tmp_path) == {f"k{i}" for i in range(10)}
+    # 读取会刷新最近使用时间
+    assert await store.get("k0") == CONTENT
+
+    await store.set("k10", CONTENT)
+    # 超过上限后一次淘汰到 50%，而不是每次写入只淘汰一个
+    assert store.total_bytes <= 5 * ENTRY_BYTES
+    assert stored_keys(tmp_path) == {"k0", "k7", "k8", "k9", "k10"}
+    assert await store.get("k1") is None
+
+
+async def test_writes_under_the_cap_do_not_rescan(tmp_path, monkeypatch):
+    store = DiskCompletionStore(str(tmp_path), max_bytes=10 * ENTRY_BYTES, low_water=0.5)
+    await store.set("k0", CONTENT)
+    scans = []
+    original = store._load_index
+    monkeypatch.setattr(store, "_load_index", lambda: (scans.append(1), original()))
+    for i in range(1, 20):
+        await store.set(f"k{i}", CONTENT)
+    # 只有写满时重新扫描：第 11 次和淘汰到 5 个后再写满的第 16 次
+    assert len(scans) == 2
+
+
+async def test_entries_survive_restart(tmp_path):
+    store = DiskCompletionStore(str(tmp_path), max_bytes=10 * ENTRY_BYTES)
+    await store.set("k0", CONTENT)
+
+    restarted = DiskCompletionStore(str(tmp_path), max_bytes=10 * ENTRY_BYTES)
+    assert await restarted.get("k0") == CONTENT
+    assert restarted.total_bytes == ENTRY_BYTES
+
+
+async def test_counts_entries_written_by_other_processes(tmp_path):
+    # rescan_seconds 之后的第一次写入重新扫描目录，计入其他进程写入的文件
+    store = DiskCompletionStore(str(tmp_path), max_bytes=4 * ENTRY_BYTES, rescan_seconds=0, low_water=0.5)
+    other = DiskCompletionStore(str(tmp_path), max_bytes=4 * ENTRY_BYTES, low_water=0.5)
+    await store.set("k0", CONTENT)
+    for i in range(1, 4):
+        await other.set(f"k{i}", CONTENT)
+
+    await store.set("k4", CONTENT)
+    assert stored_keys(tmp_path) == {"k3", "k4"}
+
+
+async def test_expired_and_removed_entries_are_misses(tmp_path):
+    store = DiskCompletionStore(str(tmp_path), max_bytes=10 * ENTRY_BYTES)
+    await store.set("expired", CONTENT, ttl=-1)
+    await store.set("removed", CONTENT)
+    os.remove(store._path("removed"))
+
+    assert await store.get("expired") is None
+    assert await store.get("removed") is None
+    assert store.total_bytes == 0
+    assert stored_keys(tmp_path) == set()
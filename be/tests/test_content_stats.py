@@ -0,0 +1,104 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from bluenote.schemas.blogs import Blog, ContentStatus
+from bluenote.schemas.stats import StatsCounter
+from bluenote.server.bus import Event, EventType
+from bluenote.services.content_stats import STATS_SCOPES, ContentStatsAggregator, aggregate_stats
+
+pytestmark = pytest.mark.anyio
+
+NAMES = [counter.name for counter in STATS_SCOPES["blog"].counters]
+
+
+def blog(**values) -> Blog:
+    return Blog(id=1, title="t", content="c", **values)
+
+
+def as_dict(delta) -> dict:
+    return {name: change for name, change in zip(NAMES, delta) if change}
+
+
+@pytest.fixture
+async def aggregator():
+    aggregator = ContentStatsAggregator(reconcile_interval_seconds=3600, dirty_delay_seconds=3600)
+    yield aggregator
+    if aggregator._dirty_task is not None:
+        aggregator._dirty_task.cancel()
+    await aggregator.stop()
+
+
+async def test_created_adds_the_row(aggregator):
+    row = blog(status=ContentStatus.PUBLISHED, like_count=3)
+    delta = aggregator._delta("blog", [Event(EventType.CREATED, row)])
+    assert as_dict(delta) == {"total_blogs": 1, "published_blogs": 1, "total_likes": 3}
+
+
+async def test_updated_uses_previous_values(aggregator):
+    row = blog(status=ContentStatus.PUBLISHED, like_count=5)
+    previous = {"status": ContentStatus.DRAFT, "like_count": 2}
+    delta = aggregator._delta("blog", [Event(EventType.UPDATED, row, previous=previous)])
+    assert as_dict(delta) == {"published_blogs": 1, "draft_blogs": -1, "total_likes": 3}
+
+
+async def test_updated_without_previous_marks_scope_dirty(aggregator):
+    row = blog(status=ContentStatus.PUBLISHED)
+    delta = aggregator._delta("blog", [Event(EventType.UPDATED, row)])
+    assert as_dict(delta) == {}
+    assert aggregator._dirty == {"blog"}
+
+
+async def test_deleted_removes_the_row(aggregator):
+    row = blog(status=ContentStatus.DRAFT, view_count=7, deleted_at=datetime(2026, 1, 1))
+    delta = aggregator._delta("blog", [Event(EventType.DELETED, row)])
+    assert as_dict(delta) == {"total_blogs": -1, "draft_blogs": -1, "total_views": -7}
+
+
+async def test_events_are_summed(aggregator):
+    events = [
+        Event(EventType.CREATED, blog(status=ContentStatus.DRAFT)),
+        Event(EventType.UPDATED, blog(status=ContentStatus.PUBLISHED), previous={"status": ContentStatus.DRAFT}),
+    ]
+    assert as_dict(aggregator._delta("blog", events)) == {"total_blogs": 1, "published_blogs": 1}
+
+
+async def read_counters(engine) -> dict:
+    async with AsyncSession(engine) as session:
+        rows = (await session.exec(select(StatsCounter).where(StatsCounter.scope == "blog"))).all()
+        return {row.name: row.value for row in rows}
+
+
+async def wait_applied(aggregator, count: int):
+    for _ in range(100):
+        if aggregator.applied >= count:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"only {aggregator.applied} of {count} events applied")
+
+
+async def test_counters_follow_writes_without_drift(engine, aggregator):
+    aggregator.start()
+    await aggregator.reconcile("blog")
+
+    async with AsyncSession(engine) as session:
+        first = await Blog.create(session, {"title": "a", "content": "c", "like_count": 2})
+        second = await Blog.create(session, {"title": "b", "content": "c"})
+        # 提交后对象已过期，像路由一样先加载再修改
+        await first.refresh(session)
+        await first.update(session, {"status": ContentStatus.PUBLISHED, "like_count": 4})
+        await second.refresh(session)
+        await second.delete(session)
+    await wait_applied(aggregator, 4)
+
+    counters = await read_counters(engine)
+    assert counters["total_blogs"] == 1
+    assert counters["published_blogs"] == 1
+    assert counters["total_likes"] == 4
+    async with AsyncSession(engine) as session:
+        assert counters == await aggregate_stats(session, "blog")
+    # 对账前后一致
+    assert await aggregator.reconcile("blog") == {}
@@ -0,0 +1,60 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+
+from bluenote.api.exceptions import AlreadyExistsException
+from bluenote.config.config import Settings, settings
+from bluenote.schemas.blogs import Blog
+from bluenote.server.app import create_app
+from bluenote.services.uploads import ImageUploadStore, image_upload_store
+
+
+@pytest.mark.anyio
+async def test_duplicate_raises_already_exists(session):
+    await Blog.create_unique(session, {"title": "same", "content": "a"}, conflict_on=("title",))
+
+    with pytest.raises(AlreadyExistsException) as info:
+        await Blog.create_unique(session, {"title": "same", "content": "b"}, conflict_on=("title",))
+    assert info.value.status_code == 409
+    # 失败的插入已回滚，会话仍然可用
+    assert len((await session.exec(select(Blog))).all()) == 1
+
+
+@pytest.mark.anyio
+async def test_other_integrity_errors_propagate(session):
+    blog = await Blog.create(session, {"title": "a", "content": "a"})
+    with pytest.raises(IntegrityError):
+        # 主键冲突不是标题的唯一索引冲突
+        await Blog.create_unique(session, {"id": blog.id, "title": "b", "content": "b"}, conflict_on=("title",))
+
+
+@pytest.mark.anyio
+async def test_unique_violation_must_match_the_columns(session):
+    await Blog.create(session, {"title": "same", "content": "a"})
+    with pytest.raises(IntegrityError) as info:
+        await Blog.create(session, {"title": "same", "content": "b"})
+    assert Blog.is_unique_violation(info.value, ["title"])
+    assert not Blog.is_unique_violation(info.value, ["title", "content"])
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(Settings, "DATABASE_URL", f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    monkeypatch.setattr(Settings, "UPLOAD_DIR", str(tmp_path / "uploads"))
+    monkeypatch.setattr(Settings, "SERVER_LOCK_DIR", str(tmp_path / "run"))
+    # 上传存储在导入时按配置创建，并被各模块直接导入，把它的目录也换到临时目录，
+    # 避免后台的垃圾回收扫描仓库中的 imgs
+    for name, value in vars(ImageUploadStore(**settings.get_upload_config())).items():
+        monkeypatch.setattr(image_upload_store, name, value)
+    with TestClient(create_app()) as client:
+        yield client
+
+
+def test_duplicate_title_returns_409(client):
+    blog = {"title": "same", "content": "content"}
+    assert client.post("/v1/blogs", json=blog).status_code == 200
+
+    response = client.post("/v1/blogs", json=blog)
+    assert response.status_code == 409
+    assert "already exists" in response.json()["message"]
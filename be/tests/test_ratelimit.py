@@ -0,0 +1,133 @@
+import pytest
+
+from bluenote.api import ratelimit
+from bluenote.api.ratelimit import (
+    DatabaseRateLimitStore,
+    LoginRateLimiter,
+    MemoryRateLimitStore,
+    resolve_client_ip,
+)
+
+pytestmark = pytest.mark.anyio
+
+WINDOW = 60
+
+
+class FakeClock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # 从窗口开始处计时，方便推算滑动窗口的权重
+    clock = FakeClock(1_000 * WINDOW)
+    monkeypatch.setattr(ratelimit.time, "time", clock)
+    return clock
+
+
+@pytest.fixture(params=["memory", "database"])
+def store(request):
+    # 两种存储的行为应该完全一致
+    if request.param == "memory":
+        return MemoryRateLimitStore()
+    request.getfixturevalue("engine")
+    return DatabaseRateLimitStore(retention_seconds=2 * WINDOW)
+
+
+def make_limiter(store, ip_limit=3, username_limit=2, lockout_seconds=300):
+    return LoginRateLimiter(
+        store=store,
+        ip_limit=ip_limit,
+        username_limit=username_limit,
+        window_seconds=WINDOW,
+        lockout_seconds=lockout_seconds,
+    )
+
+
+async def test_ip_is_rejected_after_limit_attempts(clock, store):
+    limiter = make_limiter(store)
+    for _ in range(3):
+        assert await limiter.check("10.0.0.1", "alice") is None
+
+    # 下一个窗口开始 20 秒后，上一个窗口的 3 次只计 3 * (1 - 20/60) = 2 次
+    assert await limiter.check("10.0.0.1", "alice") == WINDOW + 20
+    assert limiter.rejected == 1
+    # 其他 IP 不受影响
+    assert await limiter.check("10.0.0.2", "alice") is None
+
+
+async def test_previous_window_is_weighted_by_overlap(clock, store):
+    for _ in range(4):
+        await store.hit("key", WINDOW)
+    clock.now += WINDOW
+    # 上一个窗口的 4 次仍全部计入
+    assert await store.retry_after("key", 4, WINDOW) > 0
+    clock.now += WINDOW / 2
+    # 只剩一半重叠：4 * 0.5 = 2 次
+    assert await store.retry_after("key", 3, WINDOW) == 0
+    assert await store.retry_after("key", 2, WINDOW) > 0
+
+
+async def test_counts_expire_after_two_windows(clock, store):
+    for _ in range(4):
+        await store.hit("key", WINDOW)
+    clock.now += 2 * WINDOW
+    assert await store.retry_after("key", 1, WINDOW) == 0
+
+
+async def test_username_locks_after_repeated_failures(clock, store):
+    limiter = make_limiter(store, ip_limit=100)
+    await limiter.record_failure("alice")
+    assert await store.lock_remaining("login:user:alice") == 0
+
+    await limiter.record_failure("alice")
+    assert await store.lock_remaining("login:user:alice") == pytest.approx(300)
+    assert await limiter.check("10.0.0.1", "alice") == 300
+    # 锁定只针对用户名
+    assert await limiter.check("10.0.0.1", "bob") is None
+
+    clock.now += 301
+    assert await limiter.check("10.0.0.1", "alice") is None
+
+
+async def test_success_resets_failures(clock, store):
+    limiter = make_limiter(store, ip_limit=100)
+    await limiter.record_failure("alice")
+    await limiter.record_success("alice")
+    await limiter.record_failure("alice")
+    assert await store.lock_remaining("login:user:alice") == 0
+
+
+async def test_least_recently_used_keys_are_evicted(clock):
+    store = MemoryRateLimitStore(maxsize=2)
+    for key in ("a", "b", "c"):
+        await store.hit(key, WINDOW)
+    assert await store.retry_after("a", 1, WINDOW) == 0
+    assert await store.retry_after("c", 1, WINDOW) > 0
+
+
+async def test_database_store_prunes_expired_rows(clock, engine):
+    store = DatabaseRateLimitStore(retention_seconds=2 * WINDOW)
+    await store.hit("stale", WINDOW)
+    await store.hit("locked", WINDOW)
+    await store.lock("locked", 10 * WINDOW)
+    clock.now += 3 * WINDOW
+    await store.hit("fresh", WINDOW)
+
+    await store.prune()
+    assert await store._row("stale") is None
+    # 锁定还没过期的行保留
+    assert await store.lock_remaining("locked") == pytest.approx(7 * WINDOW)
+    assert await store.retry_after("fresh", 1, WINDOW) > 0
+
+
+def test_forwarded_for_is_only_trusted_from_proxies():
+    proxies = ("127.0.0.1", "10.0.0.0/8")
+    assert resolve_client_ip("127.0.0.1", "1.2.3.4", proxies) == "1.2.3.4"
+    assert resolve_client_ip("5.6.7.8", "1.2.3.4", proxies) == "5.6.7.8"
+    # 客户端自己写的 X-Forwarded-For 在最左边，不可信
+    assert resolve_client_ip("127.0.0.1", "9.9.9.9, 1.2.3.4, 10.0.0.5", proxies) == "1.2.3.4"
@@ -0,0 +1,70 @@
+from datetime import timedelta
+
+import pytest
+from sqlmodel import func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from bluenote.schemas.blogs import Blog
+from bluenote.schemas.contacts import Contact
+
+pytestmark = pytest.mark.anyio
+
+
+async def create_blog(session, title: str) -> Blog:
+    return await Blog.create(session, {"title": title, "content": "..."})
+
+
+async def test_soft_deleted_rows_are_hidden_from_selects(session):
+    kept = await create_blog(session, "kept")
+    deleted = await create_blog(session, "deleted")
+    deleted_id = deleted.id
+    await deleted.delete(session)
+
+    titles = (await session.exec(select(Blog.title))).all()
+    assert titles == ["kept"]
+    assert [blog.id for blog in await Blog.all(session)] == [kept.id]
+    assert await Blog.first_by_field(session, "id", deleted_id) is None
+
+
+async def test_include_deleted_returns_tombstones(session):
+    blog = await create_blog(session, "deleted")
+    await blog.delete(session)
+
+    statement = select(Blog).execution_options(include_deleted=True)
+    (row,) = (await session.exec(statement)).all()
+    assert row.title == "deleted"
+    assert row.deleted_at is not None
+
+
+async def test_soft_delete_keeps_the_row(engine):
+    async with AsyncSession(engine) as session:
+        contact = await Contact.create(
+            session, {"name": "a", "email": "a@example.com", "theme": "t", "context": "c"}
+        )
+        await contact.delete(session)
+
+    async with AsyncSession(engine) as session:
+        count = select(func.count()).select_from(Contact).execution_options(include_deleted=True)
+        assert (await session.exec(count)).one() == 1
+        assert await Contact.all(session) == []
+
+
+async def test_purge_removes_old_tombstones_only(session):
+    active = await create_blog(session, "active")
+    deleted = await create_blog(session, "deleted")
+    await deleted.delete(session)
+
+    assert await Blog.purge_soft_deleted(session, older_than=timedelta(days=1)) == 0
+    assert await Blog.purge_soft_deleted(session, older_than=timedelta(0)) == 1
+
+    rows = (await session.exec(select(Blog).execution_options(include_deleted=True))).all()
+    assert [row.id for row in rows] == [active.id]
+
+
+async def test_title_can_be_reused_after_soft_delete(session):
+    blog = await create_blog(session, "title")
+    blog_id = blog.id
+    await blog.delete(session)
+
+    reused = await Blog.create_unique(session, {"title": "title", "content": "..."}, conflict_on=("title",))
+    assert reused.id != blog_id
@@ -1,5 +1,6 @@
 "use server"
 
+import { headers } from "next/headers"
 import { API_CONFIG } from "@/lib/config"
 
 interface LoginResponse {
@@ -36,12 +37,15 @@ export async function loginUser(prevState: LoginFormState, formData: FormData):
 
   try {
     const loginUrl = `${API_CONFIG.AUTH_API_URL}/login`
+    // 登录限流按客户端 IP 计数，把浏览器的地址转发给后端，否则所有用户都算作这台服务器的 IP
+    const forwardedFor = (await headers()).get('x-forwarded-for')
     
     const response = await fetch(loginUrl, {
       method: 'POST',
       headers: {
         'accept': 'application/json',
         'Content-Type': 'application/json',
+        ...(forwardedFor ? { 'X-Forwarded-For': forwardedFor } : {}),
       },
       body: JSON.stringify({
         username: username.toString(),